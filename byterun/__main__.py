@@ -3,7 +3,7 @@
 import argparse
 import logging
 
-from . import execfile
+from . import execfile, importer, interpreter
 
 parser = argparse.ArgumentParser(
     prog="byterun",
@@ -17,6 +17,26 @@ parser.add_argument(
     '-v', '--verbose', dest='verbose', action='store_true',
     help="trace the execution of the bytecode.",
 )
+parser.add_argument(
+    '--compiler', choices=importer.COMPILERS, default='host',
+    help="compile with the host's compile() or with tailbiter.",
+)
+parser.add_argument(
+    '--cache-dir', default=importer.default_directory(),
+    help="keep compiled code here between runs (default: %(default)s).",
+)
+parser.add_argument(
+    '--no-cache', dest='cache_dir', action='store_const', const=None,
+    help="don't keep compiled code between runs.",
+)
+parser.add_argument(
+    '--hot-calls', type=int, default=100, metavar='N',
+    help="run a function natively once called N times (default: %(default)s).",
+)
+parser.add_argument(
+    '--no-hot-calls', dest='hot_calls', action='store_const', const=None,
+    help="keep every function in the VM.",
+)
 parser.add_argument(
     'prog',
     help="The program to run.",
@@ -35,5 +55,11 @@ else:
 level = logging.DEBUG if args.verbose else logging.WARNING
 logging.basicConfig(level=level)
 
+interpreter.HOT_CALLS = args.hot_calls
+
 argv = [args.prog] + args.args
-run_fn(args.prog, argv)
+try:
+    cache = importer.CodeCache(args.cache_dir, args.compiler)
+except ValueError as e:
+    parser.error(str(e))
+run_fn(args.prog, argv, cache=cache)
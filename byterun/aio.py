@@ -0,0 +1,71 @@
+"""Run guest code on an asyncio event loop.
+
+run_async() drives a module frame through Frame.run_yielding() and
+hands control back to the loop every `interval` instructions, so one
+loop can interleave many guest executions. Guest code has no async
+syntax of its own; it awaits host awaitables by calling the `wait`
+trap, and the scheduler's sleep/wait_readable/wait_writable traps map
+onto their asyncio counterparts.
+"""
+
+import asyncio
+
+from .interpreter import Trap, module_frame
+from .scheduler import sleep, wait_readable, wait_writable
+
+def _wait_blocking(awaitable):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(awaitable)
+    finally:
+        loop.close()
+
+wait = Trap('wait', _wait_blocking)
+
+async def run_async(code, f_globals=None, f_locals=None, interval=1000):
+    if f_globals is None: f_globals = {}
+    steps = module_frame(code, f_globals, f_locals).run_yielding()
+    try:
+        value, used = None, 0
+        while True:
+            try:
+                request = steps.send(value)
+            except StopIteration as e:
+                return e.value
+            value = None
+            if isinstance(request, int):
+                used += request
+                if interval <= used:
+                    used = 0
+                    await asyncio.sleep(0)
+            else:
+                value = await handle_trap(*request)
+    finally:
+        steps.close()
+
+def spawn(code, f_globals=None, f_locals=None, interval=1000):
+    "Schedule a guest run as an asyncio Task."
+    return asyncio.ensure_future(run_async(code, f_globals, f_locals, interval))
+
+async def handle_trap(trap, args):
+    if trap is wait:
+        return await args[0]
+    elif trap is sleep:
+        await asyncio.sleep(*args)
+    elif trap is wait_readable:
+        await wait_for_io(args[0], 'reader')
+    elif trap is wait_writable:
+        await wait_for_io(args[0], 'writer')
+    else:
+        return trap.fallback(*args)
+
+async def wait_for_io(fileobj, kind):
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    add, remove = {'reader': (loop.add_reader, loop.remove_reader),
+                   'writer': (loop.add_writer, loop.remove_writer)}[kind]
+    add(fileobj, ready.set_result, None)
+    try:
+        await ready
+    finally:
+        remove(fileobj)
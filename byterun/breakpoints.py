@@ -0,0 +1,134 @@
+"""Breakpoints in guest code, set by patching decoded instructions.
+
+set_break() has the VM run the code object on a predecoded stream, if
+it isn't already, and swaps the stream's entries for the instructions
+starting the line for traps that check the breakpoints there before
+running the instruction. Nothing else pays for it: other instructions
+and other code run as fast as before, and clearing a code object's last
+breakpoint puts back the original entries and whatever ran the code
+before. A frame already running the code in some other way doesn't see
+the breakpoint until the code's next call.
+
+Like bdb's, a breakpoint has a condition, an ignore count and a hit
+count, and can be disabled or temporary.
+"""
+
+import types
+
+from . import interpreter
+from .interpreter import line_table, predecode, run_stream
+
+# code -> Patched, for the code objects with breakpoints.
+_patched = {}
+
+def set_break(code, lineno, action, condition=None, ignore=0, temporary=False):
+    """Break at `lineno` in `code` or the code objects nested in it:
+    call action(frame, breakpoint) before running the line when the
+    breakpoint is enabled, `condition` (an expression evaluated in the
+    frame's namespaces) is true and the ignore count has run out."""
+    places = [(const, offset) for const in walk(code)
+              for offset in line_starts(const, lineno)]
+    if not places:
+        raise ValueError("no code at line %d" % lineno)
+    breakpoint = Breakpoint(lineno, action, condition, ignore, temporary)
+    for const, offset in places:
+        patched = _patched.get(const)
+        if patched is None:
+            patched = _patched[const] = Patched(const)
+        patched.add(offset, breakpoint)
+        breakpoint.places.append((patched, offset))
+    return breakpoint
+
+def clear_all():
+    for patched in list(_patched.values()):
+        for breakpoints in list(patched.breakpoints.values()):
+            for breakpoint in list(breakpoints):
+                breakpoint.clear()
+
+def walk(code):
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from walk(const)
+
+def line_starts(code, lineno):
+    offsets, lines = line_table(code)
+    return [offset for offset, line in zip(offsets, lines) if line == lineno]
+
+class Breakpoint:
+    def __init__(self, lineno, action, condition, ignore, temporary):
+        self.lineno = lineno
+        self.action = action
+        self.condition = condition
+        self.compiled = (None if condition is None
+                         else compile(condition, '<breakpoint>', 'eval'))
+        self.ignore = ignore
+        self.temporary = temporary
+        self.enabled = True
+        self.hits = 0
+        self.places = []        # (Patched, offset) pairs.
+
+    def __repr__(self):         # pragma: no cover
+        return '<Breakpoint at line %d, %d hits>' % (self.lineno, self.hits)
+
+    def reached(self, frame):
+        if not self.enabled:
+            return
+        if self.compiled is not None:
+            try:
+                if not eval(self.compiled, frame.f_globals, frame.f_locals):
+                    return
+            except Exception:
+                # Like bdb, stop if the condition is broken, whatever
+                # the ignore count, and keep a temporary breakpoint.
+                self.hits += 1
+                self.action(frame, self)
+                return
+        self.hits += 1
+        if 0 < self.ignore:
+            self.ignore -= 1
+            return
+        if self.temporary:
+            self.clear()
+        self.action(frame, self)
+
+    def clear(self):
+        for patched, offset in self.places:
+            patched.remove(offset, self)
+        self.places = []
+
+class Patched:
+    "A code object's stream, patched for its breakpoints."
+
+    def __init__(self, code):
+        self.code = code
+        self.saved = {}         # What install_executor() replaced.
+        self.stream = stream = predecode(code)
+        self.original = {}      # Offset -> the stream's entry before patching.
+        self.breakpoints = {}   # Offset -> the Breakpoints there.
+        interpreter.install_executor(
+            code, lambda frame: run_stream(frame, stream), self.saved)
+
+    def add(self, offset, breakpoint):
+        if offset not in self.breakpoints:
+            breakpoints = self.breakpoints[offset] = []
+            self.original[offset] = handler, arguments, next_offset = self.stream[offset]
+            self.stream[offset] = trap(handler, breakpoints), arguments, next_offset
+        self.breakpoints[offset].append(breakpoint)
+
+    def remove(self, offset, breakpoint):
+        breakpoints = self.breakpoints[offset]
+        breakpoints.remove(breakpoint)
+        if not breakpoints:
+            del self.breakpoints[offset]
+            self.stream[offset] = self.original.pop(offset)
+        if not self.breakpoints:
+            del _patched[self.code]
+            interpreter.restore_executors(self.saved)
+
+def trap(handler, breakpoints):
+    def handle(frame, *arguments):
+        for breakpoint in list(breakpoints):
+            breakpoint.reached(frame)
+        return handler(frame, *arguments)
+    return handle
@@ -0,0 +1,203 @@
+"""Closure compilation: translate code objects ahead of time into
+chains of Python closures, one per instruction.
+
+Each step is a function of the frame that does its instruction and
+returns the next step, already linked in, or None to return the top
+of the stack. That skips the decoding and the name-based dispatch the
+classic loop in Frame.run() does for every instruction. Common opcodes
+get hand-written steps; the rest call the Frame's own byte_ handler. A
+code object with an opcode that Frame doesn't handle at all is left to
+the classic loop.
+
+The specialized steps don't keep f_lasti up to date; the generic ones,
+including calls, do.
+"""
+
+from . import interpreter
+from .interpreter import Frame, _void, decode, fuse, handler_for
+
+# What install() replaced, for uninstall().
+_saved = {}
+
+def install(code):
+    """Translate `code` and the code objects nested in it, and have
+    the VM run them translated until uninstall(). Return how many
+    were newly installed."""
+    installed = len(_saved)
+    interpreter.install_executors(code, translated_executor, _saved)
+    return len(_saved) - installed
+
+def uninstall():
+    "Put back whatever ran the code install() translated."
+    interpreter.restore_executors(_saved)
+
+def translated_executor(code):
+    step = translate(code)
+    return None if step is None else lambda frame: execute(frame, step)
+
+def run(code, f_globals, f_locals):
+    install(code)
+    return interpreter.run(code, f_globals, f_locals)
+
+def execute(frame, step):
+    while step is not None:
+        step = step(frame)
+    return frame.pop()
+
+def translate(code):
+    "Return the entry step for `code`, or None if we can't translate it."
+    instructions = fuse(decode(code))
+    for _, byte_name, _, _ in instructions:
+        if not (byte_name in specialized or handler_for(byte_name)):
+            return None
+    # Build back to front, so fall-through successors and forward jump
+    # targets already exist; backward jumps look their target up.
+    steps = {}
+    def link(target):
+        return steps.get(target) or (lambda frame: steps[target](frame))
+    for offset, byte_name, arguments, next_offset in reversed(instructions):
+        nxt = steps.get(next_offset)
+        if byte_name in specialized:
+            step = specialized[byte_name](nxt, link, *arguments)
+        else:
+            step = generic(byte_name, arguments, next_offset, nxt, steps)
+        steps[offset] = step
+    return steps[0]
+
+def generic(byte_name, arguments, next_offset, nxt, steps):
+    handler = handler_for(byte_name)
+    def step(frame):
+        frame.f_lasti = next_offset
+        if handler(frame, *arguments):
+            return None
+        if frame.f_lasti != next_offset:
+            return steps[frame.f_lasti]
+        return nxt
+    return step
+
+specialized = {}
+
+def specializes(*byte_names):
+    def register(factory):
+        for byte_name in byte_names:
+            specialized[byte_name] = factory
+        return factory
+    return register
+
+@specializes('NOP', 'SETUP_LOOP', 'POP_BLOCK')
+def no_op(nxt, link, *arguments):
+    return nxt
+
+@specializes('POP_TOP')
+def pop_top(nxt, link):
+    def step(frame):
+        frame.stack.pop()
+        return nxt
+    return step
+
+@specializes('DUP_TOP')
+def dup_top(nxt, link):
+    def step(frame):
+        frame.stack.append(frame.stack[-1])
+        return nxt
+    return step
+
+@specializes('LOAD_CONST')
+def load_const(nxt, link, const):
+    def step(frame):
+        frame.stack.append(const)
+        return nxt
+    return step
+
+@specializes('LOAD_FAST')
+def load_fast(nxt, link, name):
+    def step(frame):
+        try:
+            frame.stack.append(frame.f_locals[name])
+        except KeyError:
+            raise UnboundLocalError(
+                "local variable '%s' referenced before assignment" % name)
+        return nxt
+    return step
+
+@specializes('STORE_FAST', 'STORE_NAME')
+def store_local(nxt, link, name):
+    def step(frame):
+        frame.f_locals[name] = frame.stack.pop()
+        return nxt
+    return step
+
+def calling(handler):
+    def factory(nxt, link, *arguments):
+        def step(frame):
+            handler(frame, *arguments)
+            return nxt
+        return step
+    return factory
+
+specialized['LOAD_NAME'] = calling(Frame.byte_LOAD_NAME)
+specialized['LOAD_GLOBAL'] = calling(Frame.byte_LOAD_GLOBAL)
+
+def binary(fn):
+    def factory(nxt, link):
+        def step(frame):
+            stack = frame.stack
+            y = stack.pop()
+            stack[-1] = fn(stack[-1], y)
+            return nxt
+        return step
+    return factory
+
+for op, fn in Frame.BINARY_OPERATORS.items():
+    specialized['BINARY_' + op] = binary(fn)
+
+@specializes('COMPARE_OP')
+def compare_op(nxt, link, opnum):
+    return binary(Frame.COMPARE_OPERATORS[opnum])(nxt, link)
+
+@specializes('JUMP_FORWARD', 'JUMP_ABSOLUTE')
+def jump(nxt, link, target):
+    return link(target)
+
+@specializes('POP_JUMP_IF_FALSE')
+def pop_jump_if_false(nxt, link, target):
+    target = link(target)
+    def step(frame):
+        return nxt if frame.stack.pop() else target
+    return step
+
+@specializes('POP_JUMP_IF_TRUE')
+def pop_jump_if_true(nxt, link, target):
+    target = link(target)
+    def step(frame):
+        return target if frame.stack.pop() else nxt
+    return step
+
+@specializes('FOR_ITER')
+def for_iter(nxt, link, target):
+    target = link(target)
+    def step(frame):
+        stack = frame.stack
+        element = next(stack[-1], _void)
+        if element is _void:
+            stack.pop()
+            return target
+        stack.append(element)
+        return nxt
+    return step
+
+@specializes('FOR_ITER_STORE')
+def for_iter_store(nxt, link, target, name):
+    target = link(target)
+    def step(frame):
+        element = next(frame.stack[-1], _void)
+        if element is _void:
+            frame.stack.pop()
+            return target
+        frame.f_locals[name] = element
+        return nxt
+    return step
+
+@specializes('RETURN_VALUE')
+def return_value(nxt, link):
+    return lambda frame: None
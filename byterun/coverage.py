@@ -0,0 +1,160 @@
+"""Line and branch coverage of guest code.
+
+A Collector runs the code objects it measures on predecoded streams
+where the first instruction of each basic block and of each line marks
+its offset in a bitmap for its code object, and each conditional jump
+marks which way it went in another. Nothing else is instrumented: the
+instructions in between follow from the marks.
+
+Lines and arcs are worked out from the bitmaps only when asked for.
+Arcs are pairs of lines, as coverage.py has them: from the line running
+to the line starting, with -co_firstlineno standing for entering and
+leaving the code object. write() saves a coverage.py data file, which
+needs coverage.py installed.
+
+An instruction that raises counts as finishing its basic block.
+"""
+
+from . import interpreter
+from .interpreter import (ENDS, JUMPS, block_starts, decode, fuse, line_at,
+                          line_table, predecode, run_stream)
+
+# The jumps that may go either way.
+BRANCHES = JUMPS - {'JUMP_FORWARD', 'JUMP_ABSOLUTE', 'SETUP_LOOP'}
+
+class Collector:
+    def __init__(self):
+        self.measured = {}      # Code -> its Measurement.
+        self.saved = {}         # Code -> the executor it had before, or None.
+
+    def start(self, code):
+        "Measure `code` and the code objects nested in it."
+        interpreter.install_executors(code, self.executor, self.saved)
+
+    def stop(self):
+        "Stop measuring, keeping what was measured."
+        interpreter.restore_executors(self.saved)
+
+    def executor(self, code):
+        if code not in self.measured:
+            self.measured[code] = Measurement(code)
+        return self.measured[code].executor
+
+    def run(self, code, f_globals, f_locals):
+        self.start(code)
+        try:
+            return interpreter.run(code, f_globals, f_locals)
+        finally:
+            self.stop()
+
+    def lines(self):
+        "Return {filename: set of lines run}."
+        lines = {}
+        for code, measurement in self.measured.items():
+            lines.setdefault(code.co_filename, set()).update(measurement.lines())
+        return lines
+
+    def arcs(self):
+        "Return {filename: set of (from line, to line) arcs taken}."
+        arcs = {}
+        for code, measurement in self.measured.items():
+            arcs.setdefault(code.co_filename, set()).update(measurement.arcs())
+        return arcs
+
+    def write(self, basename='.coverage', branch=False):
+        "Save the lines, or with `branch` the arcs, for coverage.py."
+        from coverage import CoverageData     # The package, not this module.
+        data = CoverageData(basename=basename)
+        if branch:
+            data.add_arcs(self.arcs())
+        else:
+            data.add_lines(self.lines())
+        data.write()
+        return data
+
+class Measurement:
+    "One code object's bitmaps, and the stream that fills them in."
+
+    def __init__(self, code):
+        self.code = code
+        self.instructions = fuse(decode(code))
+        self.leaders = block_starts(self.instructions) | set(line_table(code)[0])
+        self.reached = bytearray(len(code.co_code))    # At leaders: ran.
+        self.branched = bytearray(len(code.co_code))   # At branches: 1 fell
+                                                       # through, 2 jumped.
+        self.stream = stream = predecode(code)
+        for offset, byte_name, _, _ in self.instructions:
+            handler, arguments, next_offset = stream[offset]
+            if byte_name in BRANCHES:
+                handler = branching(handler, self.branched, offset, next_offset)
+            if offset in self.leaders:
+                handler = reaching(handler, self.reached, offset)
+            stream[offset] = handler, arguments, next_offset
+        self.executor = lambda frame: run_stream(frame, stream)
+
+    def ran(self):
+        "Yield (instruction, whether it ran) in order."
+        ran = False
+        for instruction in self.instructions:
+            if instruction[0] in self.leaders:
+                ran = bool(self.reached[instruction[0]])
+            yield instruction, ran
+
+    def lines(self):
+        return set(line_at(self.code, offset)
+                   for (offset, _, _, _), ran in self.ran() if ran)
+
+    def arcs(self):
+        """Follow the edges taken from the entry, knowing the line last
+        started, and note an arc at each line starting."""
+        code = self.code
+        ran = dict((instruction[0], (instruction, ran))
+                   for instruction, ran in self.ran())
+        line_starts = set(line_table(code)[0]) or {0}
+        entry = -code.co_firstlineno
+        arcs = set()
+        seen = set()
+        work = [(0, entry, False)]
+        while work:
+            state = work.pop()
+            if state in seen:
+                continue
+            seen.add(state)
+            offset, line, backward = state
+            (_, byte_name, arguments, next_offset), did_run = ran[offset]
+            if not did_run:
+                continue
+            if offset in line_starts or backward:
+                arcs.add((line, line_at(code, offset)))
+                line = line_at(code, offset)
+            if byte_name in ('RETURN_VALUE', 'RETURN_CONST'):
+                arcs.add((line, entry))
+            for target in self.taken(offset, byte_name, arguments, next_offset):
+                work.append((target, line, target <= offset))
+        return arcs
+
+    def taken(self, offset, byte_name, arguments, next_offset):
+        "Return the offsets control went on to from a run instruction."
+        if byte_name in BRANCHES:
+            branched = self.branched[offset]
+            return ([next_offset] if branched & 1 else []) + (
+                [arguments[0]] if branched & 2 else [])
+        elif byte_name in ENDS and byte_name in JUMPS:
+            return [arguments[0]]
+        elif byte_name in ENDS:
+            return []
+        else:
+            return [next_offset]
+
+def reaching(handler, reached, offset):
+    def handle(frame, *arguments):
+        reached[offset] = 1
+        return handler(frame, *arguments)
+    return handle
+
+def branching(handler, branched, offset, next_offset):
+    def handle(frame, *arguments):
+        outcome = handler(frame, *arguments)
+        branched[offset] |= 1 if frame.f_lasti == next_offset else 2
+        return outcome
+    return handle
@@ -0,0 +1,144 @@
+"""An Engine: the state worth keeping between many guest runs.
+
+interpreter.run() starts cold each time. An Engine instead keeps, for
+as many runs as it's used for:
+
+  - a snapshot of the builtins, a fresh copy of which goes to each
+    run's globals that have none, so guests can change neither the
+    host's nor each other's;
+  - each code object it has run, compiled when given as source, and
+    decoded into a stream over its dispatch table;
+  - its configuration: the HOT_CALLS promotion threshold of the
+    Functions its streams make, and an instruction budget, metered as
+    in metering.py.
+
+A run has the VM use the Engine's streams for the code it runs, and the
+code objects nested in it, then puts back whatever ran them before. A
+run within a run, as when an importer.Importer runs a module with the
+Engine, adds to the outer one: its code is metered along with it and
+keeps the Engine's streams until the outer run is over.
+"""
+
+import builtins, types
+
+from . import interpreter
+from .interpreter import HANDLERS, predecode, run_stream
+from .metering import Meter
+
+class Engine:
+    def __init__(self, f_builtins=None, table=None,
+                 hot_calls=interpreter.HOT_CALLS, budget=None):
+        self.builtins = dict(builtins.__dict__ if f_builtins is None
+                             else f_builtins)
+        self.table = dict(HANDLERS if table is None else table)
+        for byte_name in ('MAKE_FUNCTION', 'MAKE_CLOSURE'):
+            if self.table.get(byte_name) is not None:
+                self.table[byte_name] = self.making(self.table[byte_name])
+        self.hot_calls = hot_calls
+        self.meter = None if budget is None else Meter(budget, self.table)
+        self.compiled = {}      # (source, filename) -> code.
+        self.streams = {}       # Code -> its stream.
+        self.executors = {}     # Code -> the executor for its stream.
+        self.runs = 0
+        self.saved = None       # While running: code -> its executor before.
+
+    @property
+    def count(self):
+        "The number of instructions the last metered run ran."
+        return None if self.meter is None else self.meter.count
+
+    def compile(self, source, filename='<engine>'):
+        key = source, filename
+        code = self.compiled.get(key)
+        if code is None:
+            code = self.compiled[key] = compile(source, filename, 'exec')
+        return code
+
+    def run(self, code, f_globals=None, f_locals=None):
+        """Run `code`, a code object or source, in `f_globals` (a new
+        dict if None); return what the VM returns for it."""
+        if isinstance(code, str):
+            code = self.compile(code)
+        if f_globals is None:
+            f_globals = {}
+        if '__builtins__' not in f_globals:
+            f_globals['__builtins__'] = dict(self.builtins)
+        self.runs += 1
+        outermost = self.saved is None
+        if outermost:
+            self.saved = {}
+            if self.meter is not None:
+                self.meter.count = 0
+        try:
+            if self.meter is not None:
+                return self.meter.run(code, f_globals, f_locals)
+            self.install(code, self.saved)
+            return interpreter.run(code, f_globals, f_locals)
+        finally:
+            if outermost:
+                for const, executor in self.saved.items():
+                    if executor is None:
+                        interpreter.executors.pop(const, None)
+                    else:
+                        interpreter.executors[const] = executor
+                self.saved = None
+
+    def making(self, handler):
+        "Wrap `handler`, which makes a Function, to give it our hot_calls."
+        def handle(frame, *arguments):
+            handler(frame, *arguments)
+            frame.stack[-1]._hot_calls = self.hot_calls
+        return handle
+
+    def warm(self, code):
+        """Compile and decode `code` and the code nested in it ahead of
+        its first run; return the code object."""
+        if isinstance(code, str):
+            code = self.compile(code)
+        self.install(code, {}, False)
+        return code
+
+    def install(self, code, saved, run=True):
+        "Have the VM run `code` and the code nested in it on our streams."
+        if code in saved:
+            return
+        executor = self.decoded(code)
+        saved[code] = interpreter.executors.get(code)
+        if run:
+            interpreter.executors[code] = executor
+        elif self.meter is not None and code not in self.meter.streams:
+            self.meter.streams[code] = self.meter.metered_stream(code)
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                self.install(const, saved, run)
+
+    def decoded(self, code, instructions=None):
+        """Return the executor for `code`'s stream, decoding it, or making
+        it from fuse(decode(code))'s `instructions`, if need be."""
+        executor = self.executors.get(code)
+        if executor is None:
+            stream = self.streams[code] = predecode(code, self.table, instructions)
+            executor = self.executors[code] = (
+                lambda frame: run_stream(frame, stream))
+        return executor
+
+    def clear(self):
+        "Drop the compiled and decoded code."
+        self.compiled.clear()
+        self.streams.clear()
+        self.executors.clear()
+        if self.meter is not None:
+            self.meter.streams.clear()
+
+    def forget(self, code):
+        "Drop `code`, and the code nested in it, from the compiled and decoded code."
+        for key, compiled in list(self.compiled.items()):
+            if compiled is code:
+                del self.compiled[key]
+        self.streams.pop(code, None)
+        self.executors.pop(code, None)
+        if self.meter is not None:
+            self.meter.streams.pop(code, None)
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                self.forget(const)
@@ -1,10 +1,11 @@
 """Execute files of Python code."""
 
 import builtins
-import imp
+import importlib.util
 import os
 import sys
 import tokenize
+import types
 
 from .interpreter import run
 
@@ -13,74 +14,70 @@ from .interpreter import run
 open_source = tokenize.open
 NoSource = Exception
 
-def run_python_module(modulename, args):
+def run_python_module(modulename, args, cache=None):
     """Run a python module, as though with ``python -m name args...``.
 
     `modulename` is the name of the module, possibly a dot-separated name.
     `args` is the argument array to present as sys.argv, including the first
-    element naming the module being executed.
+    element naming the module being executed.  `cache` is as for
+    run_python_file.
 
     """
-    openfile = None
-    glo, loc = globals(), locals()
     try:
-        try:
-            # Search for the module - inside its parent package, if any - using
-            # standard import mechanics.
-            if '.' in modulename:
-                packagename, name = modulename.rsplit('.', 1)
-                package = __import__(packagename, glo, loc, ['__path__'])
-                searchpath = package.__path__
-            else:
-                packagename, name = None, modulename
-                searchpath = None  # "top-level search" in imp.find_module()
-            openfile, pathname, _ = imp.find_module(name, searchpath)
-
-            # Complain if this is a magic non-file module.
-            if openfile is None and pathname is None:
-                raise NoSource(
-                    "module does not live in a file: %r" % modulename
-                    )
-
-            # If `modulename` is actually a package, not a mere module, then we
-            # pretend to be Python 2.7 and try running its __main__.py script.
-            if openfile is None:
-                packagename = modulename
-                name = '__main__'
-                package = __import__(packagename, glo, loc, ['__path__'])
-                searchpath = package.__path__
-                openfile, pathname, _ = imp.find_module(name, searchpath)
-        except ImportError:
-            _, err, _ = sys.exc_info()
-            raise NoSource(str(err))
-    finally:
-        if openfile:
-            openfile.close()
+        # Search for the module - inside its parent package, if any - using
+        # standard import mechanics.
+        spec = importlib.util.find_spec(modulename)
+        if spec is None:
+            raise NoSource("No module named %r" % modulename)
+
+        # If `modulename` is actually a package, not a mere module, then we
+        # pretend to be Python 2.7 and try running its __main__.py script.
+        if spec.submodule_search_locations is not None:
+            packagename = modulename
+            spec = importlib.util.find_spec(modulename + '.__main__')
+            if spec is None:
+                raise NoSource("No module named %r" % (modulename + '.__main__'))
+        else:
+            packagename = modulename.rpartition('.')[0] or None
+
+        # Complain if this is a magic non-file module.
+        if not spec.has_location:
+            raise NoSource(
+                "module does not live in a file: %r" % modulename
+                )
+        pathname = spec.origin
+    except (ImportError, ValueError):
+        _, err, _ = sys.exc_info()
+        raise NoSource(str(err))
 
     # Finally, hand the file off to run_python_file for execution.
     args[0] = pathname
-    run_python_file(pathname, args, package=packagename)
+    run_python_file(pathname, args, package=packagename, cache=cache)
 
 
-def run_python_file(filename, args, package=None):
+def run_python_file(filename, args, package=None, cache=None):
     """Run a python file as if it were the main program on the command line.
 
     `filename` is the path to the file to execute, it need not be a .py file.
     `args` is the argument array to present as sys.argv, including the first
     element naming the file being executed.  `package` is the name of the
-    enclosing package, if any.
+    enclosing package, if any.  `cache`, an importer.CodeCache, compiles
+    the file, or has it compiled already; by default it's compiled afresh
+    with the builtin compile().
 
     """
     try:
-        source_file = open_source(filename)
+        if cache is None:
+            with open_source(filename) as source_file:
+                code = compile(source_file.read(), filename, "exec")
+        else:
+            code = cache.get(filename)
     except IOError:
         raise NoSource("No file to run: %r" % filename)
-    with source_file:
-        source = source_file.read()
 
     # Create a module to serve as __main__
     old_main_mod = sys.modules['__main__']
-    main_mod = imp.new_module('__main__')
+    main_mod = types.ModuleType('__main__')
     sys.modules['__main__'] = main_mod
     main_mod.__file__ = filename
     if package:
@@ -97,7 +94,6 @@ def run_python_file(filename, args, package=None):
         sys.path[0] = os.path.abspath(os.path.dirname(filename))
 
     try:
-        code = compile(source, filename, "exec")
         run(code, main_mod.__dict__, None)
     finally:
         # Restore the old __main__
@@ -0,0 +1,156 @@
+"""Guest imports that run in the VM.
+
+byte_IMPORT_NAME calls __import__, so without help an imported module
+runs natively, out of reach of tracing, metering and the rest. While an
+Importer is installed, it finds the source modules its policy gives to
+the VM and runs their bodies there, through an Engine if it has one;
+everything else (builtin and extension modules, and the packages the
+policy leaves native) imports as usual.
+
+The policy maps package or module names to 'vm' or 'native'; a module
+goes by the longest name in it that it's in, or by the default.
+
+Code comes from a CodeCache, which compiles each source file at most
+once per version of it, with the host's compile() or with tailbiter,
+and with a directory keeps the code objects on disk, like .pyc files,
+for later processes.
+"""
+
+import hashlib, importlib.abc, importlib.machinery, importlib.util
+import marshal, os, sys
+
+from . import interpreter
+
+COMPILERS = ('host', 'tailbiter')
+
+def default_directory():
+    "Where the command lines keep compiled code: $BYTERUN_CACHE or ~/.cache."
+    return os.environ.get('BYTERUN_CACHE') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+        'byterun')
+
+class CodeCache:
+    def __init__(self, directory=None, compiler='host'):
+        if compiler not in COMPILERS:
+            raise ValueError("unknown compiler %r" % compiler)
+        if compiler == 'tailbiter' and interpreter.WORDCODE:
+            # decode() reads wordcode on such a host, not tailbiter's output.
+            raise ValueError("tailbiter's code can't run in byterun on Python %d.%d;"
+                             " it needs a Python before 3.11"
+                             % sys.version_info[:2])
+        self.directory = directory
+        self.compiler = compiler
+        self.codes = {}         # (filename, mtime, size) -> code.
+        self.counts = {'hits': 0, 'loads': 0, 'compiles': 0}
+
+    def get(self, filename, module_name='__main__'):
+        "Return the code for the source in `filename`, compiling if need be."
+        stat = os.stat(filename)
+        key = os.path.abspath(filename), stat.st_mtime_ns, stat.st_size
+        code = self.codes.get(key)
+        if code is not None:
+            self.counts['hits'] += 1
+            return code
+        code = self.load(key)
+        if code is None:
+            with open(filename, 'rb') as f:
+                source = importlib.util.decode_source(f.read())
+            code = self.compile(source, filename, module_name)
+            self.counts['compiles'] += 1
+            self.save(key, code)
+        else:
+            self.counts['loads'] += 1
+        self.codes[key] = code
+        return code
+
+    def compile(self, source, filename, module_name):
+        if self.compiler == 'tailbiter':
+            import ast
+            from tailbiter.compiler import code_for_module
+            return code_for_module(module_name, filename, ast.parse(source))
+        return compile(source, filename, 'exec', dont_inherit=True)
+
+    def path(self, key):
+        digest = hashlib.sha1(key[0].encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.directory, '%s.%s.%s' % (
+            digest, self.compiler, sys.implementation.cache_tag))
+
+    def load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(key), 'rb') as f:
+                saved_key, code = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return code if tuple(saved_key) == key else None
+
+    def save(self, key, code):
+        if self.directory is None:
+            return
+        path = self.path(key)
+        temporary = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary, 'wb') as f:
+                marshal.dump((key, code), f)
+            os.replace(temporary, path)
+        except OSError:
+            pass                # A cache we can't write to is just slower.
+
+class Importer(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def __init__(self, policy=None, default='native', cache=None, engine=None):
+        self.policy = {} if policy is None else dict(policy)
+        for name, where in list(self.policy.items()) + [(None, default)]:
+            if where not in ('vm', 'native'):
+                raise ValueError("policy for %s must be 'vm' or 'native', not %r"
+                                 % (name or 'the default', where))
+        self.default = default
+        self.cache = CodeCache() if cache is None else cache
+        self.engine = engine
+        self.imported = []      # The names of the modules run in the VM.
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    def where(self, fullname):
+        "Return 'vm' or 'native': where the policy runs module `fullname`."
+        name = fullname
+        while name:
+            if name in self.policy:
+                return self.policy[name]
+            name = name.rpartition('.')[0]
+        return self.default
+
+    def find_spec(self, fullname, path, target=None):
+        if self.where(fullname) != 'vm':
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path)
+        if (spec is None or spec.origin is None
+            or not isinstance(spec.loader, importlib.machinery.SourceFileLoader)):
+            return None
+        spec.loader = self
+        return spec
+
+    def create_module(self, spec):
+        return None             # The default module.
+
+    def exec_module(self, module):
+        code = self.cache.get(module.__spec__.origin, module.__name__)
+        self.imported.append(module.__name__)
+        if self.engine is None:
+            interpreter.run(code, module.__dict__, None)
+        else:
+            self.engine.run(code, module.__dict__)
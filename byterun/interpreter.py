@@ -2,22 +2,44 @@
 # Derived from Byterun by Ned Batchelder, based on pyvm2 by Paul
 # Swartz (z3p), from http://www.twistedmatrix.com/users/z3p/
 
-import builtins, dis, operator, types
+import bisect, builtins, dis, operator, sys, types, weakref
+
+# Whether code objects are the host's 3.11 or 3.12 wordcode, rather than
+# the 3-byte instructions of Python 3.4 and of tailbiter's output.
+WORDCODE = (3, 11) <= sys.version_info
+
+# Whether LOAD_ATTR's argument says if it loads a method, as from 3.12.
+METHOD_ATTRS = (3, 12) <= sys.version_info
+
+# A Function called this many times is swapped for a native CPython
+# function over the same code, if the host can run that code. None
+# keeps everything in the VM; an Engine given hot_calls, or the command
+# line, opts in. A Function takes the value in force when it's made.
+HOT_CALLS = None
 
 class Function:
     __slots__ = [
-        '__name__', '__code__', '__globals__', '__defaults__', '__closure__',
-        '__dict__', '__doc__',
+        '__name__', '__code__', '__globals__', '__defaults__', '__kwdefaults__',
+        '__closure__', '__dict__', '__doc__', '_calls', '_native', '_arity',
+        '_hot_calls',
     ]
 
-    def __init__(self, name, code, globs, defaults, closure):
+    def __init__(self, name, code, globs, defaults, closure, kwdefaults=None):
         self.__name__ = name or code.co_name
         self.__code__ = code
         self.__globals__ = globs
         self.__defaults__ = tuple(defaults)
+        self.__kwdefaults__ = kwdefaults
         self.__closure__ = closure
         self.__dict__ = {}
         self.__doc__ = code.co_consts[0] if code.co_consts else None
+        self._calls = 0
+        self._native = None     # Undecided; then False or a native function.
+        self._hot_calls = HOT_CALLS
+        # The number of positional arguments call_exact() takes, if the
+        # function has just positional parameters; else None.
+        self._arity = (None if code.co_flags & 0x0C or code.co_kwonlyargcount
+                       else code.co_argcount)
 
     def __repr__(self):         # pragma: no cover
         return '<Function %s at 0x%08x>' % (self.__name__, id(self))
@@ -26,26 +48,72 @@ class Function:
         return self if instance is None else Method(instance, owner, self)
 
     def __call__(self, *args, **kwargs):
+        native = self._native
+        if native is None:
+            native = self.count_call()
+        if native and not _every_frame:
+            return native(*args, **kwargs)
+        return run_frame(self.__code__, self.__closure__, self.__globals__,
+                         self.bind_arguments(args, kwargs))
+
+    def call_exact(self, args):
+        """Call with a sequence of exactly _arity positional arguments,
+        skipping the general argument binding."""
+        native = self._native
+        if native is None:
+            native = self.count_call()
+        if native and not _every_frame:
+            return native(*args)
+        return run_frame(self.__code__, self.__closure__, self.__globals__,
+                         dict(zip(self.__code__.co_varnames, args)))
+
+    def count_call(self):
+        "Count a call while undecided; return the native function once hot."
+        self._calls += 1
+        hot_calls = self._hot_calls
+        if hot_calls is not None and hot_calls <= self._calls:
+            return self.promote()
+        return None
+
+    def promote(self):
+        """Decide once and for all whether to run natively. Closures stay
+        in the VM: our Cells can't be shared with native code."""
+        if self.__closure__ is None and native_compatible(self.__code__):
+            native = types.FunctionType(self.__code__, self.__globals__,
+                                        self.__name__, self.__defaults__)
+            native.__kwdefaults__ = self.__kwdefaults__
+            native.__dict__ = self.__dict__
+            self._native = native
+        else:
+            self._native = False
+        return self._native
+
+    def bind_arguments(self, args, kwargs):
+        # The parameters are laid out positional, keyword-only, *args, **kw.
         code      = self.__code__
         argc      = code.co_argcount
+        nnamed    = argc + code.co_kwonlyargcount
         varargs   = 0 != (code.co_flags & 0x04)
         varkws    = 0 != (code.co_flags & 0x08)
-        params    = code.co_varnames[slice(0, argc+varargs+varkws)]
+        params    = code.co_varnames[slice(0, nnamed+varargs+varkws)]
+        named     = params[slice(0, nnamed)]
 
         defaults  = self.__defaults__
-        nrequired = -len(defaults) if defaults else argc
+        nrequired = argc - len(defaults)
 
-        f_locals = dict(zip(params[slice(nrequired, None)], defaults))
-        f_locals.update(dict(zip(params, args)))
+        f_locals = dict(zip(params[slice(nrequired, argc)], defaults))
+        if self.__kwdefaults__:
+            f_locals.update(self.__kwdefaults__)
+        f_locals.update(dict(zip(params[slice(0, argc)], args)))
         if varargs:
-            f_locals[params[argc]] = args[slice(argc, None)]
+            f_locals[params[nnamed]] = args[slice(argc, None)]
         elif argc < len(args):
             raise TypeError("%s() takes up to %d positional argument(s) but got %d"
                             % (self.__name__, argc, len(args)))
         if varkws:
             f_locals[params[-1]] = varkw_dict = {}
         for kw, value in kwargs.items():
-            if kw in params:
+            if kw in named:
                 f_locals[kw] = value
             elif varkws:
                 varkw_dict[kw] = value
@@ -58,8 +126,57 @@ class Function:
                             % (code.co_name,
                                len(missing), 's' if 1 < len(missing) else '',
                                ', '.join(map(repr, missing))))
-
-        return run_frame(code, self.__closure__, self.__globals__, f_locals)
+        missing = [v for v in params[slice(argc, nnamed)] if v not in f_locals]
+        if missing:
+            raise TypeError("%s() missing %d required keyword-only argument%s: %s"
+                            % (code.co_name,
+                               len(missing), 's' if 1 < len(missing) else '',
+                               ', '.join(map(repr, missing))))
+        return f_locals
+
+def pin_interpreted(func, pinned=True):
+    """Keep `func` running in the VM, e.g. while tracing it; with
+    pinned=False, make it eligible for promotion again."""
+    func._native = False if pinned else None
+    func._calls = 0
+
+def keep_interpreted(code, keep=True):
+    """Keep every Function over `code` from going native from now on,
+    e.g. while tracing it; with keep=False, undo one such call. Once
+    every call is undone, they decide afresh."""
+    count = _kept.get(code, 0) + (1 if keep else -1)
+    if 0 < count:
+        _kept[code] = count
+        _native_compatible[code] = False
+    else:
+        _kept.pop(code, None)
+        _native_compatible.pop(code, None)
+
+_native_compatible = weakref.WeakKeyDictionary()
+_kept = weakref.WeakKeyDictionary()    # code -> keep_interpreted() calls in force.
+_jumps = set(dis.hasjrel + dis.hasjabs)
+
+def native_compatible(code):
+    "Is `code` well-formed bytecode for the host interpreter?"
+    ok = _native_compatible.get(code)
+    if ok is None:
+        ok = _native_compatible[code] = check_native(code)
+    return ok
+
+def check_native(code):
+    try:
+        instructions = list(dis.get_instructions(code))
+    except Exception:
+        return False
+    offsets = set(instruction.offset for instruction in instructions)
+    for instruction in instructions:
+        if instruction.opname.startswith('<'):
+            return False
+        if (instruction.opcode in _jumps
+            and instruction.argval not in offsets):
+            return False
+    return all(check_native(const) for const in code.co_consts
+               if isinstance(const, types.CodeType))
 
 class Method:
     def __init__(self, obj, _class, func):
@@ -75,50 +192,465 @@ class Method:
         return self.__func__(self.__self__, *args, **kwargs)
 
 class Cell:
+    __slots__ = ['contents']
+
     def __init__(self, value):
         self.contents = value
 
+class Trap:
+    """A host callable that a cooperative driver may take over.
+    Called normally it just calls `fallback`; called from a frame
+    under run_yielding() it is handed to the driver instead."""
+
+    def __init__(self, name, fallback):
+        self.__name__ = name
+        self.fallback = fallback
+
+    def __repr__(self):         # pragma: no cover
+        return '<Trap %s>' % self.__name__
+
+    def __call__(self, *args):
+        return self.fallback(*args)
+
+# What next() returns from FOR_ITER's exhausted iterators.
+_void = object()
+
+# Wordcode instructions named like binary operators, with handlers of
+# their own.
+OWN_HANDLERS = {'BINARY_OP', 'BINARY_SLICE'}
+
+# What LOAD_FAST_AND_CLEAR pushes for an unbound local.
+_cleared = object()
+
 class VirtualMachineError(Exception):
     "For raising errors in the operation of the VM."
 
 def run(code, f_globals, f_locals):
+    frame = module_frame(code, f_globals, f_locals)
+    return execute(frame)
+
+def module_frame(code, f_globals, f_locals):
     if f_globals is None: f_globals = builtins.globals()
     if f_locals is None:  f_locals = f_globals
     if '__builtins__' not in f_globals:
         f_globals['__builtins__'] = builtins.__dict__
-    return run_frame(code, None, f_globals, f_locals)
+    return Frame(code, None, f_globals, f_locals)
 
 def run_frame(code, f_closure, f_globals, f_locals):
-    return Frame(code, f_closure, f_globals, f_locals).run()
+    frame = new_frame(code, f_closure, f_globals, f_locals)
+    result = execute(frame)
+    release_frame(frame)
+    return result
+
+# Frames that returned normally are kept for the next call of the same
+# code object, at most MAX_POOLED per code object and for the
+# MAX_POOLED_CODES code objects most recently pooled for. A frame an
+# exception escaped from is left alone: the traceback may still refer
+# to it.
+MAX_POOLED = 8
+MAX_POOLED_CODES = 256
+_frame_pool = {}
+_pool_counts = {'hits': 0, 'misses': 0}
+
+def new_frame(code, f_closure, f_globals, f_locals):
+    free = _frame_pool.get(code)
+    if free:
+        _pool_counts['hits'] += 1
+        frame = free.pop()
+        frame.reset(code, f_closure, f_globals, f_locals)
+        return frame
+    _pool_counts['misses'] += 1
+    return Frame(code, f_closure, f_globals, f_locals)
+
+def release_frame(frame):
+    "Return a finished frame to the pool, dropping what it refers to."
+    free = _frame_pool.get(frame.f_code)
+    if free is None:
+        if MAX_POOLED_CODES <= len(_frame_pool):
+            del _frame_pool[next(iter(_frame_pool))]
+        free = _frame_pool[frame.f_code] = []
+    if len(free) < MAX_POOLED:
+        frame.f_globals = frame.f_builtins = frame.f_locals = None
+        frame.cells = frame.deferred = frame.f_trace = None
+        frame.stack.clear()
+        free.append(frame)
+
+def pool_stats():
+    "Return a dict of the frame pool's size, hits, misses and hit rate."
+    hits, misses = _pool_counts['hits'], _pool_counts['misses']
+    return {'pooled': sum(len(free) for free in _frame_pool.values()),
+            'code_objects': len(_frame_pool),
+            'hits': hits, 'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+
+def clear_pool():
+    "Empty the frame pool and zero its counts."
+    _frame_pool.clear()
+    _pool_counts['hits'] = _pool_counts['misses'] = 0
+
+# Alternative ways to run particular code objects, e.g. as installed
+# by closures.py: code -> function taking a fresh frame to its result.
+executors = {}
+
+# (make_executor, saved) for each install_executors(every_frame=True)
+# in force, innermost last. While there's one, Functions run in the VM
+# even if already native.
+_every_frame = []
+
+def execute(frame):
+    if _every_frame:
+        make_executor, saved = _every_frame[-1]
+        if frame.f_code not in saved:
+            install_executors(frame.f_code, make_executor, saved)
+    executor = executors.get(frame.f_code) if executors else None
+    return frame.run() if executor is None else executor(frame)
+
+def install_executors(code, make_executor, saved, every_frame=False):
+    """Run `code` and the code objects nested in it with the executor
+    make_executor(code) gives each, and keep them interpreted; code it
+    gives None for is left as it is. `saved` collects the executors
+    they had before, for restore_executors(); code already in it is
+    left as it is too. With every_frame=True, any other code run before
+    then, as of a function defined elsewhere, gets its executor the
+    same way when a frame of it starts."""
+    if every_frame and not any(entry[1] is saved for entry in _every_frame):
+        _every_frame.append((make_executor, saved))
+    if code not in saved:
+        executor = make_executor(code)
+        if executor is not None:
+            install_executor(code, executor, saved)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            install_executors(const, make_executor, saved)
+
+def install_executor(code, executor, saved):
+    """Run just `code` with `executor` and keep it interpreted, saving
+    the executor it had before in `saved` for restore_executors()."""
+    if code not in saved:
+        saved[code] = executors.get(code)
+        keep_interpreted(code)
+    executors[code] = executor
+
+def restore_executors(saved):
+    "Undo install_executors(): put back the executors in `saved`."
+    for code, executor in saved.items():
+        if executor is None:
+            executors.pop(code, None)
+        else:
+            executors[code] = executor
+        keep_interpreted(code, False)
+    saved.clear()
+    _every_frame[:] = [entry for entry in _every_frame if entry[1] is not saved]
+
+def predecode(code, table=None, instructions=None):
+    """Decode `code` once into a stream indexed by offset: at each
+    instruction's offset, its (handler, arguments, next_offset).
+    `instructions` is what fuse(decode(code)) gives, if already known."""
+    table = HANDLERS if table is None else table
+    stream = [None] * len(code.co_code)
+    if instructions is None:
+        instructions = fuse(decode(code))
+    for offset, byte_name, arguments, next_offset in instructions:
+        handler = table.get(byte_name) or unknown_opcode(byte_name)
+        stream[offset] = handler, arguments, next_offset
+    return stream
+
+def run_stream(frame, stream):
+    "Like Frame.run(), but over a stream from predecode()."
+    while True:
+        handler, arguments, frame.f_lasti = stream[frame.f_lasti]
+        if handler(frame, *arguments):
+            return frame.pop()
+
+def unknown_opcode(byte_name):
+    def handler(frame, *arguments):
+        raise VirtualMachineError("unknown opcode %s" % byte_name)
+    return handler
+
+def fuse(instructions):
+    "Apply the rewrites predecode() and the closure compiler make."
+    return fuse_loop_stores(fuse_method_calls(instructions))
+
+def fuse_loop_stores(instructions):
+    """Rewrite each FOR_ITER that goes straight on to store the element
+    in a local into a FOR_ITER_STORE that does both."""
+    targets = set(arguments[0] for _, byte_name, arguments, _ in instructions
+                  if byte_name in JUMPS)
+    fused = list(instructions)
+    for i in reversed(range(len(fused) - 1)):
+        offset, byte_name, arguments, _ = fused[i]
+        store_offset, store_name, store_arguments, after = fused[i+1]
+        if (byte_name == 'FOR_ITER' and store_name in ('STORE_FAST', 'STORE_NAME')
+            and store_offset not in targets):
+            fused[i:i+2] = [(offset, 'FOR_ITER_STORE', arguments + store_arguments,
+                             after)]
+    return fused
+
+def block_starts(instructions):
+    "Return the offsets in decoded `instructions` that start a basic block."
+    starts = {0}
+    for offset, byte_name, arguments, next_offset in instructions:
+        if byte_name in JUMPS:
+            starts.add(arguments[0])
+        if byte_name in JUMPS or byte_name in ENDS:
+            starts.add(next_offset)
+    return starts
+
+def fuse_method_calls(instructions):
+    """Rewrite decoded instructions so that each LOAD_ATTR whose value is
+    only called, with positional arguments and within one basic block,
+    becomes a LOAD_METHOD, and the CALL_FUNCTION a CALL_METHOD."""
+    targets = set(arguments[0] for _, byte_name, arguments, _ in instructions
+                  if byte_name in JUMPS)
+    fused = list(instructions)
+    depth = 0       # Relative to the start of the basic block.
+    pending = []    # (index, depth) of LOAD_ATTRs whose value is on the stack.
+    for i, (offset, byte_name, arguments, next_offset) in enumerate(instructions):
+        if offset in targets:
+            depth, pending = 0, []
+        if byte_name not in STACK_EFFECTS or byte_name in JUMPS:
+            depth, pending = 0, []
+            continue
+        int_arg = arguments[0] if arguments else None
+        pops, pushes, _ = STACK_EFFECTS[byte_name](int_arg)
+        if (byte_name == 'CALL_FUNCTION' and int_arg < 256
+            and pending and pending[-1][1] == depth - int_arg):
+            j, _ = pending.pop()
+            fused[j] = (fused[j][0], 'LOAD_METHOD') + fused[j][2:]
+            fused[i] = (offset, 'CALL_METHOD', arguments, next_offset)
+        depth -= pops
+        while pending and depth < pending[-1][1]:
+            pending.pop()
+        depth += pushes
+        if byte_name == 'LOAD_ATTR':
+            pending.append((i, depth))
+    return fused
+
+# code -> (offsets, lines): the offsets where each line's code starts,
+# in order, and those lines. Dropped with the code.
+_line_tables = weakref.WeakKeyDictionary()
+
+def line_table(code):
+    table = _line_tables.get(code)
+    if table is None:
+        starts = sorted(dis.findlinestarts(code))
+        if WORDCODE:
+            starts = after_resume(code, starts)
+        table = _line_tables[code] = ([offset for offset, _ in starts],
+                                      [line for _, line in starts])
+    return table
+
+def after_resume(code, starts):
+    """Move the line starts before wordcode's RESUME, which the host
+    doesn't trace, to the instruction after it."""
+    first = 0
+    for instruction in dis.get_instructions(code):
+        if instruction.opname == 'RESUME':
+            first = instruction.offset + 2
+            break
+    moved = {}
+    for offset, line in starts:
+        moved[max(offset, first)] = line
+    return sorted(moved.items())
+
+def line_at(code, offset):
+    "Return the line of the instruction in `code` covering `offset`."
+    offsets, lines = line_table(code)
+    i = bisect.bisect_right(offsets, offset) - 1
+    return lines[i] if 0 <= i else code.co_firstlineno
+
+def decode(code):
+    "Return the list of (offset, byte_name, arguments, next_offset) in code."
+    if WORDCODE:
+        return [(offset,) + entry
+                for offset, entry in sorted(wordcode_table(code).items())]
+    instructions = []
+    offset = 0
+    while offset < len(code.co_code):
+        byte_name, arguments, next_offset = decode_at(code, offset)
+        instructions.append((offset, byte_name, arguments, next_offset))
+        offset = next_offset
+    return instructions
+
+def decode_at(code, offset):
+    if WORDCODE:
+        return wordcode_table(code)[offset]
+    opcode = code.co_code[offset]
+    offset = offset + 1
+    if opcode >= dis.HAVE_ARGUMENT:
+        int_arg = code.co_code[offset] + (code.co_code[offset+1] << 8)
+        offset = offset + 2
+        if opcode in dis.hasconst:
+            arg = code.co_consts[int_arg]
+        elif opcode in dis.hasname:
+            arg = code.co_names[int_arg]
+        elif opcode in dis.haslocal:
+            arg = code.co_varnames[int_arg]
+        elif opcode in dis.hasjrel:
+            arg = offset + int_arg
+        else:
+            arg = int_arg
+        return dis.opname[opcode], (arg,), offset
+    return dis.opname[opcode], (), offset
+
+# id(code) -> {offset: (byte_name, arguments, next_offset)}, for
+# wordcode, while the code lives. By identity, since equal code objects
+# can hold constants that are equal but not the same.
+_wordcode_tables = {}
+
+# Wordcode instructions decoded under the name of the 3.4 instruction
+# doing the same, or as NOP for the set-up Frame.reset() already does.
+RENAMED = {
+    'JUMP_BACKWARD': 'JUMP_ABSOLUTE',
+    'JUMP_BACKWARD_NO_INTERRUPT': 'JUMP_ABSOLUTE',
+    'POP_JUMP_FORWARD_IF_FALSE': 'POP_JUMP_IF_FALSE',
+    'POP_JUMP_BACKWARD_IF_FALSE': 'POP_JUMP_IF_FALSE',
+    'POP_JUMP_FORWARD_IF_TRUE': 'POP_JUMP_IF_TRUE',
+    'POP_JUMP_BACKWARD_IF_TRUE': 'POP_JUMP_IF_TRUE',
+    'POP_JUMP_FORWARD_IF_NONE': 'POP_JUMP_IF_NONE',
+    'POP_JUMP_BACKWARD_IF_NONE': 'POP_JUMP_IF_NONE',
+    'POP_JUMP_FORWARD_IF_NOT_NONE': 'POP_JUMP_IF_NOT_NONE',
+    'POP_JUMP_BACKWARD_IF_NOT_NONE': 'POP_JUMP_IF_NOT_NONE',
+    'LOAD_FAST_CHECK': 'LOAD_FAST',
+    'RESUME': 'NOP', 'EXTENDED_ARG': 'NOP',
+    'MAKE_CELL': 'NOP', 'COPY_FREE_VARS': 'NOP',
+}
+
+# CALL_INTRINSIC_1's arguments for the instructions it stands in for.
+INTRINSICS = {5: 'UNARY_POSITIVE', 6: 'LIST_TO_TUPLE'}
+
+def wordcode_name(byte_name, int_arg):
+    """Return the name wordcode instruction `byte_name` is decoded
+    under, given its raw argument: a LOAD_GLOBAL that pushes a NULL first
+    is a PUSH_NULL_LOAD_GLOBAL, a LOAD_ATTR of a method a LOAD_METHOD,
+    and so on."""
+    if byte_name == 'LOAD_GLOBAL' and int_arg & 1:
+        return 'PUSH_NULL_LOAD_GLOBAL'
+    if byte_name == 'LOAD_ATTR' and METHOD_ATTRS and int_arg & 1:
+        return 'LOAD_METHOD'
+    if byte_name == 'LOAD_SUPER_ATTR' and int_arg & 1:
+        return 'LOAD_SUPER_METHOD'
+    if byte_name == 'CALL_INTRINSIC_1':
+        return INTRINSICS.get(int_arg, byte_name)
+    return RENAMED.get(byte_name, byte_name)
+
+def wordcode_table(code):
+    """Decode wordcode like decode_at() does 3.4 code. dis takes care of
+    EXTENDED_ARG, which becomes a NOP, and of the CACHE entries, which
+    next_offset skips. A PRECALL, and a KW_NAMES, whose names become
+    the following CALL's second argument, are skipped over too, or are
+    NOPs where something jumps to them. A FOR_ITER goes past the END_FOR
+    that 3.12 puts after a loop, and a STORE_FAST of a local that a
+    LOAD_FAST_AND_CLEAR saves, as 3.12's comprehensions do, may unbind
+    it again.
+
+    The VM doesn't follow the exception table, so code with handlers
+    that catch, as for try and with, each starting with PUSH_EXC_INFO,
+    is refused. The clean-up 3.12 adds around comprehensions, which
+    just restores a local on the way out, is not needed."""
+    table = _wordcode_tables.get(id(code))
+    if table is not None:
+        return table
+    table = {}
+    cells = code.co_cellvars + code.co_freevars
+    instructions = list(dis.get_instructions(code))
+    for instruction in instructions:
+        if instruction.opname == 'PUSH_EXC_INFO':
+            raise VirtualMachineError(
+                "%s, line %d: exception handlers are not supported"
+                % (code.co_name, line_at(code, instruction.offset)))
+    names = dict((instruction.offset, instruction.opname)
+                 for instruction in instructions)
+    cleared = set(instruction.argval for instruction in instructions
+                  if instruction.opname == 'LOAD_FAST_AND_CLEAR')
+    kw_names = ()
+    previous = None
+    for i, instruction in enumerate(instructions):
+        opcode, byte_name = instruction.opcode, instruction.opname
+        offset = instruction.offset
+        next_offset = (instructions[i+1].offset if i + 1 < len(instructions)
+                       else len(code.co_code))
+        if byte_name in ('PRECALL', 'KW_NAMES'):
+            if byte_name == 'KW_NAMES':
+                kw_names = code.co_consts[instruction.arg]
+            if not instruction.is_jump_target:
+                name, arguments, _ = table[previous]
+                table[previous] = name, arguments, next_offset
+                continue
+            byte_name = 'NOP'
+        previous = offset
+        if opcode in dis.hasfree:
+            arg = cells.index(instruction.argval)
+        elif (opcode in dis.hasconst or opcode in dis.hasname
+              or opcode in dis.haslocal or opcode in dis.hasjrel
+              or opcode in dis.hasjabs):
+            arg = instruction.argval
+        elif opcode in dis.hascompare:
+            arg = dis.cmp_op.index(instruction.argval)
+        else:
+            arg = instruction.arg
+        if byte_name == 'FOR_ITER' and names.get(arg) == 'END_FOR':
+            arg += 2
+        if byte_name == 'STORE_FAST' and arg in cleared:
+            byte_name = 'STORE_FAST_MAYBE_NULL'
+        byte_name = wordcode_name(byte_name, instruction.arg)
+        if byte_name == 'CALL':
+            arguments, kw_names = (arg, kw_names), ()
+        elif (byte_name == 'NOP' or opcode < dis.HAVE_ARGUMENT
+              or instruction.opname == 'CALL_INTRINSIC_1'):
+            arguments = ()
+        else:
+            arguments = (arg,)
+        table[offset] = byte_name, arguments, next_offset
+    _wordcode_tables[id(code)] = table
+    weakref.finalize(code, _wordcode_tables.pop, id(code), None).atexit = False
+    return table
 
 class Frame:
+    __slots__ = [
+        'f_code', 'f_globals', 'f_locals', 'f_builtins', 'stack',
+        'f_lasti', 'f_trace', 'cells', 'defer_calls', 'deferred',
+    ]
+
     def __init__(self, f_code, f_closure, f_globals, f_locals):
+        self.stack = []
+        self.reset(f_code, f_closure, f_globals, f_locals)
+
+    def reset(self, f_code, f_closure, f_globals, f_locals):
+        "Set up to run f_code from the start, as if newly made."
         self.f_code = f_code
         self.f_globals = f_globals
         self.f_locals = f_locals
-
         self.f_builtins = f_globals.get('__builtins__')
         if isinstance(self.f_builtins, types.ModuleType):
             self.f_builtins = self.f_builtins.__dict__
         if self.f_builtins is None:
             self.f_builtins = {'None': None}
 
-        self.stack = []
-
-        self.f_lineno = f_code.co_firstlineno # XXX doesn't get updated
         self.f_lasti = 0
-
-        self.cells = {} if f_code.co_cellvars or f_code.co_freevars else None
-        for var in f_code.co_cellvars:
-            self.cells[var] = Cell(self.f_locals.get(var))
-        if f_code.co_freevars:
-            assert len(f_code.co_freevars) == len(f_closure)
-            self.cells.update(zip(f_code.co_freevars, f_closure))
+        self.f_trace = None         # The local trace function, as in tracing.py.
+        self.defer_calls = False    # Set by run_yielding().
+        self.deferred = None
+
+        # Indexed like the host's: co_cellvars, then co_freevars.
+        if f_code.co_cellvars or f_code.co_freevars:
+            self.cells = [Cell(f_locals.get(var)) for var in f_code.co_cellvars]
+            if f_code.co_freevars:
+                assert len(f_code.co_freevars) == len(f_closure)
+                self.cells.extend(f_closure)
+        else:
+            self.cells = None
 
     def __repr__(self):         # pragma: no cover
         return ('<Frame at 0x%08x: %r @ %d>'
                 % (id(self), self.f_code.co_filename, self.f_lineno))
 
+    @property
+    def f_lineno(self):
+        """The line of the instruction running or last run. (f_lasti is
+        already past it: it's where the next one starts.)"""
+        return line_at(self.f_code, self.f_lasti - 1)
+
     def run(self):
         while True:
             byte_name, arguments = self.parse_byte_and_args()
@@ -127,36 +659,56 @@ class Frame:
                 assert outcome == 'return'
                 return self.pop()
 
-    def parse_byte_and_args(self):
-        code = self.f_code
-        opcode = code.co_code[self.f_lasti]
-        self.f_lasti = self.f_lasti + 1
-        if opcode >= dis.HAVE_ARGUMENT:
-            int_arg = (   code.co_code[self.f_lasti]
-                       + (code.co_code[self.f_lasti+1] << 8))
-            self.f_lasti = self.f_lasti + 2
-            if opcode in dis.hasconst:
-                arg = code.co_consts[int_arg]
-            elif opcode in dis.hasfree:
-                if int_arg < len(code.co_cellvars):
-                    arg = code.co_cellvars[int_arg]
+    def run_yielding(self):
+        """Run as a generator, pausing at the safe points: backward jumps
+        and calls to guest functions. Each pause yields the number of
+        instructions run since the last one. Calls to a Trap instead
+        yield (trap, args) and take the value sent back as the result.
+        Guest functions called from here run as nested generators;
+        ones called back from host code run to completion with run()."""
+        self.defer_calls = True
+        ticks = 0
+        while True:
+            lasti = self.f_lasti
+            byte_name, arguments = self.parse_byte_and_args()
+            outcome = self.dispatch(byte_name, arguments)
+            ticks += 1
+            if outcome == 'return':
+                if ticks: yield ticks
+                return self.pop()
+            elif outcome == 'call':
+                func, posargs, namedargs = self.deferred
+                self.deferred = None
+                if (isinstance(func, Method)
+                    and isinstance(func.__func__, Function)):
+                    posargs = [func.__self__] + posargs
+                    func = func.__func__
+                if isinstance(func, Function):
+                    yield ticks
+                    ticks = 0
+                    f_locals = func.bind_arguments(posargs, namedargs)
+                    callee = new_frame(func.__code__, func.__closure__,
+                                       func.__globals__, f_locals)
+                    self.push((yield from callee.run_yielding()))
+                    release_frame(callee)
+                elif isinstance(func, Trap) and not namedargs:
+                    yield ticks
+                    ticks = 0
+                    self.push((yield func, posargs))
                 else:
-                    arg = code.co_freevars[int_arg - len(code.co_cellvars)]
-            elif opcode in dis.hasname:
-                arg = code.co_names[int_arg]
-            elif opcode in dis.haslocal:
-                arg = code.co_varnames[int_arg]
-            elif opcode in dis.hasjrel:
-                arg = self.f_lasti + int_arg
-            else:
-                arg = int_arg
-            return dis.opname[opcode], (arg,)
-        return dis.opname[opcode], ()
+                    self.push(func(*posargs, **namedargs))
+            elif self.f_lasti < lasti:
+                yield ticks
+                ticks = 0
+
+    def parse_byte_and_args(self):
+        byte_name, arguments, self.f_lasti = decode_at(self.f_code, self.f_lasti)
+        return byte_name, arguments
 
     def dispatch(self, byte_name, arguments):
         if byte_name.startswith('UNARY_'):
             self.unary_operator(byte_name.replace('UNARY_', '', 1))
-        elif byte_name.startswith('BINARY_'):
+        elif byte_name.startswith('BINARY_') and byte_name not in OWN_HANDLERS:
             self.binary_operator(byte_name.replace('BINARY_', '', 1))
         else:
             return getattr(self, 'byte_%s' % byte_name)(*arguments)
@@ -184,6 +736,19 @@ class Frame:
     def byte_DUP_TOP(self):
         self.push(self.top())
 
+    def byte_NOP(self):
+        pass
+
+    def byte_PUSH_NULL(self):
+        self.push(None)
+
+    def byte_COPY(self, i):
+        self.push(self.stack[-i])
+
+    def byte_SWAP(self, i):
+        stack = self.stack
+        stack[-i], stack[-1] = stack[-1], stack[-i]
+
     def byte_LOAD_CONST(self, const):
         self.push(const)
 
@@ -193,6 +758,13 @@ class Frame:
         else: raise NameError("name '%s' is not defined" % name)
         self.push(val)
 
+    def byte_PUSH_NULL_LOAD_GLOBAL(self, name):
+        self.push(None)
+        self.byte_LOAD_GLOBAL(name)
+
+    def byte_STORE_GLOBAL(self, name):
+        self.f_globals[name] = self.pop()
+
     def byte_LOAD_NAME(self, name):
         if   name in self.f_locals:   val = self.f_locals[name]
         elif name in self.f_globals:  val = self.f_globals[name]
@@ -212,11 +784,21 @@ class Frame:
     def byte_STORE_FAST(self, name):
         self.f_locals[name] = self.pop()
 
-    def byte_LOAD_DEREF(self, name):
-        self.push(self.cells[name].contents)
+    def byte_LOAD_FAST_AND_CLEAR(self, name):
+        self.push(self.f_locals.pop(name, _cleared))
+
+    def byte_STORE_FAST_MAYBE_NULL(self, name):
+        value = self.pop()
+        if value is _cleared:
+            self.f_locals.pop(name, None)
+        else:
+            self.f_locals[name] = value
+
+    def byte_LOAD_DEREF(self, i):
+        self.push(self.cells[i].contents)
 
-    def byte_STORE_DEREF(self, name):
-        self.cells[name].contents = self.pop()
+    def byte_STORE_DEREF(self, i):
+        self.cells[i].contents = self.pop()
 
     UNARY_OPERATORS = {
         'POSITIVE': operator.pos,   'NOT':    operator.not_,
@@ -241,6 +823,24 @@ class Frame:
         x, y = self.popn(2)
         self.push(self.BINARY_OPERATORS[op](x, y))
 
+    # BINARY_OP's argument -> its operator, in the order of dis._nb_ops.
+    NB_OPERATORS = [{
+        '+': operator.add, '&': operator.and_, '//': operator.floordiv,
+        '<<': operator.lshift, '@': operator.matmul, '*': operator.mul,
+        '%': operator.mod, '|': operator.or_, '**': pow,
+        '>>': operator.rshift, '-': operator.sub, '/': operator.truediv,
+        '^': operator.xor, '+=': operator.iadd, '&=': operator.iand,
+        '//=': operator.ifloordiv, '<<=': operator.ilshift,
+        '@=': operator.imatmul, '*=': operator.imul, '%=': operator.imod,
+        '|=': operator.ior, '**=': operator.ipow, '>>=': operator.irshift,
+        '-=': operator.isub, '/=': operator.itruediv, '^=': operator.ixor,
+    }[symbol] for _, symbol in getattr(dis, '_nb_ops', ())]
+
+    def byte_BINARY_OP(self, op):
+        stack = self.stack
+        y = stack.pop()
+        stack[-1] = self.NB_OPERATORS[op](stack[-1], y)
+
     COMPARE_OPERATORS = [
         operator.lt,
         operator.le,
@@ -259,6 +859,44 @@ class Frame:
         x, y = self.popn(2)
         self.push(self.COMPARE_OPERATORS[opnum](x, y))
 
+    def byte_IS_OP(self, invert):
+        x, y = self.popn(2)
+        self.push((x is y) != bool(invert))
+
+    def byte_CONTAINS_OP(self, invert):
+        x, y = self.popn(2)
+        self.push((x in y) != bool(invert))
+
+    def byte_LOAD_METHOD(self, name):
+        """Push a guest method and its object without binding them, if
+        that's what obj.name would bind; else CPython's NULL, as None,
+        and the attribute."""
+        obj = self.pop()
+        cls = type(obj)
+        for klass in cls.__mro__:
+            if name in klass.__dict__:
+                meth = klass.__dict__[name]
+                break
+        else:
+            meth = None
+        if (type(meth) is Function
+            and cls.__getattribute__ is object.__getattribute__
+            and name not in getattr(obj, '__dict__', ())):
+            self.push(meth)
+            self.push(obj)
+        else:
+            self.push(None)
+            self.push(getattr(obj, name))
+
+    def byte_LOAD_SUPER_ATTR(self, attr):
+        super_, cls, obj = self.popn(3)
+        self.push(getattr(super_(cls, obj), attr))
+
+    def byte_LOAD_SUPER_METHOD(self, attr):
+        super_, cls, obj = self.popn(3)
+        self.push(None)             # For CALL, the bound method's NULL.
+        self.push(getattr(super_(cls, obj), attr))
+
     def byte_LOAD_ATTR(self, attr):
         obj = self.pop()
         val = getattr(obj, attr)
@@ -268,6 +906,14 @@ class Frame:
         val, obj = self.popn(2)
         setattr(obj, name, val)
 
+    def byte_BINARY_SLICE(self):
+        obj, start, end = self.popn(3)
+        self.push(obj[start:end])
+
+    def byte_STORE_SLICE(self):
+        value, obj, start, end = self.popn(4)
+        obj[start:end] = value
+
     def byte_STORE_SUBSCR(self):
         val, obj, subscr = self.popn(3)
         obj[subscr] = val
@@ -279,7 +925,37 @@ class Frame:
         self.push(self.popn(count))
 
     def byte_BUILD_MAP(self, size):
-        self.push({})
+        if WORDCODE:            # Then the keys and values are on the stack.
+            items = self.popn(2 * size)
+            self.push(dict(zip(items[0::2], items[1::2])))
+        else:
+            self.push({})
+
+    def byte_BUILD_CONST_KEY_MAP(self, count):
+        keys = self.pop()
+        self.push(dict(zip(keys, self.popn(count))))
+
+    def byte_BUILD_SET(self, count):
+        self.push(set(self.popn(count)))
+
+    def byte_BUILD_SLICE(self, count):
+        self.push(slice(*self.popn(count)))
+
+    def byte_BUILD_STRING(self, count):
+        self.push(''.join(self.popn(count)))
+
+    CONVERSIONS = [None, str, repr, ascii]
+
+    def byte_FORMAT_VALUE(self, flags):
+        spec = self.pop() if flags & 0x04 else ''
+        value = self.pop()
+        conversion = self.CONVERSIONS[flags & 0x03]
+        if conversion is not None:
+            value = conversion(value)
+        self.push(format(value, spec))
+
+    def byte_LIST_TO_TUPLE(self):
+        self.push(tuple(self.pop()))
 
     def byte_STORE_MAP(self):
         the_map, val, key = self.popn(3)
@@ -295,6 +971,35 @@ class Frame:
         val = self.pop()
         self.stack[-count].append(val)
 
+    def byte_LIST_EXTEND(self, count):
+        val = self.pop()
+        self.stack[-count].extend(val)
+
+    def byte_SET_ADD(self, count):
+        val = self.pop()
+        self.stack[-count].add(val)
+
+    def byte_SET_UPDATE(self, count):
+        val = self.pop()
+        self.stack[-count].update(val)
+
+    def byte_MAP_ADD(self, count):
+        key, val = self.popn(2)
+        self.stack[-count][key] = val
+
+    def byte_DICT_UPDATE(self, count):
+        val = self.pop()
+        self.stack[-count].update(val)
+
+    def byte_DICT_MERGE(self, count):
+        val = self.pop()
+        the_map = self.stack[-count]
+        for key in val:
+            if key in the_map:
+                raise TypeError("got multiple values for keyword argument %r"
+                                % key)
+        the_map.update(val)
+
     def byte_JUMP_FORWARD(self, jump):
         self.jump(jump)
 
@@ -311,6 +1016,14 @@ class Frame:
         if not val:
             self.jump(jump)
 
+    def byte_POP_JUMP_IF_NONE(self, jump):
+        if self.pop() is None:
+            self.jump(jump)
+
+    def byte_POP_JUMP_IF_NOT_NONE(self, jump):
+        if self.pop() is not None:
+            self.jump(jump)
+
     def byte_JUMP_IF_TRUE_OR_POP(self, jump):
         if self.top():
             self.jump(jump)
@@ -330,13 +1043,25 @@ class Frame:
         self.push(iter(self.pop()))
 
     def byte_FOR_ITER(self, jump):
-        void = object()
-        element = next(self.top(), void)
-        if element is void:
-            self.pop()
-            self.jump(jump)
+        stack = self.stack
+        element = next(stack[-1], _void)
+        if element is _void:
+            stack.pop()
+            self.f_lasti = jump
+        else:
+            stack.append(element)
+
+    def byte_FOR_ITER_STORE(self, jump, name):
+        "FOR_ITER then STORE_FAST or STORE_NAME, as fused by fuse()."
+        element = next(self.stack[-1], _void)
+        if element is _void:
+            self.stack.pop()
+            self.f_lasti = jump
         else:
-            self.push(element)
+            self.f_locals[name] = element
+
+    def byte_END_FOR(self):
+        self.popn(2)
 
     def byte_POP_BLOCK(self):
         pass
@@ -345,14 +1070,33 @@ class Frame:
         assert argc == 1
         raise self.pop()
 
+    def byte_RERAISE(self, oparg):
+        # Only in the clean-up 3.12 adds to comprehensions for when they
+        # raise, which the VM doesn't run.
+        raise self.pop()
+
+    def byte_LOAD_ASSERTION_ERROR(self):
+        self.push(AssertionError)
+
     def byte_MAKE_FUNCTION(self, argc):
+        if WORDCODE:            # Then argc is flags for what's on the stack.
+            return self.make_function(argc)
         name = self.pop()
         code = self.pop()
         defaults = self.popn(argc)
         self.push(Function(name, code, self.f_globals, defaults, None))
 
-    def byte_LOAD_CLOSURE(self, name):
-        self.push(self.cells[name])
+    def make_function(self, flags):
+        code = self.pop()
+        closure   = self.pop() if flags & 0x08 else None
+        _         = self.pop() if flags & 0x04 else None    # Annotations.
+        kwdefaults = self.pop() if flags & 0x02 else None
+        defaults  = self.pop() if flags & 0x01 else ()
+        self.push(Function(None, code, self.f_globals, defaults, closure,
+                           kwdefaults))
+
+    def byte_LOAD_CLOSURE(self, i):
+        self.push(self.cells[i])
 
     def byte_MAKE_CLOSURE(self, argc):
         name = self.pop()
@@ -362,6 +1106,8 @@ class Frame:
         self.push(Function(name, code, globs, defaults, closure))
 
     def byte_CALL_FUNCTION(self, arg):
+        if arg < 4 and not self.defer_calls:
+            return self.call_positional(arg)
         return self.call_function(arg, [], {})
 
     def byte_CALL_FUNCTION_VAR(self, arg):
@@ -376,6 +1122,40 @@ class Frame:
         varargs, kwargs = self.popn(2)
         return self.call_function(arg, varargs, kwargs)
 
+    def call_positional(self, argc):
+        "Call with up to three positional arguments and no keywords."
+        stack = self.stack
+        if argc == 0:
+            func = stack[-1]
+            if type(func) is Function and func._arity == 0:
+                stack[-1] = func.call_exact(())
+            else:
+                stack[-1] = func()
+        elif argc == 1:
+            x = stack.pop()
+            func = stack[-1]
+            if type(func) is Function and func._arity == 1:
+                stack[-1] = func.call_exact((x,))
+            else:
+                stack[-1] = func(x)
+        elif argc == 2:
+            y = stack.pop()
+            x = stack.pop()
+            func = stack[-1]
+            if type(func) is Function and func._arity == 2:
+                stack[-1] = func.call_exact((x, y))
+            else:
+                stack[-1] = func(x, y)
+        else:
+            z = stack.pop()
+            y = stack.pop()
+            x = stack.pop()
+            func = stack[-1]
+            if type(func) is Function and func._arity == 3:
+                stack[-1] = func.call_exact((x, y, z))
+            else:
+                stack[-1] = func(x, y, z)
+
     def call_function(self, oparg, varargs, kwargs):
         len_kw, len_pos = divmod(oparg, 256)
         namedargs = dict([self.popn(2) for i in range(len_kw)])
@@ -383,15 +1163,80 @@ class Frame:
         posargs = self.popn(len_pos)
         posargs.extend(varargs)
         func = self.pop()
+        if self.defer_calls:
+            self.deferred = func, posargs, namedargs
+            return 'call'
+        self.push(func(*posargs, **namedargs))
+
+    def byte_CALL_METHOD(self, argc):
+        if self.stack[-argc - 2] is None:
+            posargs = self.popn(argc)
+            func = self.pop()
+            self.pop()
+        else:
+            posargs = self.popn(argc + 1)
+            func = self.pop()
+        if self.defer_calls:
+            self.deferred = func, posargs, {}
+            return 'call'
+        if type(func) is Function and func._arity == len(posargs):
+            self.push(func.call_exact(posargs))
+        else:
+            self.push(func(*posargs))
+
+    def byte_CALL(self, argc, kw_names):
+        """Call like CALL_METHOD, with the callable and its first argument
+        or None and the callable under the arguments, the last of which
+        go by the `kw_names` of a KW_NAMES before."""
+        stack = self.stack
+        if (argc < 4 and not kw_names and not self.defer_calls
+            and stack[-argc - 2] is None):
+            self.call_positional(argc)
+            result = stack.pop()
+            stack[-1] = result      # Over the None.
+            return
+        namedargs = {}
+        if kw_names:
+            namedargs = dict(zip(kw_names, self.popn(len(kw_names))))
+            argc -= len(kw_names)
+        method = stack[-argc - 2] is not None
+        if method:
+            posargs = self.popn(argc + 1)
+            func = self.pop()
+        else:
+            posargs = self.popn(argc)
+            func = self.pop()
+            self.pop()
+        if self.defer_calls:
+            self.deferred = func, posargs, namedargs
+            return 'call'
+        if (method and not namedargs and type(func) is Function
+            and func._arity == len(posargs)):
+            self.push(func.call_exact(posargs))
+        else:
+            self.push(func(*posargs, **namedargs))
+
+    def byte_CALL_FUNCTION_EX(self, flags):
+        namedargs = self.pop() if flags & 0x01 else {}
+        posargs = list(self.pop())
+        func = self.pop()
+        self.pop()              # The NULL under the callable.
+        if self.defer_calls:
+            self.deferred = func, posargs, namedargs
+            return 'call'
         self.push(func(*posargs, **namedargs))
 
     def byte_RETURN_VALUE(self):
         return 'return'
 
+    def byte_RETURN_CONST(self, const):
+        self.push(const)
+        return 'return'
+
     def byte_IMPORT_NAME(self, name):
-        # XXX ceval.c is slightly different: looks up '__import__' in f_builtins first
         level, fromlist = self.popn(2)
-        val = __import__(name, self.f_globals, self.f_locals, fromlist, level)
+        importer = self.f_builtins.get('__import__', __import__)
+        val = importer(name, self.f_globals, self.f_locals, fromlist, level)
         self.push(val)
 
     def byte_IMPORT_FROM(self, name):
@@ -401,6 +1246,115 @@ class Frame:
     def byte_LOAD_BUILD_CLASS(self):
         self.push(build_class)
 
+def handler_for(byte_name):
+    "Return the function(frame, *arguments) running `byte_name`, or None."
+    if byte_name.startswith('UNARY_'):
+        op = byte_name.replace('UNARY_', '', 1)
+        if op in Frame.UNARY_OPERATORS:
+            return lambda frame: frame.unary_operator(op)
+    elif byte_name.startswith('BINARY_') and byte_name not in OWN_HANDLERS:
+        op = byte_name.replace('BINARY_', '', 1)
+        if op in Frame.BINARY_OPERATORS:
+            return lambda frame: frame.binary_operator(op)
+    else:
+        return getattr(Frame, 'byte_%s' % byte_name, None)
+
+# The dispatch table predecode() uses by default.
+HANDLERS = dict((byte_name, handler_for(byte_name)) for byte_name in
+                [name[len('byte_'):] for name in dir(Frame) if name.startswith('byte_')]
+                + ['UNARY_' + op for op in Frame.UNARY_OPERATORS]
+                + ['BINARY_' + op for op in Frame.BINARY_OPERATORS])
+
+# Instructions with a jump target for an argument, fused ones included.
+JUMPS = {'JUMP_FORWARD', 'JUMP_ABSOLUTE', 'POP_JUMP_IF_FALSE',
+         'POP_JUMP_IF_TRUE', 'JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP',
+         'FOR_ITER', 'SETUP_LOOP', 'FOR_ITER_STORE',
+         'POP_JUMP_IF_NONE', 'POP_JUMP_IF_NOT_NONE'}
+
+# Instructions that call, and ones that build a container, for the
+# instruments sampling after them.
+CALLS = {'CALL_FUNCTION', 'CALL_FUNCTION_VAR', 'CALL_FUNCTION_KW',
+         'CALL_FUNCTION_VAR_KW', 'CALL_METHOD', 'CALL', 'CALL_FUNCTION_EX'}
+BUILDS = {'BUILD_LIST', 'BUILD_MAP', 'BUILD_CONST_KEY_MAP', 'BUILD_SET'}
+
+# Instructions that never fall through to the next one.
+ENDS = {'JUMP_FORWARD', 'JUMP_ABSOLUTE', 'RETURN_VALUE', 'RETURN_CONST',
+        'RAISE_VARARGS', 'RERAISE'}
+
+# byte_name -> function of the raw int argument giving (items popped,
+# items pushed falling through, items pushed when jumping), per Frame's
+# handlers.
+STACK_EFFECTS = {}
+
+def fixed_effect(pops, pushes, jump_pushes=None):
+    return lambda arg: (pops, pushes, jump_pushes)
+
+for byte_name, (pops, pushes) in {
+        'NOP': (0, 0), 'POP_TOP': (1, 0), 'DUP_TOP': (1, 2),
+        'LOAD_CONST': (0, 1), 'LOAD_GLOBAL': (0, 1), 'LOAD_NAME': (0, 1),
+        'STORE_NAME': (1, 0), 'LOAD_FAST': (0, 1), 'STORE_FAST': (1, 0),
+        'LOAD_DEREF': (0, 1), 'STORE_DEREF': (1, 0), 'LOAD_CLOSURE': (0, 1),
+        'COMPARE_OP': (2, 1), 'LOAD_ATTR': (1, 1), 'STORE_ATTR': (2, 0),
+        'STORE_SUBSCR': (3, 0), 'BUILD_MAP': (0, 1), 'STORE_MAP': (3, 1),
+        'GET_ITER': (1, 1), 'POP_BLOCK': (0, 0), 'RAISE_VARARGS': (1, 0),
+        'RETURN_VALUE': (1, 0), 'IMPORT_NAME': (2, 1), 'IMPORT_FROM': (1, 2),
+        'LOAD_BUILD_CLASS': (0, 1), 'LOAD_METHOD': (1, 2),
+        'PUSH_NULL': (0, 1), 'PUSH_NULL_LOAD_GLOBAL': (0, 2),
+        'STORE_GLOBAL': (1, 0), 'BINARY_OP': (2, 1), 'IS_OP': (2, 1),
+        'CONTAINS_OP': (2, 1), 'LOAD_ASSERTION_ERROR': (0, 1),
+        'LIST_TO_TUPLE': (1, 1), 'RETURN_CONST': (0, 1),
+        'LOAD_FAST_AND_CLEAR': (0, 1), 'STORE_FAST_MAYBE_NULL': (1, 0),
+        'LOAD_SUPER_ATTR': (3, 1), 'LOAD_SUPER_METHOD': (3, 2),
+        'BINARY_SLICE': (3, 1), 'STORE_SLICE': (4, 0), 'END_FOR': (2, 0),
+        'RERAISE': (1, 0),
+        }.items():
+    STACK_EFFECTS[byte_name] = fixed_effect(pops, pushes)
+for op in Frame.UNARY_OPERATORS:
+    STACK_EFFECTS['UNARY_' + op] = fixed_effect(1, 1)
+for op in Frame.BINARY_OPERATORS:
+    STACK_EFFECTS['BINARY_' + op] = fixed_effect(2, 1)
+for byte_name in ('JUMP_FORWARD', 'JUMP_ABSOLUTE', 'SETUP_LOOP'):
+    STACK_EFFECTS[byte_name] = fixed_effect(0, 0, 0)
+for byte_name in ('POP_JUMP_IF_FALSE', 'POP_JUMP_IF_TRUE',
+                  'POP_JUMP_IF_NONE', 'POP_JUMP_IF_NOT_NONE'):
+    STACK_EFFECTS[byte_name] = fixed_effect(1, 0, 0)
+for byte_name in ('JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP'):
+    STACK_EFFECTS[byte_name] = fixed_effect(1, 0, 1)
+STACK_EFFECTS['FOR_ITER'] = fixed_effect(1, 2, 0)
+for byte_name in ('BUILD_TUPLE', 'BUILD_LIST', 'BUILD_SET', 'BUILD_SLICE',
+                  'BUILD_STRING'):
+    STACK_EFFECTS[byte_name] = lambda n: (n, 1, None)
+STACK_EFFECTS['UNPACK_SEQUENCE'] = lambda n: (1, n, None)
+for byte_name in ('LIST_APPEND', 'LIST_EXTEND', 'SET_ADD', 'SET_UPDATE',
+                  'DICT_UPDATE', 'DICT_MERGE'):
+    STACK_EFFECTS[byte_name] = lambda n: (n + 1, n, None)
+STACK_EFFECTS['MAP_ADD'] = lambda n: (n + 2, n, None)
+STACK_EFFECTS['COPY'] = lambda i: (i, i + 1, None)
+STACK_EFFECTS['SWAP'] = lambda i: (i, i, None)
+STACK_EFFECTS['BUILD_CONST_KEY_MAP'] = lambda n: (n + 1, 1, None)
+STACK_EFFECTS['FORMAT_VALUE'] = lambda flags: (1 + bool(flags & 0x04), 1, None)
+STACK_EFFECTS['CALL'] = lambda argc: (argc + 2, 1, None)
+STACK_EFFECTS['CALL_FUNCTION_EX'] = lambda flags: (3 + (flags & 0x01), 1, None)
+if WORDCODE:
+    STACK_EFFECTS['BUILD_MAP'] = lambda n: (2 * n, 1, None)
+    STACK_EFFECTS['MAKE_FUNCTION'] = (
+        lambda flags: (1 + bin(flags & 0x0F).count('1'), 1, None))
+else:
+    STACK_EFFECTS['MAKE_FUNCTION'] = lambda argc: (2 + argc, 1, None)
+STACK_EFFECTS['MAKE_CLOSURE'] = lambda argc: (3 + argc, 1, None)
+
+def call_effect(extra):
+    def effect(oparg):
+        len_kw, len_pos = divmod(oparg, 256)
+        return 1 + len_pos + 2 * len_kw + extra, 1, None
+    return effect
+
+STACK_EFFECTS['CALL_FUNCTION'] = call_effect(0)
+STACK_EFFECTS['CALL_FUNCTION_VAR'] = call_effect(1)
+STACK_EFFECTS['CALL_FUNCTION_KW'] = call_effect(1)
+STACK_EFFECTS['CALL_FUNCTION_VAR_KW'] = call_effect(2)
+STACK_EFFECTS['CALL_METHOD'] = lambda argc: (argc + 2, 1, None)
+
 def build_class(func, name, *bases, **kwds):
     if not isinstance(func, Function):
         raise TypeError("func must be a function")
@@ -418,6 +1372,8 @@ def build_class(func, name, *bases, **kwds):
 
     cell = run_frame(func.__code__, func.__closure__,
                      func.__globals__, namespace)
+    if isinstance(namespace.get('__classcell__'), Cell):
+        del namespace['__classcell__']      # Stored by 3.11 class bodies.
 
     cls = metaclass(name, bases, namespace)
     if isinstance(cell, Cell):
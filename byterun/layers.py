@@ -0,0 +1,41 @@
+"""Copy-on-write globals: a shared, read-only base under a cheap overlay.
+
+A Shared namespace merges a large module namespace with the builtins,
+once, into a read-only mapping. Each overlay() is a plain dict whose
+'__builtins__' is that mapping: the guest's writes land in the overlay,
+its reads find the overlay first and the shared names after it, where
+the VM, and native code, already look for builtins. LOAD_NAME and
+STORE_NAME stay the plain dict operations they were, and discarding an
+overlay is just dropping the dict.
+
+The base is shallow-shared: a guest can rebind a shared name in its
+overlay but not delete one, and mutating a shared object mutates it
+for everyone. Call refresh() after changing the base.
+"""
+
+import builtins, types
+
+class Shared:
+    def __init__(self, namespace, f_builtins=None):
+        self.namespace = namespace
+        self.f_builtins = builtins.__dict__ if f_builtins is None else f_builtins
+        self.refresh()
+
+    def refresh(self):
+        "Take in changes to the namespace. Existing overlays keep the old view."
+        merged = dict(self.f_builtins)
+        merged.update(self.namespace)
+        merged.pop('__builtins__', None)
+        self.view = types.MappingProxyType(merged)
+
+    def overlay(self, initial=()):
+        "Return a fresh globals dict over the shared namespace."
+        f_globals = dict(initial)
+        f_globals['__builtins__'] = self.view
+        return f_globals
+
+    def get(self, f_globals, name, default=None):
+        "Look `name` up in an overlay as the guest would."
+        if name in f_globals:
+            return f_globals[name]
+        return f_globals['__builtins__'].get(name, default)
@@ -0,0 +1,150 @@
+"""Memory accounting and limits for guest code.
+
+A Tracker runs the code objects it's given on predecoded streams that
+sample tracemalloc's count of the memory allocated since the run began:
+on entering and leaving a frame, after calls and after building a list,
+dict or set, and at backward jumps. Going over the limit at a sample
+raises MemoryExceeded with the guest's stack at that point, so a guest
+can allocate at most one call or one loop iteration's worth past it.
+
+It keeps the run's peak, and for each code object the highest peak of
+its frames, counting what they allocated directly and through calls.
+These come from the samples, so they may miss a short-lived high point
+between two; the run's peak doesn't when tracemalloc can tell it.
+
+tracemalloc counts every allocation in the process, the VM's own
+included, while the guest runs.
+
+Every frame the VM runs during a tracked run is sampled, of the code
+given or not. While tracked, code isn't promoted to native functions,
+which would escape the samples, and Functions already promoted run in
+the VM.
+"""
+
+import tracemalloc
+
+from . import interpreter
+from .interpreter import (BUILDS, CALLS, JUMPS, VirtualMachineError, decode,
+                          fuse, predecode, run_stream)
+
+class MemoryExceeded(VirtualMachineError):
+    """Raised when a Tracker's limit runs out. `used` is the memory in
+    bytes allocated since the run began and `guest_stack` a list of
+    (filename, name, line) for the guest frames running, outermost first."""
+
+    def __init__(self, limit, used, guest_stack):
+        VirtualMachineError.__init__(
+            self, "memory limit of %d bytes exceeded" % limit)
+        self.limit = limit
+        self.used = used
+        self.guest_stack = guest_stack
+
+def run(code, f_globals, f_locals, limit=None):
+    "Run `code` within `limit` bytes; return its peak memory use."
+    tracker = Tracker(limit)
+    tracker.run(code, f_globals, f_locals)
+    return tracker.peak
+
+class Tracker:
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.peak = 0
+        self.peaks = {}         # Code -> the highest peak of its frames.
+        self.frames = []        # [frame, memory on entry, peak] for each
+                                # guest frame running, outermost first.
+        self.baseline = 0
+        self.streams = {}       # Code -> its sampling stream.
+        self.saved = {}         # Code -> the executor it had before, or None.
+
+    def run(self, code, f_globals, f_locals):
+        "Run `code` tracked; within another run, e.g. to import, add to it."
+        if self.saved:
+            self.install(code)
+            return interpreter.run(code, f_globals, f_locals)
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        exact = started or hasattr(tracemalloc, 'reset_peak')
+        self.baseline = tracemalloc.get_traced_memory()[0]
+        self.install(code)
+        try:
+            return interpreter.run(code, f_globals, f_locals)
+        finally:
+            self.uninstall()
+            if exact:
+                self.peak = max(self.peak,
+                                tracemalloc.get_traced_memory()[1] - self.baseline)
+            if started:
+                tracemalloc.stop()
+
+    def install(self, code):
+        "Track `code`, the code objects nested in it and any other code run."
+        interpreter.install_executors(code, self.executor, self.saved, True)
+
+    def uninstall(self):
+        interpreter.restore_executors(self.saved)
+
+    def executor(self, code):
+        stream = self.streams.get(code)
+        if stream is None:
+            stream = self.streams[code] = self.sampling_stream(code)
+        return lambda frame: self.execute(frame, stream)
+
+    def execute(self, frame, stream):
+        used = self.used()
+        self.frames.append([frame, used, used])
+        try:
+            self.sample()
+            return run_stream(frame, stream)
+        finally:
+            self.note(self.used())
+            _, entry, peak = self.frames.pop()
+            if self.frames and self.frames[-1][2] < peak:
+                self.frames[-1][2] = peak
+            code = frame.f_code
+            self.peaks[code] = max(self.peaks.get(code, 0), peak - entry)
+
+    def used(self):
+        return tracemalloc.get_traced_memory()[0] - self.baseline
+
+    def note(self, used):
+        if self.frames[-1][2] < used:
+            self.frames[-1][2] = used
+        if self.peak < used:
+            self.peak = used
+
+    def sample(self):
+        used = self.used()
+        self.note(used)
+        if self.limit is not None and self.limit < used:
+            raise MemoryExceeded(self.limit, used,
+                                 [(frame.f_code.co_filename, frame.f_code.co_name,
+                                   frame.f_lineno) for frame, _, _ in self.frames])
+
+    def sampling_stream(self, code):
+        stream = predecode(code)
+        for offset, byte_name, arguments, next_offset in fuse(decode(code)):
+            handler = stream[offset][0]
+            if byte_name in CALLS or byte_name in BUILDS:
+                handler = sampling_after(handler, self)
+            elif byte_name in JUMPS and arguments[0] <= offset:
+                handler = sampling_before(handler, self)
+            else:
+                continue
+            stream[offset] = handler, arguments, next_offset
+        return stream
+
+def sampling_after(handler, tracker):
+    def handle(frame, *arguments):
+        outcome = handler(frame, *arguments)
+        tracker.sample()
+        return outcome
+    return handle
+
+def sampling_before(handler, tracker):
+    def handle(frame, *arguments):
+        tracker.sample()
+        return handler(frame, *arguments)
+    return handle
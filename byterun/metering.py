@@ -0,0 +1,109 @@
+"""Instruction budgets and metering for guest code.
+
+A Meter runs the code objects it's given on predecoded streams where
+the first instruction of each basic block adds the block's length to
+the meter's count, so the count of instructions run is exact and the
+same from run to run. The budget is checked at backward jumps and
+before calls, so a guest can't loop or recurse for long past it; going
+over raises BudgetExceeded with the guest's stack at that point.
+
+Every frame the VM runs during a metered run is metered, of the code
+given or not, e.g. of a function defined before the run. While metered,
+code isn't promoted to native functions, which would escape the meter,
+and Functions already promoted run in the VM.
+"""
+
+from . import interpreter
+from .interpreter import (CALLS, JUMPS, VirtualMachineError, block_starts,
+                          decode, fuse, predecode, run_stream)
+
+class BudgetExceeded(VirtualMachineError):
+    """Raised when a Meter's budget runs out. `count` is the number of
+    instructions run and `guest_stack` a list of (filename, name, line)
+    for the guest frames running, outermost first."""
+
+    def __init__(self, budget, count, guest_stack):
+        VirtualMachineError.__init__(
+            self, "instruction budget of %d exceeded" % budget)
+        self.budget = budget
+        self.count = count
+        self.guest_stack = guest_stack
+
+def run(code, f_globals, f_locals, budget=None):
+    "Run `code` within `budget` instructions; return how many it ran."
+    meter = Meter(budget)
+    meter.run(code, f_globals, f_locals)
+    return meter.count
+
+class Meter:
+    def __init__(self, budget=None, table=None):
+        self.budget = budget
+        self.table = table      # The dispatch table, if not HANDLERS.
+        self.count = 0
+        self.frames = []        # The guest frames running, outermost first.
+        self.streams = {}       # Code -> its metered stream.
+        self.saved = {}         # Code -> the executor it had before, or None.
+
+    def run(self, code, f_globals, f_locals):
+        "Run `code` metered; within another run, e.g. to import, add to it."
+        outermost = not self.saved
+        self.install(code)
+        try:
+            return interpreter.run(code, f_globals, f_locals)
+        finally:
+            if outermost:
+                self.uninstall()
+
+    def install(self, code):
+        "Meter `code`, the code objects nested in it and any other code run."
+        interpreter.install_executors(code, self.executor, self.saved, True)
+
+    def uninstall(self):
+        interpreter.restore_executors(self.saved)
+
+    def executor(self, code):
+        stream = self.streams.get(code)
+        if stream is None:
+            stream = self.streams[code] = self.metered_stream(code)
+        return lambda frame: self.execute(frame, stream)
+
+    def execute(self, frame, stream):
+        self.frames.append(frame)
+        try:
+            return run_stream(frame, stream)
+        finally:
+            self.frames.pop()
+
+    def check(self):
+        if self.budget is not None and self.budget < self.count:
+            raise BudgetExceeded(self.budget, self.count,
+                                 [(frame.f_code.co_filename, frame.f_code.co_name,
+                                   frame.f_lineno) for frame in self.frames])
+
+    def metered_stream(self, code):
+        instructions = fuse(decode(code))
+        starts = block_starts(instructions)
+        stream = predecode(code, self.table)
+        size = 0
+        for offset, byte_name, arguments, next_offset in reversed(instructions):
+            handler = stream[offset][0]
+            if byte_name in CALLS or (byte_name in JUMPS and arguments[0] <= offset):
+                handler = checking(handler, self)
+            size += 1
+            if offset in starts:
+                handler = counting(handler, self, size)
+                size = 0
+            stream[offset] = handler, arguments, next_offset
+        return stream
+
+def counting(handler, meter, size):
+    def handle(frame, *arguments):
+        meter.count += size
+        return handler(frame, *arguments)
+    return handle
+
+def checking(handler, meter):
+    def handle(frame, *arguments):
+        meter.check()
+        return handler(frame, *arguments)
+    return handle
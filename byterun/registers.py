@@ -0,0 +1,704 @@
+"""A register-based form of byterun code, and an executor for it.
+
+translate() turns a code object into a list of register instructions
+over one flat register file per frame: the fast locals come first,
+then one register per constant, then one per stack slot. The operand
+stack is simulated at translation time, so LOAD_FAST, LOAD_CONST and
+DUP_TOP just name an existing register and emit nothing, and a
+STORE_FAST usually becomes the destination of the instruction that
+computed the value. At jump targets every live stack value sits in
+its own slot register, so the paths that meet there agree.
+
+Code using an opcode we don't translate is left to the stack machine.
+Run `python -m byterun.registers file.py` to compare the two.
+"""
+
+import sys, time
+
+from . import interpreter
+from .interpreter import WORDCODE, Frame, Function, build_class, decode
+
+class Untranslatable(Exception):
+    pass
+
+# What install() replaced, for uninstall().
+_saved = {}
+
+def install(code):
+    """Translate `code` and the code objects nested in it, and have
+    the VM run them in registers until uninstall(). Return how many
+    were newly installed."""
+    installed = len(_saved)
+    interpreter.install_executors(code, register_executor, _saved)
+    return len(_saved) - installed
+
+def uninstall():
+    "Put back whatever ran the code install() translated."
+    interpreter.restore_executors(_saved)
+
+def register_executor(code):
+    try:
+        return translate(code).execute
+    except Untranslatable:
+        return None
+
+def run(code, f_globals, f_locals):
+    install(code)
+    return interpreter.run(code, f_globals, f_locals)
+
+unbound = object()
+
+class RegisterCode:
+    def __init__(self, code, instructions):
+        self.code = code
+        self.instructions = instructions    # [(name, handler, dst, operands)]
+        self.program = [(handler, dst, operands)
+                        for _, handler, dst, operands in instructions]
+        nlocals = len(code.co_varnames)
+        self.template = ([unbound] * nlocals + list(code.co_consts)
+                         + [None] * code.co_stacksize)
+        self.params = tuple(enumerate(code.co_varnames))
+
+    def execute(self, frame):
+        regs = self.template[:]
+        f_locals = frame.f_locals
+        for i, name in self.params:
+            if name in f_locals:
+                regs[i] = f_locals[name]
+        program = self.program
+        pc = 0
+        while True:
+            handler, dst, operands = program[pc]
+            pc += 1
+            if handler is r_return:
+                return regs[dst]
+            target = handler(regs, frame, dst, *operands)
+            if target is not None:
+                pc = target
+
+    def dump(self, file=None):
+        file = file or sys.stdout
+        for pc, (name, _, dst, operands) in enumerate(self.instructions):
+            print('%4d %-16s %-5s %s' % (pc, name, '' if dst is None else dst,
+                                        ' '.join(map(repr, operands))),
+                  file=file)
+
+def translate(code):
+    return Translator(code).translate()
+
+class Translator:
+    def __init__(self, code):
+        self.code = code
+        self.nlocals = len(code.co_varnames)
+        self.base = self.nlocals + len(code.co_consts)
+        self.instructions = []
+        self.stack = []             # Registers holding the operand stack.
+        self.depth_at = {}          # jump target -> stack depth there
+        self.pc_at = {}             # offset -> index into instructions
+        self.jumps = []             # indexes of instructions to patch
+        self.block_start = 0
+        self.assigned = set()       # Locals surely bound in this block.
+        nparams = (code.co_argcount + bool(code.co_flags & 0x04)
+                   + bool(code.co_flags & 0x08))
+        self.params = set(code.co_varnames[:nparams])
+
+    def translate(self):
+        instructions = decode(self.code)
+        targets = set()
+        for _, byte_name, arguments, _ in instructions:
+            if byte_name in JUMPS:
+                targets.add(arguments[0])
+        reachable = True
+        for offset, byte_name, arguments, next_offset in instructions:
+            if offset in targets:
+                if reachable:
+                    self.materialize()
+                    self.arrive(offset, len(self.stack))
+                elif offset in self.depth_at:
+                    self.stack = [self.slot(i) for i in range(self.depth_at[offset])]
+                    reachable = True
+                self.block_start = len(self.instructions)
+                self.assigned = set()
+            if not reachable:
+                continue
+            self.pc_at[offset] = len(self.instructions)
+            translator = translators.get(byte_name)
+            if translator is None:
+                raise Untranslatable(byte_name)
+            reachable = translator(self, *arguments) is not STOP
+        for pc in self.jumps:
+            name, handler, dst, operands = self.instructions[pc]
+            target = operands[-1]
+            if target not in self.pc_at:
+                raise Untranslatable('jump into code we skipped')
+            self.instructions[pc] = (name, handler, dst,
+                                     operands[:-1] + (self.pc_at[target],))
+        return RegisterCode(self.code, self.instructions)
+
+    def slot(self, depth):
+        return self.base + depth
+
+    def const(self, index):
+        return self.nlocals + index
+
+    def local(self, name):
+        return self.code.co_varnames.index(name)
+
+    def emit(self, name, dst, *operands):
+        self.instructions.append((name, handlers[name], dst, operands))
+
+    def emit_jump(self, name, dst, *operands):
+        "Emit a jump; its last operand is an offset to patch later."
+        self.arrive(operands[-1], len(self.stack))
+        self.jumps.append(len(self.instructions))
+        self.emit(name, dst, *operands)
+
+    def arrive(self, target, depth):
+        if self.depth_at.setdefault(target, depth) != depth:
+            raise Untranslatable('inconsistent stack depth at %d' % target)
+
+    def push_new(self):
+        "Push a fresh slot register and return it, for an instruction's result."
+        reg = self.slot(len(self.stack))
+        self.stack.append(reg)
+        return reg
+
+    def pop(self):
+        return self.stack.pop()
+
+    def popn(self, n):
+        values = self.stack[len(self.stack) - n:]
+        del self.stack[len(self.stack) - n:]
+        return values
+
+    def materialize(self, only=None):
+        "Move stack values into their own slots (just aliases of `only`)."
+        for depth, reg in enumerate(self.stack):
+            if reg != self.slot(depth) and (only is None or reg == only):
+                self.emit('move', self.slot(depth), reg)
+                self.stack[depth] = self.slot(depth)
+
+STOP = object()     # Returned by translators after which code is unreachable.
+
+JUMPS = {'JUMP_FORWARD', 'JUMP_ABSOLUTE', 'POP_JUMP_IF_FALSE',
+         'POP_JUMP_IF_TRUE', 'JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP',
+         'POP_JUMP_IF_NONE', 'POP_JUMP_IF_NOT_NONE', 'FOR_ITER', 'SETUP_LOOP'}
+
+translators = {}
+
+def translates(*byte_names):
+    def register(translator):
+        for byte_name in byte_names:
+            translators[byte_name] = translator
+        return translator
+    return register
+
+@translates('NOP', 'POP_BLOCK')
+def t_nothing(t):
+    pass
+
+@translates('SETUP_LOOP')
+def t_setup_loop(t, dest):
+    t.arrive(dest, len(t.stack))
+
+@translates('POP_TOP')
+def t_pop_top(t):
+    t.pop()
+
+@translates('DUP_TOP')
+def t_dup_top(t):
+    t.stack.append(t.stack[-1])
+
+@translates('COPY')
+def t_copy(t, i):
+    t.stack.append(t.stack[-i])
+
+@translates('SWAP')
+def t_swap(t, i):
+    t.materialize()
+    t.emit('swap', None, t.stack[-i], t.stack[-1])
+
+@translates('PUSH_NULL')
+def t_push_null(t):
+    t.emit('null', t.push_new())
+
+@translates('LOAD_CONST')
+def t_load_const(t, const):
+    index = [i for i, c in enumerate(t.code.co_consts)
+             if c is const][0]
+    t.stack.append(t.const(index))
+
+@translates('LOAD_FAST')
+def t_load_fast(t, name):
+    reg = t.local(name)
+    if name not in t.params and name not in t.assigned:
+        t.emit('check_bound', reg, name)
+        t.assigned.add(name)
+    t.stack.append(reg)
+
+@translates('STORE_FAST')
+def t_store_fast(t, name):
+    reg = t.local(name)
+    t.materialize(only=reg)
+    src = t.pop()
+    last = t.instructions[-1] if t.block_start < len(t.instructions) else None
+    if (last is not None and last[2] == src and src not in t.stack
+        and src >= t.base and last[0] in RETARGETABLE):
+        t.instructions[-1] = (last[0], last[1], reg, last[3])
+    else:
+        t.emit('move', reg, src)
+    t.assigned.add(name)
+
+def loading(handler_name):
+    def translate(t, name):
+        t.emit(handler_name, t.push_new(), name)
+    return translate
+
+translators['LOAD_NAME'] = loading('load_name')
+translators['LOAD_GLOBAL'] = loading('load_global')
+translators['LOAD_DEREF'] = loading('load_deref')
+translators['LOAD_CLOSURE'] = loading('load_closure')
+
+@translates('PUSH_NULL_LOAD_GLOBAL')
+def t_push_null_load_global(t, name):
+    t_push_null(t)
+    t.emit('load_global', t.push_new(), name)
+
+@translates('STORE_NAME')
+def t_store_name(t, name):
+    t.emit('store_name', None, name, t.pop())
+
+@translates('STORE_DEREF')
+def t_store_deref(t, i):
+    t.emit('store_deref', None, i, t.pop())
+
+def t_unary(fn):
+    def translate(t):
+        x = t.pop()
+        t.emit('unary', t.push_new(), fn, x)
+    return translate
+
+def t_binary(fn):
+    def translate(t):
+        x, y = t.popn(2)
+        t.emit('binary', t.push_new(), fn, x, y)
+    return translate
+
+for op, fn in Frame.UNARY_OPERATORS.items():
+    translators['UNARY_' + op] = t_unary(fn)
+for op, fn in Frame.BINARY_OPERATORS.items():
+    translators['BINARY_' + op] = t_binary(fn)
+
+@translates('BINARY_OP')
+def t_binary_op(t, op):
+    t_binary(Frame.NB_OPERATORS[op])(t)
+
+@translates('COMPARE_OP')
+def t_compare_op(t, opnum):
+    t_binary(Frame.COMPARE_OPERATORS[opnum])(t)
+
+@translates('CONTAINS_OP')
+def t_contains_op(t, invert):
+    t_compare_op(t, 6 + invert)     # 'in' or 'not in'.
+
+@translates('IS_OP')
+def t_is_op(t, invert):
+    t_compare_op(t, 8 + invert)     # 'is' or 'is not'.
+
+@translates('LOAD_METHOD')
+def t_load_method(t, name):
+    obj = t.pop()
+    first = t.push_new()
+    t.emit('load_method', first, obj, name, t.push_new())
+
+@translates('LOAD_ATTR')
+def t_load_attr(t, attr):
+    obj = t.pop()
+    t.emit('load_attr', t.push_new(), obj, attr)
+
+@translates('STORE_ATTR')
+def t_store_attr(t, attr):
+    value, obj = t.popn(2)
+    t.emit('store_attr', None, obj, attr, value)
+
+@translates('STORE_SUBSCR')
+def t_store_subscr(t):
+    value, obj, subscr = t.popn(3)
+    t.emit('store_subscr', None, obj, subscr, value)
+
+@translates('BUILD_TUPLE')
+def t_build_tuple(t, count):
+    items = tuple(t.popn(count))
+    t.emit('build_tuple', t.push_new(), items)
+
+@translates('BUILD_LIST')
+def t_build_list(t, count):
+    items = tuple(t.popn(count))
+    t.emit('build_list', t.push_new(), items)
+
+@translates('BUILD_MAP')
+def t_build_map(t, size):
+    items = tuple(t.popn(2 * size)) if WORDCODE else ()
+    t.emit('build_map', t.push_new(), items)
+
+@translates('BUILD_CONST_KEY_MAP')
+def t_build_const_key_map(t, count):
+    keys = t.pop()
+    values = tuple(t.popn(count))
+    t.emit('build_const_key_map', t.push_new(), keys, values)
+
+@translates('STORE_MAP')
+def t_store_map(t):
+    the_map, value, key = t.popn(3)
+    t.emit('store_subscr', None, the_map, key, value)
+    t.stack.append(the_map)
+
+@translates('UNPACK_SEQUENCE')
+def t_unpack_sequence(t, count):
+    seq = t.pop()
+    regs = [t.push_new() for _ in range(count)]
+    regs.reverse()
+    t.emit('unpack_sequence', None, seq, tuple(regs))
+
+@translates('LIST_APPEND')
+def t_list_append(t, count):
+    value = t.pop()
+    t.emit('list_append', None, t.stack[-count], value)
+
+@translates('GET_ITER')
+def t_get_iter(t):
+    x = t.pop()
+    t.emit('get_iter', t.push_new(), x)
+
+@translates('FOR_ITER')
+def t_for_iter(t, target):
+    t.materialize()
+    t.arrive(target, len(t.stack) - 1)
+    iterator = t.stack[-1]
+    t.jumps.append(len(t.instructions))
+    t.emit('for_iter', t.push_new(), iterator, target)
+
+@translates('JUMP_FORWARD', 'JUMP_ABSOLUTE')
+def t_jump(t, target):
+    t.materialize()
+    t.emit_jump('jump', None, target)
+    return STOP
+
+@translates('POP_JUMP_IF_FALSE')
+def t_pop_jump_if_false(t, target):
+    x = t.pop()
+    t.materialize()
+    t.emit_jump('jump_if_false', None, x, target)
+
+@translates('POP_JUMP_IF_TRUE')
+def t_pop_jump_if_true(t, target):
+    x = t.pop()
+    t.materialize()
+    t.emit_jump('jump_if_true', None, x, target)
+
+@translates('POP_JUMP_IF_NONE')
+def t_pop_jump_if_none(t, target):
+    x = t.pop()
+    t.materialize()
+    t.emit_jump('jump_if_none', None, x, target)
+
+@translates('POP_JUMP_IF_NOT_NONE')
+def t_pop_jump_if_not_none(t, target):
+    x = t.pop()
+    t.materialize()
+    t.emit_jump('jump_if_not_none', None, x, target)
+
+@translates('JUMP_IF_FALSE_OR_POP')
+def t_jump_if_false_or_pop(t, target):
+    t.materialize()
+    t.emit_jump('jump_if_false', None, t.stack[-1], target)
+    t.pop()
+
+@translates('JUMP_IF_TRUE_OR_POP')
+def t_jump_if_true_or_pop(t, target):
+    t.materialize()
+    t.emit_jump('jump_if_true', None, t.stack[-1], target)
+    t.pop()
+
+@translates('RAISE_VARARGS')
+def t_raise_varargs(t, argc):
+    if argc != 1:
+        raise Untranslatable('RAISE_VARARGS %d' % argc)
+    t.emit('raise', None, t.pop())
+    return STOP
+
+@translates('RETURN_VALUE')
+def t_return_value(t):
+    t.emit('return', t.pop())
+    return STOP
+
+@translates('RETURN_CONST')
+def t_return_const(t, const):
+    t_load_const(t, const)
+    return t_return_value(t)
+
+@translates('MAKE_FUNCTION')
+def t_make_function(t, argc):
+    if WORDCODE:
+        return t_make_function_flags(t, argc)
+    name, code = t.pop(), t.pop()
+    defaults = tuple(t.popn(argc))
+    t.emit('make_function', t.push_new(), name, code, defaults, None)
+
+def t_make_function_flags(t, flags):
+    code = t.pop()
+    closure = t.pop() if flags & 0x08 else None
+    if flags & 0x04:
+        raise Untranslatable('annotations')
+    kwdefaults = t.pop() if flags & 0x02 else None
+    defaults = t.pop() if flags & 0x01 else None
+    t.emit('make_function_flags', t.push_new(), code, defaults, closure,
+           kwdefaults)
+
+@translates('MAKE_CLOSURE')
+def t_make_closure(t, argc):
+    name = t.pop()
+    closure, code = t.popn(2)
+    defaults = tuple(t.popn(argc))
+    t.emit('make_function', t.push_new(), name, code, defaults, closure)
+
+def t_call(has_varargs, has_kwargs):
+    def translate(t, oparg):
+        kwargs = t.pop() if has_kwargs else None
+        varargs = t.pop() if has_varargs else None
+        len_kw, len_pos = divmod(oparg, 256)
+        named = tuple(t.popn(2 * len_kw))
+        posargs = tuple(t.popn(len_pos))
+        func = t.pop()
+        t.emit('call', t.push_new(), func, posargs, named, varargs, kwargs)
+    return translate
+
+translators['CALL_FUNCTION'] = t_call(False, False)
+translators['CALL_FUNCTION_VAR'] = t_call(True, False)
+translators['CALL_FUNCTION_KW'] = t_call(False, True)
+translators['CALL_FUNCTION_VAR_KW'] = t_call(True, True)
+
+@translates('CALL')
+def t_call_wordcode(t, argc, kw_names):
+    args = tuple(t.popn(argc))
+    first, second = t.popn(2)
+    t.emit('call_method', t.push_new(), first, second, args, kw_names)
+
+@translates('CALL_FUNCTION_EX')
+def t_call_function_ex(t, flags):
+    kwargs = t.pop() if flags & 0x01 else None
+    varargs = t.pop()
+    func = t.pop()
+    t.pop()                         # The NULL.
+    t.emit('call', t.push_new(), func, (), (), varargs, kwargs)
+
+@translates('IMPORT_NAME')
+def t_import_name(t, name):
+    level, fromlist = t.popn(2)
+    t.emit('import_name', t.push_new(), name, level, fromlist)
+
+@translates('IMPORT_FROM')
+def t_import_from(t, name):
+    module = t.stack[-1]
+    t.emit('import_from', t.push_new(), module, name)
+
+@translates('LOAD_BUILD_CLASS')
+def t_load_build_class(t):
+    t.emit('load_build_class', t.push_new())
+
+# Instructions whose destination a following STORE_FAST can take over.
+RETARGETABLE = {'load_name', 'load_global', 'load_deref', 'unary', 'binary',
+                'load_attr', 'build_tuple', 'build_list', 'get_iter',
+                'for_iter', 'call', 'call_method', 'import_name',
+                'import_from', 'move'}
+
+# The handlers take (registers, frame, destination register, operands...)
+# and return a new instruction index to jump there.
+
+def r_move(regs, frame, dst, src):
+    regs[dst] = regs[src]
+
+def r_swap(regs, frame, dst, x, y):
+    regs[x], regs[y] = regs[y], regs[x]
+
+def r_null(regs, frame, dst):
+    regs[dst] = None
+
+def r_check_bound(regs, frame, reg, name):
+    if regs[reg] is unbound:
+        raise UnboundLocalError(
+            "local variable '%s' referenced before assignment" % name)
+
+def r_load_name(regs, frame, dst, name):
+    frame.byte_LOAD_NAME(name)
+    regs[dst] = frame.stack.pop()
+
+def r_load_global(regs, frame, dst, name):
+    frame.byte_LOAD_GLOBAL(name)
+    regs[dst] = frame.stack.pop()
+
+def r_load_deref(regs, frame, dst, i):
+    regs[dst] = frame.cells[i].contents
+
+def r_load_closure(regs, frame, dst, i):
+    regs[dst] = frame.cells[i]
+
+def r_store_name(regs, frame, dst, name, src):
+    frame.f_locals[name] = regs[src]
+
+def r_store_deref(regs, frame, dst, i, src):
+    frame.cells[i].contents = regs[src]
+
+def r_unary(regs, frame, dst, fn, x):
+    regs[dst] = fn(regs[x])
+
+def r_binary(regs, frame, dst, fn, x, y):
+    regs[dst] = fn(regs[x], regs[y])
+
+def r_load_attr(regs, frame, dst, obj, attr):
+    regs[dst] = getattr(regs[obj], attr)
+
+def r_load_method(regs, frame, dst, obj, name, second):
+    frame.stack.append(regs[obj])
+    frame.byte_LOAD_METHOD(name)
+    regs[second] = frame.stack.pop()
+    regs[dst] = frame.stack.pop()
+
+def r_store_attr(regs, frame, dst, obj, attr, value):
+    setattr(regs[obj], attr, regs[value])
+
+def r_store_subscr(regs, frame, dst, obj, subscr, value):
+    regs[obj][regs[subscr]] = regs[value]
+
+def r_build_tuple(regs, frame, dst, items):
+    regs[dst] = tuple([regs[item] for item in items])
+
+def r_build_list(regs, frame, dst, items):
+    regs[dst] = [regs[item] for item in items]
+
+def r_build_map(regs, frame, dst, items):
+    regs[dst] = dict((regs[items[i]], regs[items[i+1]])
+                     for i in range(0, len(items), 2))
+
+def r_build_const_key_map(regs, frame, dst, keys, values):
+    regs[dst] = dict(zip(regs[keys], [regs[value] for value in values]))
+
+def r_unpack_sequence(regs, frame, dst, seq, targets):
+    for target, value in zip(targets, regs[seq]):
+        regs[target] = value
+
+def r_list_append(regs, frame, dst, the_list, value):
+    regs[the_list].append(regs[value])
+
+def r_get_iter(regs, frame, dst, x):
+    regs[dst] = iter(regs[x])
+
+void = object()
+
+def r_for_iter(regs, frame, dst, iterator, target):
+    element = next(regs[iterator], void)
+    if element is void:
+        return target
+    regs[dst] = element
+
+def r_jump(regs, frame, dst, target):
+    return target
+
+def r_jump_if_false(regs, frame, dst, x, target):
+    if not regs[x]:
+        return target
+
+def r_jump_if_true(regs, frame, dst, x, target):
+    if regs[x]:
+        return target
+
+def r_jump_if_none(regs, frame, dst, x, target):
+    if regs[x] is None:
+        return target
+
+def r_jump_if_not_none(regs, frame, dst, x, target):
+    if regs[x] is not None:
+        return target
+
+def r_raise(regs, frame, dst, x):
+    raise regs[x]
+
+def r_return(regs, frame, src):
+    return regs[src]
+
+def r_make_function(regs, frame, dst, name, code, defaults, closure):
+    regs[dst] = Function(regs[name], regs[code], frame.f_globals,
+                         [regs[d] for d in defaults],
+                         None if closure is None else regs[closure])
+
+def r_make_function_flags(regs, frame, dst, code, defaults, closure,
+                          kwdefaults):
+    regs[dst] = Function(None, regs[code], frame.f_globals,
+                         () if defaults is None else regs[defaults],
+                         None if closure is None else regs[closure],
+                         None if kwdefaults is None else regs[kwdefaults])
+
+def r_call(regs, frame, dst, func, posargs, named, varargs, kwargs):
+    namedargs = dict((regs[named[i]], regs[named[i+1]])
+                     for i in range(0, len(named), 2))
+    if kwargs is not None:
+        namedargs.update(regs[kwargs])
+    args = [regs[arg] for arg in posargs]
+    if varargs is not None:
+        args.extend(regs[varargs])
+    regs[dst] = regs[func](*args, **namedargs)
+
+def r_call_method(regs, frame, dst, first, second, posargs, kw_names):
+    """Call as CALL does: `first` holds the callable and `second` its
+    first argument, or `first` None and `second` the callable."""
+    args = [regs[arg] for arg in posargs]
+    if regs[first] is None:
+        func = regs[second]
+    else:
+        func = regs[first]
+        args.insert(0, regs[second])
+    namedargs = {}
+    if kw_names:
+        namedargs = dict(zip(kw_names, args[len(args) - len(kw_names):]))
+        del args[len(args) - len(kw_names):]
+    regs[dst] = func(*args, **namedargs)
+
+def r_import_name(regs, frame, dst, name, level, fromlist):
+    importer = frame.f_builtins.get('__import__', __import__)
+    regs[dst] = importer(name, frame.f_globals, frame.f_locals,
+                         regs[fromlist], regs[level])
+
+def r_import_from(regs, frame, dst, module, name):
+    regs[dst] = getattr(regs[module], name)
+
+def r_load_build_class(regs, frame, dst):
+    regs[dst] = build_class
+
+handlers = dict((name[2:], fn) for name, fn in list(globals().items())
+                if name.startswith('r_'))
+
+def compare(code, number=3):
+    "Time running module `code` on the stack machine and in registers."
+    times = {}
+    for mode in ('stack', 'registers'):
+        saved = dict(interpreter.executors)
+        if mode == 'registers':
+            install(code)
+        best = None
+        for _ in range(number):
+            start = time.perf_counter()
+            interpreter.run(code, {'__name__': '__main__'}, None)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        interpreter.executors.clear()
+        interpreter.executors.update(saved)
+        times[mode] = best
+    return times
+
+if __name__ == '__main__':
+    filename = sys.argv[1]
+    with open(filename) as f:
+        times = compare(compile(f.read(), filename, 'exec'))
+    print('stack     %.3fs' % times['stack'])
+    print('registers %.3fs  (%.2fx)' % (times['registers'],
+                                        times['stack'] / times['registers']))
@@ -0,0 +1,225 @@
+"""Cooperative scheduling of many guest executions in one host thread.
+
+Each task is a module frame driven through Frame.run_yielding(). A task
+runs until it has used up its quantum of instructions, counted at the
+safe points (backward jumps and guest calls), then goes to the back of
+the ready queue. Guest code can also block on the traps defined here --
+sleep(), wait_readable(), wait_writable() -- which park the task while
+the others run. Outside a scheduler the traps just block.
+"""
+
+import collections, heapq, itertools, select, selectors, time
+
+from .interpreter import Trap, module_frame
+
+def _block_until_readable(fileobj):
+    select.select([fileobj], [], [])
+
+def _block_until_writable(fileobj):
+    select.select([], [fileobj], [])
+
+sleep         = Trap('sleep', time.sleep)
+wait_readable = Trap('wait_readable', _block_until_readable)
+wait_writable = Trap('wait_writable', _block_until_writable)
+
+class Cancelled(Exception):
+    "Raised by Task.result() for a task that was cancelled."
+
+class Task:
+    def __init__(self, frame, priority, name):
+        self.frame = frame
+        self.steps = frame.run_yielding()
+        self.priority = priority
+        self.name = name
+        self.state = 'ready'    # -> 'running', 'waiting', 'done', 'failed', 'cancelled'
+        self.value = None       # What to send into `steps` when next resumed.
+        self.return_value = None
+        self.exception = None
+        self.instructions = 0
+        self.slices = 0
+        self.waits = 0
+        self.run_time = 0.0
+        self.scheduler = None
+
+    def __repr__(self):         # pragma: no cover
+        return '<Task %s %s>' % (self.name, self.state)
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def result(self):
+        if self.state == 'done':      return self.return_value
+        if self.state == 'failed':    raise self.exception
+        if self.state == 'cancelled': raise Cancelled(self.name)
+        raise RuntimeError("task %s is not finished" % self.name)
+
+    def cancel(self):
+        if self.finished:
+            return False
+        if self.scheduler is not None:
+            self.scheduler.unpark(self)
+        self.steps.close()
+        self.state = 'cancelled'
+        return True
+
+    def stats(self):
+        return {'name': self.name, 'state': self.state,
+                'priority': self.priority,
+                'instructions': self.instructions, 'slices': self.slices,
+                'waits': self.waits, 'run_time': self.run_time}
+
+class RoundRobin:
+    "Ready queue taking tasks in arrival order."
+
+    def __init__(self):
+        self.queue = collections.deque()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def push(self, task):
+        self.queue.append(task)
+
+    def pop(self):
+        return self.queue.popleft()
+
+class Priority:
+    """Ready queue taking the task with the lowest priority number
+    first, round-robin among equals."""
+
+    def __init__(self):
+        self.heap = []
+        self.order = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, task):
+        heapq.heappush(self.heap, (task.priority, next(self.order), task))
+
+    def pop(self):
+        return heapq.heappop(self.heap)[-1]
+
+POLICIES = {'round-robin': RoundRobin, 'priority': Priority}
+
+class Scheduler:
+    def __init__(self, quantum=1000, policy='round-robin'):
+        self.quantum = quantum
+        self.ready = POLICIES[policy]() if isinstance(policy, str) else policy
+        self.tasks = []
+        self.sleepers = []      # Heap of (wake time, seq, task).
+        self.order = itertools.count()
+        self.selector = selectors.DefaultSelector()
+        self.waiting_on = {}    # task -> fileobj it is parked on.
+        self.trap_handlers = {sleep: self.trap_sleep,
+                              wait_readable: self.trap_readable,
+                              wait_writable: self.trap_writable}
+
+    def spawn(self, code, f_globals=None, f_locals=None, priority=0, name=None):
+        if f_globals is None: f_globals = {}
+        frame = module_frame(code, f_globals, f_locals)
+        task = Task(frame, priority, name or 'task-%d' % len(self.tasks))
+        task.scheduler = self
+        self.tasks.append(task)
+        self.ready.push(task)
+        return task
+
+    def run(self):
+        "Run until every task has finished."
+        while self.step():
+            pass
+
+    def step(self):
+        """Run one quantum of the next ready task, first waiting for a
+        sleeper or I/O if nothing is ready. Return False when no task
+        is left."""
+        self.wake_sleepers()
+        while not self.ready:
+            if not self.sleepers and not self.waiting_on:
+                return False
+            self.wait_for_events()
+        task = self.ready.pop()
+        if task.state == 'ready':
+            self.run_slice(task)
+        return True
+
+    def run_slice(self, task):
+        task.state = 'running'
+        task.slices += 1
+        used = 0
+        start = time.perf_counter()
+        try:
+            while used < self.quantum and task.state == 'running':
+                value, task.value = task.value, None
+                request = task.steps.send(value)
+                if isinstance(request, int):
+                    used += request
+                else:
+                    self.trap(task, *request)
+        except StopIteration as e:
+            task.state, task.return_value = 'done', e.value
+        except Exception as e:
+            task.state, task.exception = 'failed', e
+        finally:
+            task.instructions += used
+            task.run_time += time.perf_counter() - start
+        if task.state == 'running':
+            task.state = 'ready'
+            self.ready.push(task)
+
+    def trap(self, task, trap, args):
+        handler = self.trap_handlers.get(trap)
+        if handler is None:
+            task.value = trap.fallback(*args)
+        else:
+            handler(task, *args)
+
+    def trap_sleep(self, task, seconds):
+        task.state = 'waiting'
+        task.waits += 1
+        heapq.heappush(self.sleepers,
+                       (time.monotonic() + seconds, next(self.order), task))
+
+    def trap_readable(self, task, fileobj):
+        self.park_on_io(task, fileobj, selectors.EVENT_READ)
+
+    def trap_writable(self, task, fileobj):
+        self.park_on_io(task, fileobj, selectors.EVENT_WRITE)
+
+    def park_on_io(self, task, fileobj, event):
+        task.state = 'waiting'
+        task.waits += 1
+        self.selector.register(fileobj, event, task)
+        self.waiting_on[task] = fileobj
+
+    def unpark(self, task):
+        fileobj = self.waiting_on.pop(task, None)
+        if fileobj is not None:
+            self.selector.unregister(fileobj)
+        # Cancelled sleepers stay in the heap; wake_sleepers skips them.
+
+    def wake(self, task):
+        if task.state == 'waiting':
+            task.state = 'ready'
+            self.ready.push(task)
+
+    def wake_sleepers(self):
+        now = time.monotonic()
+        while self.sleepers and self.sleepers[0][0] <= now:
+            self.wake(heapq.heappop(self.sleepers)[-1])
+
+    def wait_for_events(self):
+        timeout = None
+        if self.sleepers:
+            timeout = max(0, self.sleepers[0][0] - time.monotonic())
+        if self.waiting_on:
+            for key, _ in self.selector.select(timeout):
+                self.unpark(key.data)
+                self.wake(key.data)
+        elif timeout:
+            time.sleep(timeout)
+        self.wake_sleepers()
+
+    def stats(self):
+        return [task.stats() for task in self.tasks]
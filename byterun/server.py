@@ -0,0 +1,186 @@
+"""A pre-forking server running guest code in worker processes.
+
+A Server compiles and decodes its modules in one Engine, then forks
+workers that inherit it: the code objects and streams are shared with
+the parent in copy-on-write pages instead of being built again in each
+worker. (Where the host has gc.freeze(), the parent freezes what it
+built while forking, so the collector in the workers doesn't write to
+those pages, and unfreezes it again in itself.)
+
+The workers take connections on one socket. A connection sends jobs,
+(target, inputs) where target names a module or is source code, and
+gets back, for each, the value of `result` after running the target in
+fresh globals made from `inputs`. A job that raises gets back the error
+instead, raised in the client as a JobError. Since a job is code the
+workers run, connections must prove they know the Server's authkey,
+which only a Unix socket, with its file permissions, may go without.
+A worker keeps the code for the last MAX_SOURCES sources it was sent.
+
+A job that exits or is interrupted is answered with an error like any
+other, and a client that goes away only ends its connection. A worker
+that dies anyway, e.g. killed, is replaced by respawn(), which
+supervise() calls every so often for as long as the Server runs.
+
+Workers are made with os.fork(), so this needs a POSIX host.
+"""
+
+import gc, os, signal, time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client as _connect, Listener, address_type
+
+from .engine import Engine
+from .interpreter import VirtualMachineError
+
+# The number of job sources whose code a worker keeps.
+MAX_SOURCES = 128
+
+class JobError(VirtualMachineError):
+    "A job raised an error in a worker."
+
+class Server:
+    def __init__(self, address, modules=(), workers=os.cpu_count() or 1,
+                 engine=None, authkey=None):
+        """`modules` maps each module's name to its source filename, or
+        is a list of filenames, named after their basenames. `authkey`,
+        bytes, is needed unless `address` is a Unix socket's."""
+        if authkey is None and address_type(address) != 'AF_UNIX':
+            raise ValueError("a Server on %r needs an authkey" % (address,))
+        self.address = address
+        self.authkey = authkey
+        self.engine = Engine() if engine is None else engine
+        self.workers = workers
+        self.codes = {}         # Module name -> its code, warmed.
+        self.sources = {}       # Job source -> its code, oldest first.
+        self.pids = []
+        if not isinstance(modules, dict):
+            modules = dict((os.path.splitext(os.path.basename(filename))[0],
+                            filename) for filename in modules)
+        for name, filename in modules.items():
+            with open(filename) as source_file:
+                source = source_file.read()
+            self.codes[name] = self.engine.warm(
+                self.engine.compile(source, filename))
+
+    def start(self):
+        "Fork the workers; return once they're listening."
+        self.listener = Listener(self.address, authkey=self.authkey)
+        self.spawn(self.workers)
+        return self
+
+    def spawn(self, count):
+        "Fork `count` more workers."
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+        try:
+            for _ in range(count):
+                pid = os.fork()
+                if pid == 0:
+                    try:
+                        self.serve()
+                    finally:
+                        os._exit(0)
+                self.pids.append(pid)
+        finally:
+            if hasattr(gc, 'freeze'):
+                gc.unfreeze()   # Only the workers need it.
+
+    def respawn(self):
+        "Replace the workers that have died; return how many there were."
+        dead = [pid for pid in self.pids if os.waitpid(pid, os.WNOHANG)[0]]
+        self.pids = [pid for pid in self.pids if pid not in dead]
+        self.spawn(len(dead))
+        return len(dead)
+
+    def supervise(self, interval=1.0):
+        "Respawn dead workers every `interval` seconds until stopped."
+        while self.pids:
+            self.respawn()
+            time.sleep(interval)
+
+    def stop(self):
+        for pid in self.pids:
+            os.kill(pid, signal.SIGTERM)
+        for pid in self.pids:
+            os.waitpid(pid, 0)
+        self.pids = []
+        self.listener.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def serve(self):
+        "In a worker: take connections and answer their jobs, forever."
+        while True:
+            try:
+                connection = self.listener.accept()
+            except (AuthenticationError, EOFError, OSError):
+                continue        # A client that failed to connect.
+            with connection:
+                self.answer(connection)
+
+    def answer(self, connection):
+        "Answer `connection`'s jobs until the client goes away."
+        while True:
+            try:
+                target, inputs = connection.recv()
+            except (EOFError, OSError):
+                return
+            reply = self.run(target, inputs)
+            try:
+                connection.send(reply)
+            except (EOFError, OSError):
+                return
+            except Exception as e:  # The result didn't pickle.
+                try:
+                    connection.send(('error', '%s: %s' % (type(e).__name__, e)))
+                except (EOFError, OSError):
+                    return
+
+    def run(self, target, inputs):
+        "Run one job; return ('ok', result) or ('error', message)."
+        if target in self.codes:
+            code, name = self.codes[target], target
+        else:
+            code, name = self.source_code(target), '__main__'
+        f_globals = dict(inputs)
+        f_globals.setdefault('__name__', name)
+        try:
+            self.engine.run(code, f_globals)
+            return 'ok', f_globals.get('result')
+        except BaseException as e:  # Even exit(): the worker goes on.
+            return 'error', '%s: %s' % (type(e).__name__, e)
+
+    def source_code(self, source):
+        "Return the code for a job's `source`, keeping MAX_SOURCES at most."
+        code = self.sources.pop(source, None)
+        if code is None:
+            code = self.engine.compile(source)
+            if MAX_SOURCES <= len(self.sources):
+                self.engine.forget(self.sources.pop(next(iter(self.sources))))
+        self.sources[source] = code
+        return code
+
+class Client:
+    "A connection to a Server's workers."
+
+    def __init__(self, address, authkey=None):
+        self.connection = _connect(address, authkey=authkey)
+
+    def run(self, target, inputs=()):
+        self.connection.send((target, dict(inputs)))
+        status, value = self.connection.recv()
+        if status == 'error':
+            raise JobError(value)
+        return value
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
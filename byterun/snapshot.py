@@ -0,0 +1,102 @@
+"""Snapshots of a warmed Engine, for starting up without the warming.
+
+save() writes, in one marshal file, the modules' code objects and the
+Engine's compiled source, each code object's decoded instructions, and
+the module-level state that the modules mark as safe to keep: the
+values of the names listed in a module's __snapshot__, much as __all__
+lists what it exports, pickled. With them go the functions the module
+defined, as the index of their code and their defaults. load() reads
+the file in one go and gives the Engine its streams back, with no
+compiling or decoding, and each module's code and globals: the kept
+state and the functions, made again over those globals, with no
+running of module bodies.
+
+Anything else, classes, closures and functions' attributes included,
+is not kept: a later process that needs them runs the module's code
+again. A snapshot only loads on the Python it was saved on.
+"""
+
+import marshal, os, pickle, sys, types
+
+from .interpreter import Function, VirtualMachineError, decode, fuse
+
+MAGIC = 'byterun snapshot 2'
+
+class SnapshotError(VirtualMachineError):
+    "Raised for a file that isn't a snapshot this Python can load."
+
+def save(filename, engine, modules=None):
+    """Snapshot `engine` and `modules`, a dict of module name to the
+    (code, globals) it ran with, to `filename`."""
+    modules = {} if modules is None else modules
+    codes = dict((name, code) for name, (code, _) in modules.items())
+    functions = dict((name, defined(code, f_globals))
+                     for name, (code, f_globals) in modules.items())
+    state = pickle.dumps(dict(
+        (name, (dict((key, f_globals[key]) for key in f_globals.get('__snapshot__', ())),
+                [(key, index, func.__defaults__, func.__kwdefaults__)
+                 for key, index, func in functions[name]]))
+        for name, (_, f_globals) in modules.items()), pickle.HIGHEST_PROTOCOL)
+    compiled = [(source, source_filename, code)
+                for (source, source_filename), code in engine.compiled.items()]
+    decoded = [fuse(decode(code))
+               for code in walk(list(codes.values()) + [c for _, _, c in compiled])]
+    data = marshal.dumps((MAGIC, sys.implementation.cache_tag,
+                          codes, compiled, decoded, state))
+    temporary = '%s.%d.tmp' % (filename, os.getpid())
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, filename)
+
+def defined(code, f_globals):
+    """Return (name, index in walk([code]), function) for the functions
+    in `f_globals` that `code` defined there, without a closure."""
+    nested = list(walk([code]))
+    found = []
+    for key, value in f_globals.items():
+        if (isinstance(value, Function) and value.__globals__ is f_globals
+                and value.__closure__ is None):
+            for index, const in enumerate(nested):
+                if const is value.__code__:
+                    found.append((key, index, value))
+                    break
+    return found
+
+def load(filename, engine):
+    """Restore a snapshot from `filename` into `engine`; return a dict of
+    module name to (code, globals)."""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    try:
+        magic, cache_tag, codes, compiled, decoded, state = marshal.loads(data)
+    except (EOFError, ValueError, TypeError) as e:
+        raise SnapshotError("%s is not a snapshot: %s" % (filename, e))
+    if magic != MAGIC or cache_tag != sys.implementation.cache_tag:
+        raise SnapshotError("%s is a snapshot for another version" % filename)
+    roots = list(codes.values()) + [code for _, _, code in compiled]
+    walked = list(walk(roots))
+    if len(walked) != len(decoded):
+        raise SnapshotError("%s has decoded instructions for %d code objects, not %d"
+                            % (filename, len(decoded), len(walked)))
+    for source, source_filename, code in compiled:
+        engine.compiled.setdefault((source, source_filename), code)
+    for code, instructions in zip(walked, decoded):
+        engine.decoded(code, instructions)
+    state = pickle.loads(state)
+    modules = {}
+    for name, code in codes.items():
+        f_globals, functions = state[name]
+        nested = list(walk([code]))
+        for key, index, defaults, kwdefaults in functions:
+            func = Function(None, nested[index], f_globals, defaults, None, kwdefaults)
+            func._hot_calls = engine.hot_calls
+            f_globals[key] = func
+        modules[name] = code, f_globals
+    return modules
+
+def walk(codes):
+    "Yield `codes` and the code objects nested in them, in a fixed order."
+    for code in codes:
+        yield code
+        yield from walk([const for const in code.co_consts
+                         if isinstance(const, types.CodeType)])
@@ -0,0 +1,479 @@
+"""A tracing JIT for hot loops in byterun.
+
+Code installed here runs under a copy of the classic loop that counts
+backward jumps per loop head. Once a head has been jumped to HOT_LOOP
+times, the next iteration is recorded as it runs: the instructions on
+the path taken, the types of their operands and which way each branch
+went. The recording becomes straight-line Python source for one
+iteration, wrapped in a `while True`, with a guard at every branch
+and at FOR_ITER. The source is compiled with the host compiler and
+runs the loop until a guard fails; it then writes its state back into
+the frame and the interpreter carries on from the guard's offset.
+
+Fast locals live in Python variables while the trace runs and stack
+slots become temporaries, so a trace mostly runs as plain CPython
+code. A loop whose recording hits an opcode we don't translate, a
+return, an inner loop or too many instructions is blacklisted.
+"""
+
+import dis, sys
+
+from . import interpreter
+
+HOT_LOOP = 50           # Backward jumps to a head before we trace it.
+MAX_TRACE = 500         # Instructions in a trace before we give up.
+DEBUG = False           # Print the source of each trace compiled.
+
+void = object()
+
+def install(code):
+    """Run `code` and the code objects nested in it with the JIT until
+    uninstall(). Return how many code objects were newly installed."""
+    installed = len(_saved)
+    interpreter.install_executors(code, jit_executor, _saved)
+    return len(_saved) - installed
+
+def uninstall():
+    "Put back whatever ran the code install() gave the JIT."
+    interpreter.restore_executors(_saved)
+
+def jit_executor(code):
+    jit = jitted.get(code)
+    if jit is None:
+        jit = jitted[code] = JitCode(code)
+    return jit.execute
+
+def run(code, f_globals, f_locals):
+    install(code)
+    return interpreter.run(code, f_globals, f_locals)
+
+jitted = {}             # code -> JitCode
+_saved = {}             # What install() replaced, for uninstall().
+
+def dump(file=None):
+    "Print the source of every trace, with its stats, and the blacklist."
+    file = file or sys.stdout
+    for jit in jitted.values():
+        for head, trace in sorted(jit.traces.items()):
+            print("# %s:%d  entries=%d  iterations=%d  exits=%r"
+                  % (jit.code.co_name, head, trace.entries,
+                     trace.iterations, trace.exits), file=file)
+            print(trace.source, file=file)
+        for head, reason in sorted(jit.blacklist.items()):
+            print("# %s:%d  blacklisted: %s"
+                  % (jit.code.co_name, head, reason), file=file)
+
+class JitCode:
+    def __init__(self, code):
+        self.code = code
+        self.counts = {}        # loop head -> backward jumps seen
+        self.traces = {}        # loop head -> Trace
+        self.blacklist = {}     # loop head -> why we won't trace it
+
+    def execute(self, frame):
+        recording = None
+        while True:
+            lasti = frame.f_lasti
+            byte_name, arguments = frame.parse_byte_and_args()
+            if recording is not None:
+                recording = recording.before(byte_name, arguments, lasti)
+            outcome = frame.dispatch(byte_name, arguments)
+            if outcome:
+                if recording is not None:
+                    self.blacklist[recording.head] = 'returns inside the loop'
+                return frame.pop()
+            if recording is not None:
+                recording = recording.after(frame.f_lasti)
+            if frame.f_lasti < lasti:
+                recording = self.loop_back(frame, recording, lasti)
+
+    def loop_back(self, frame, recording, end):
+        head = frame.f_lasti
+        if recording is not None:
+            if head == recording.head:
+                trace = recording.compile(self.code)
+                if trace is not None:
+                    self.traces[head] = trace
+                return None
+            self.blacklist[recording.head] = 'contains an inner loop'
+            return None
+        trace = self.traces.get(head)
+        if trace is not None:
+            frame.f_lasti = trace.enter(frame)
+        elif head not in self.blacklist:
+            count = self.counts.get(head, 0) + 1
+            self.counts[head] = count
+            if HOT_LOOP <= count:
+                return Recording(self, frame, head, end)
+        return None
+
+class Recording:
+    "One loop iteration, recorded as it runs."
+
+    def __init__(self, jit, frame, head, end):
+        self.jit = jit
+        self.frame = frame
+        self.head = head
+        self.end = end          # Offset of the jump back to `head`.
+        self.depth = len(frame.stack)
+        self.steps = []         # [byte_name, arguments, offset, next_offset, types, taken]
+
+    def abort(self, reason):
+        self.jit.blacklist[self.head] = reason
+        return None
+
+    def before(self, byte_name, arguments, offset):
+        if byte_name not in translators:
+            return self.abort('unsupported opcode %s' % byte_name)
+        if MAX_TRACE <= len(self.steps):
+            return self.abort('trace too long')
+        types_seen = tuple(type(value).__name__ for value in self.frame.stack[-2:])
+        self.steps.append([byte_name, arguments, offset, self.frame.f_lasti,
+                           types_seen, None])
+        return self
+
+    def after(self, lasti):
+        if not self.head <= lasti <= self.end:
+            return None         # Left the loop: try again next time round.
+        self.steps[-1][-1] = lasti
+        return self
+
+    def compile(self, code):
+        translator = Translator(self)
+        try:
+            source = translator.translate()
+        except Untranslatable as e:
+            return self.abort(str(e))
+        if DEBUG:
+            print(source, file=sys.stderr)
+        namespace = dict(helpers)
+        namespace.update(translator.constants)
+        name = '<trace %s:%d>' % (code.co_name, self.head)
+        exec(compile(source, name, 'exec'), namespace)
+        return Trace(namespace['trace'], source, self.steps)
+
+class Trace:
+    def __init__(self, fn, source, steps):
+        self.fn = fn
+        self.source = source
+        self.steps = steps
+        self.entries = 0
+        self.iterations = 0
+        self.exits = {}         # offset -> times a guard sent us there
+
+    def enter(self, frame):
+        "Run the loop from its head; return the offset to resume at."
+        resume, iterations = self.fn(frame, frame.f_locals, frame.stack)
+        if resume is None:
+            return frame.f_lasti
+        self.entries += 1
+        self.iterations += iterations
+        self.exits[resume] = self.exits.get(resume, 0) + 1
+        return resume
+
+class Untranslatable(Exception):
+    pass
+
+class Translator:
+    def __init__(self, recording):
+        self.recording = recording
+        self.lines = []
+        self.temps = 0
+        self.stack = ['E%d' % i for i in range(recording.depth)]
+        self.entry_stack = list(self.stack)
+        self.cached = []        # Fast locals kept in Python variables.
+        self.preload = []       # ...of which ones read before written.
+        self.constants = {}     # Names for constants we can't spell.
+
+    def translate(self):
+        for byte_name, arguments, offset, next_offset, seen, taken in self.recording.steps:
+            self.lines.append('# %d %s %s  %s' % (offset, byte_name,
+                                                  ' '.join(map(repr, arguments)),
+                                                  ' '.join(seen)))
+            translators[byte_name](self, next_offset, taken, *arguments)
+        if self.stack != self.entry_stack:
+            raise Untranslatable('stack changes across an iteration')
+        entry = ['    E%d = stack[%d]' % (i, i) for i in range(len(self.entry_stack))]
+        for name in self.cached:
+            entry.append('    %s = f_locals.get(%r, void)' % (self.variable(name), name))
+        for name in self.preload:
+            entry.append('    if %s is void: return None, 0' % self.variable(name))
+        body = []
+        for line in self.lines:
+            if isinstance(line, tuple):     # An exit, placed by guard().
+                body.extend('            ' + exit_line for exit_line in self.exit(*line))
+            else:
+                body.append('        ' + line)
+        return '\n'.join(['def trace(frame, f_locals, stack):'] + entry
+                         + ['    n = 0', '    while True:', '        n += 1']
+                         + body) + '\n'
+
+    def temp(self, expression):
+        self.temps += 1
+        name = 't%d' % self.temps
+        self.emit('%s = %s' % (name, expression))
+        self.stack.append(name)
+
+    def emit(self, line):
+        self.lines.append(line)
+
+    def pop(self):
+        if not self.stack:
+            raise Untranslatable('pops below the loop entry')
+        return self.stack.pop()
+
+    def popn(self, n):
+        values = [self.pop() for _ in range(n)]
+        values.reverse()
+        return values
+
+    def local(self, name, reading):
+        if name not in self.cached:
+            self.cached.append(name)
+            if reading:
+                self.preload.append(name)
+        return self.variable(name)
+
+    def variable(self, name):
+        return 'v%d' % self.cached.index(name)
+
+    def exit(self, offset, stack):
+        "Return the lines that leave the trace, resuming the VM at `offset`."
+        lines = ['for name, value in ((%s)):' % ''.join('(%r, %s), ' % (name, self.variable(name))
+                                                        for name in self.cached),
+                 '    if value is not void: f_locals[name] = value',
+                 'stack[:] = [%s]' % ', '.join(stack),
+                 'return %d, n' % offset]
+        if not self.cached:
+            lines = lines[2:]
+        return lines
+
+    def guard(self, condition, offset, stack=None):
+        self.emit('if %s:' % condition)
+        # The locals to write back aren't all known yet: leave a marker.
+        self.emit((offset, list(self.stack if stack is None else stack)))
+
+translators = {}
+
+def translates(*byte_names):
+    def register(translator):
+        for byte_name in byte_names:
+            translators[byte_name] = translator
+        return translator
+    return register
+
+@translates('NOP', 'SETUP_LOOP', 'POP_BLOCK', 'JUMP_FORWARD', 'JUMP_ABSOLUTE')
+def t_nothing(t, next_offset, taken, *arguments):
+    pass
+
+@translates('POP_TOP')
+def t_pop_top(t, next_offset, taken):
+    t.pop()
+
+@translates('DUP_TOP')
+def t_dup_top(t, next_offset, taken):
+    t.stack.append(t.stack[-1])
+
+@translates('COPY')
+def t_copy(t, next_offset, taken, i):
+    t.stack.append(t.stack[-i])
+
+@translates('SWAP')
+def t_swap(t, next_offset, taken, i):
+    t.stack[-i], t.stack[-1] = t.stack[-1], t.stack[-i]
+
+@translates('PUSH_NULL')
+def t_push_null(t, next_offset, taken):
+    t.stack.append('None')
+
+@translates('LOAD_CONST')
+def t_load_const(t, next_offset, taken, const):
+    if const is None or type(const) in (bool, int, str):
+        t.temp(repr(const))
+    else:
+        name = 'c%d' % len(t.constants)
+        t.constants[name] = const
+        t.temp(name)
+
+@translates('LOAD_FAST')
+def t_load_fast(t, next_offset, taken, name):
+    t.temp(t.local(name, reading=True))
+
+@translates('STORE_FAST')
+def t_store_fast(t, next_offset, taken, name):
+    value = t.pop()
+    t.emit('%s = %s' % (t.local(name, reading=False), value))
+
+@translates('LOAD_NAME')
+def t_load_name(t, next_offset, taken, name):
+    t.temp('load_name(frame, %r)' % name)
+
+@translates('LOAD_GLOBAL')
+def t_load_global(t, next_offset, taken, name):
+    t.temp('load_global(frame, %r)' % name)
+
+@translates('PUSH_NULL_LOAD_GLOBAL')
+def t_push_null_load_global(t, next_offset, taken, name):
+    t.stack.append('None')
+    t_load_global(t, next_offset, taken, name)
+
+@translates('STORE_NAME')
+def t_store_name(t, next_offset, taken, name):
+    t.emit('f_locals[%r] = %s' % (name, t.pop()))
+
+UNARY = {'POSITIVE': '+', 'NEGATIVE': '-', 'NOT': 'not ', 'INVERT': '~'}
+BINARY = {'POWER': '**', 'MULTIPLY': '*', 'TRUE_DIVIDE': '/',
+          'FLOOR_DIVIDE': '//', 'MODULO': '%', 'ADD': '+', 'SUBTRACT': '-',
+          'LSHIFT': '<<', 'RSHIFT': '>>', 'AND': '&', 'XOR': '^', 'OR': '|'}
+COMPARE = ['<', '<=', '==', '!=', '>', '>=', 'in', 'not in', 'is', 'is not']
+
+def t_unary(symbol):
+    return lambda t, next_offset, taken: t.temp('%s%s' % (symbol, t.pop()))
+
+def t_binary(symbol):
+    def translate(t, next_offset, taken):
+        x, y = t.popn(2)
+        t.temp('%s %s %s' % (x, symbol, y))
+    return translate
+
+for op, symbol in UNARY.items():
+    translators['UNARY_' + op] = t_unary(symbol)
+for op, symbol in BINARY.items():
+    translators['BINARY_' + op] = t_binary(symbol)
+
+@translates('BINARY_OP')
+def t_binary_op(t, next_offset, taken, op):
+    symbol = dis._nb_ops[op][1]
+    if not symbol.endswith('='):
+        return t_binary(symbol)(t, next_offset, taken)
+    x, y = t.popn(2)
+    t.temp(x)
+    t.emit('%s %s %s' % (t.stack[-1], symbol, y))
+
+@translates('BINARY_SUBSCR')
+def t_binary_subscr(t, next_offset, taken):
+    x, y = t.popn(2)
+    t.temp('%s[%s]' % (x, y))
+
+@translates('COMPARE_OP')
+def t_compare_op(t, next_offset, taken, opnum):
+    if len(COMPARE) <= opnum:
+        raise Untranslatable('exception-match comparison')
+    t_binary(COMPARE[opnum])(t, next_offset, taken)
+
+@translates('IS_OP')
+def t_is_op(t, next_offset, taken, invert):
+    t_binary('is not' if invert else 'is')(t, next_offset, taken)
+
+@translates('CONTAINS_OP')
+def t_contains_op(t, next_offset, taken, invert):
+    t_binary('not in' if invert else 'in')(t, next_offset, taken)
+
+@translates('LOAD_METHOD')
+def t_load_method(t, next_offset, taken, name):
+    obj = t.pop()
+    t.stack.append('None')
+    t.temp('%s.%s' % (obj, name))
+
+@translates('LOAD_ATTR')
+def t_load_attr(t, next_offset, taken, attr):
+    t.temp('%s.%s' % (t.pop(), attr))
+
+@translates('STORE_ATTR')
+def t_store_attr(t, next_offset, taken, attr):
+    value, obj = t.popn(2)
+    t.emit('%s.%s = %s' % (obj, attr, value))
+
+@translates('STORE_SUBSCR')
+def t_store_subscr(t, next_offset, taken):
+    value, obj, subscr = t.popn(3)
+    t.emit('%s[%s] = %s' % (obj, subscr, value))
+
+@translates('BUILD_TUPLE')
+def t_build_tuple(t, next_offset, taken, count):
+    t.temp('(%s)' % ''.join(item + ', ' for item in t.popn(count)))
+
+@translates('BUILD_LIST')
+def t_build_list(t, next_offset, taken, count):
+    t.temp('[%s]' % ', '.join(t.popn(count)))
+
+@translates('LIST_APPEND')
+def t_list_append(t, next_offset, taken, count):
+    value = t.pop()
+    t.emit('%s.append(%s)' % (t.stack[-count], value))
+
+@translates('GET_ITER')
+def t_get_iter(t, next_offset, taken):
+    t.temp('iter(%s)' % t.pop())
+
+@translates('CALL_FUNCTION')
+def t_call_function(t, next_offset, taken, oparg):
+    if 256 <= oparg:
+        raise Untranslatable('keyword arguments')
+    args = t.popn(oparg)
+    t.temp('%s(%s)' % (t.pop(), ', '.join(args)))
+
+@translates('CALL')
+def t_call(t, next_offset, taken, argc, kw_names):
+    args = t.popn(argc)
+    null, func = t.popn(2)
+    if null != 'None':
+        raise Untranslatable('calls a method pushed by the VM')
+    positional = args[:len(args) - len(kw_names)]
+    keywords = ['%s=%s' % pair
+                for pair in zip(kw_names, args[len(positional):])]
+    t.temp('%s(%s)' % (func, ', '.join(positional + keywords)))
+
+def t_pop_jump(jump_if):
+    def translate(t, next_offset, taken, target):
+        value = t.pop()
+        if target == next_offset:
+            return
+        # Leave the trace if the value would send us the other way.
+        jumps = value if jump_if else 'not %s' % value
+        stays = 'not %s' % value if jump_if else value
+        if taken == target:
+            t.guard(stays, next_offset)
+        else:
+            t.guard(jumps, target)
+    return translate
+
+translators['POP_JUMP_IF_TRUE'] = t_pop_jump(True)
+translators['POP_JUMP_IF_FALSE'] = t_pop_jump(False)
+
+def t_pop_jump_none(jump_if_none):
+    def translate(t, next_offset, taken, target):
+        value = t.pop()
+        if target == next_offset:
+            return
+        jumps = '%s is %sNone' % (value, '' if jump_if_none else 'not ')
+        stays = '%s is %sNone' % (value, 'not ' if jump_if_none else '')
+        if taken == target:
+            t.guard(stays, next_offset)
+        else:
+            t.guard(jumps, target)
+    return translate
+
+translators['POP_JUMP_IF_NONE'] = t_pop_jump_none(True)
+translators['POP_JUMP_IF_NOT_NONE'] = t_pop_jump_none(False)
+
+@translates('FOR_ITER')
+def t_for_iter(t, next_offset, taken, target):
+    if taken == target:
+        raise Untranslatable('loop ended while recording')
+    iterator = t.stack[-1]
+    t.temps += 1
+    element = 't%d' % t.temps
+    t.emit('%s = next(%s, void)' % (element, iterator))
+    t.guard('%s is void' % element, target, t.stack[:-1])
+    t.stack.append(element)
+
+def load_name(frame, name):
+    frame.byte_LOAD_NAME(name)
+    return frame.stack.pop()
+
+def load_global(frame, name):
+    frame.byte_LOAD_GLOBAL(name)
+    return frame.stack.pop()
+
+helpers = {'void': void, 'load_name': load_name, 'load_global': load_global}
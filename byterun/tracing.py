@@ -0,0 +1,125 @@
+"""sys.settrace-style tracing of guest code.
+
+settrace(tracefunc, code) has the VM run `code`, and the code objects
+nested in it, on a decoded stream instrumented for tracing: the
+instructions that start a line, and the jumps, are wrapped to report
+'line' events, and the frame reports 'call', 'return' and 'exception'
+events around its run. Nothing else changes: other code keeps its fast
+path, and settrace(None) puts back whatever ran the traced code before.
+
+The events and the trace functions follow sys.settrace. The global
+trace function gets a 'call' event for each new frame and returns the
+local trace function for that frame, or None not to trace it. The local
+trace function gets 'line', 'return' and 'exception' events, and what
+it returns becomes the frame's local trace function, unless that's
+None. A trace function that raises turns tracing off.
+
+Functions already promoted to native code (see HOT_CALLS) aren't
+traced; while traced, code isn't promoted.
+"""
+
+from . import interpreter
+from .interpreter import HANDLERS, JUMPS, line_table, predecode, run_stream
+
+_tracefunc = None
+
+# Traced code -> the executor it had before, or None.
+_saved = {}
+
+def settrace(tracefunc, code=None):
+    """Set the global trace function and trace `code` with it, or with
+    tracefunc None, stop all tracing."""
+    global _tracefunc
+    if tracefunc is None:
+        _tracefunc = None
+        uninstall()
+    else:
+        _tracefunc = tracefunc
+        if code is not None:
+            install(code)
+
+def gettrace():
+    return _tracefunc
+
+def run(code, f_globals, f_locals, tracefunc):
+    "Run `code` traced by `tracefunc`, then stop tracing."
+    settrace(tracefunc, code)
+    try:
+        return interpreter.run(code, f_globals, f_locals)
+    finally:
+        settrace(None)
+
+def install(code):
+    interpreter.install_executors(code, traced_executor, _saved)
+
+def uninstall():
+    interpreter.restore_executors(_saved)
+
+def traced_executor(code):
+    stream = traced_stream(code)
+    return lambda frame: execute(frame, stream)
+
+def execute(frame, stream):
+    frame.f_trace = None
+    event(frame, 'call', None)
+    try:
+        result = run_stream(frame, stream)
+    except Exception as e:
+        event(frame, 'exception', (type(e), e, e.__traceback__))
+        event(frame, 'return', None)
+        raise
+    event(frame, 'return', result)
+    return result
+
+def event(frame, what, arg):
+    callback = _tracefunc if what == 'call' else frame.f_trace
+    if callback is None or _tracefunc is None:
+        return
+    try:
+        result = callback(frame, what, arg)
+    except BaseException:
+        frame.f_trace = None
+        settrace(None)
+        raise
+    if result is not None:
+        frame.f_trace = result
+
+def traced_stream(code):
+    "Return a stream for `code` that reports 'line' events."
+    line_starts = set(line_table(code)[0])
+    stream = predecode(code)
+    for offset, entry in enumerate(stream):
+        if entry is not None and entry[0] in JUMP_HANDLERS:
+            handler, arguments, next_offset = entry
+            stream[offset] = (jumping(handler, stream, line_starts),
+                              arguments, next_offset)
+    for offset in line_starts:
+        if offset < len(stream) and stream[offset] is not None:
+            handler, arguments, next_offset = stream[offset]
+            stream[offset] = starting_line(handler), arguments, next_offset
+    return stream
+
+def starting_line(handler):
+    def traced(frame, *arguments):
+        if frame.f_trace is not None:
+            event(frame, 'line', None)
+        return handler(frame, *arguments)
+    return traced
+
+def jumping(handler, stream, line_starts):
+    """Wrap a jump to report a 'line' event on going backward, as the
+    host does, unless the target starts a line and will report it."""
+    def traced(frame, *arguments):
+        start = frame.f_lasti
+        outcome = handler(frame, *arguments)
+        target = frame.f_lasti
+        if (target < start and target not in line_starts
+            and frame.f_trace is not None):
+            frame.f_lasti = stream[target][2]   # So f_lineno is the target's.
+            event(frame, 'line', None)
+            frame.f_lasti = target
+        return outcome
+    return traced
+
+# The handlers that may jump.
+JUMP_HANDLERS = set(HANDLERS[byte_name] for byte_name in JUMPS)
@@ -0,0 +1,273 @@
+"""A load-time verifier for the code objects byterun runs.
+
+verify() checks that every instruction decodes and has a handler, that
+its argument indexes a real constant, name, local or cell, that jumps
+land on instruction boundaries, and that the stack depth is the same
+along every path into an instruction, never goes negative or past
+co_stacksize, and that control can't run off the end. It also works
+out which LOAD_FASTs read a local that every path has assigned.
+
+Code that passes runs from a predecoded stream where those LOAD_FASTs
+and COMPARE_OPs use handlers without the runtime checks. Code that
+fails raises VerifyError, saying where and why, before any of it runs.
+"""
+
+import dis, types
+
+from . import interpreter
+from .interpreter import (Frame, VirtualMachineError, handler_for, predecode,
+                          wordcode_name, ENDS, JUMPS, METHOD_ATTRS,
+                          STACK_EFFECTS, WORDCODE)
+
+class VerifyError(VirtualMachineError):
+    "Raised for a code object that byterun shouldn't run."
+
+# What install() replaced, for uninstall().
+_saved = {}
+
+def install(code):
+    """Verify `code` and the code objects nested in it, then have the VM
+    run them on the unchecked handlers until uninstall(). Return how
+    many there were."""
+    verified = verify(code)
+    for v in verified:
+        stream = v.fast_stream()
+        interpreter.install_executor(
+            v.code, lambda frame, stream=stream: interpreter.run_stream(frame, stream),
+            _saved)
+    return len(verified)
+
+def uninstall():
+    "Put back whatever ran the code install() verified."
+    interpreter.restore_executors(_saved)
+
+def run(code, f_globals, f_locals):
+    install(code)
+    return interpreter.run(code, f_globals, f_locals)
+
+def verify(code):
+    "Return a Verified for `code` and each code object nested in it."
+    verified = [Verifier(code).verify()]
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            verified.extend(verify(const))
+    return verified
+
+class Verified:
+    def __init__(self, code, bound_loads):
+        self.code = code
+        self.bound_loads = bound_loads  # Offsets of LOAD_FASTs that can't fail.
+
+    def fast_stream(self):
+        stream = predecode(self.code)
+        for offset, entry in enumerate(stream):
+            if entry is None:
+                continue
+            handler, arguments, next_offset = entry
+            if offset in self.bound_loads:
+                stream[offset] = load_fast_unchecked, arguments, next_offset
+            elif handler is Frame.byte_COMPARE_OP:
+                fn = Frame.COMPARE_OPERATORS[arguments[0]]
+                stream[offset] = compare_unchecked, (fn,), next_offset
+        return stream
+
+# Wordcode opcode -> how many CACHE entries follow it.
+CACHE_ENTRIES = getattr(dis, '_inline_cache_entries', [0] * 256)
+
+# Wordcode instructions whose argument is an index shifted left past
+# some flags: how far.
+ARG_SHIFTS = {'LOAD_GLOBAL': 1, 'LOAD_SUPER_ATTR': 2}
+if METHOD_ATTRS:
+    ARG_SHIFTS.update(LOAD_ATTR=1, COMPARE_OP=4)
+
+def load_fast_unchecked(frame, name):
+    frame.stack.append(frame.f_locals[name])
+
+def compare_unchecked(frame, fn):
+    stack = frame.stack
+    y = stack.pop()
+    stack[-1] = fn(stack[-1], y)
+
+class Verifier:
+    def __init__(self, code):
+        self.code = code
+        self.cellnames = code.co_cellvars + code.co_freevars
+        if WORDCODE:
+            # Wordcode numbers cells among the locals: co_varnames, then
+            # the cell and free names not already in it.
+            self.cells = code.co_varnames + tuple(
+                name for name in self.cellnames if name not in code.co_varnames)
+        else:
+            self.cells = self.cellnames
+
+    def fail(self, offset, message):
+        raise VerifyError("%s, code %r, offset %d: %s"
+                          % (self.code.co_filename, self.code.co_name,
+                             offset, message))
+
+    def verify(self):
+        boundaries = self.wordcode_boundaries if WORDCODE else self.boundaries
+        self.instructions = dict(
+            (offset, self.check_instruction(offset, opcode, int_arg, next_offset))
+            for offset, opcode, int_arg, next_offset in boundaries())
+        if WORDCODE:
+            self.rename_restores()
+        self.targets = dict((offset, self.target(offset, *instruction))
+                            for offset, instruction in self.instructions.items()
+                            if instruction[0] in JUMPS)
+        return Verified(self.code, self.flow())
+
+    def boundaries(self):
+        "Yield (offset, opcode, int_arg, next_offset) for each instruction."
+        code = self.code.co_code
+        offset = 0
+        while offset < len(code):
+            opcode = code[offset]
+            size = 3 if opcode >= dis.HAVE_ARGUMENT else 1
+            if len(code) < offset + size:
+                self.fail(offset, "instruction runs past the end of the code")
+            int_arg = None
+            if opcode >= dis.HAVE_ARGUMENT:
+                int_arg = code[offset+1] + (code[offset+2] << 8)
+            yield offset, opcode, int_arg, offset + size
+            offset += size
+
+    def wordcode_boundaries(self):
+        """Like boundaries(), for wordcode: each instruction's argument
+        takes in the EXTENDED_ARGs before it, and its CACHE entries are
+        skipped over."""
+        code = self.code.co_code
+        offset = extended = 0
+        while offset < len(code):
+            opcode = code[offset]
+            size = 2 + 2 * CACHE_ENTRIES[opcode]
+            if len(code) < offset + size:
+                self.fail(offset, "instruction runs past the end of the code")
+            int_arg = None
+            if opcode >= dis.HAVE_ARGUMENT:
+                int_arg = extended | code[offset+1]
+            extended = int_arg << 8 if opcode == dis.EXTENDED_ARG else 0
+            yield offset, opcode, int_arg, offset + size
+            offset += size
+
+    def check_instruction(self, offset, opcode, int_arg, next_offset):
+        "Check one instruction; return (byte_name, int_arg, next_offset)."
+        code = self.code
+        byte_name = dis.opname[opcode]
+        if WORDCODE:
+            byte_name, int_arg = self.rename(byte_name, int_arg, next_offset)
+        if byte_name not in STACK_EFFECTS or not handler_for(byte_name):
+            self.fail(offset, "unsupported opcode %s" % byte_name)
+        if opcode >= dis.HAVE_ARGUMENT:
+            for table, names, what in (
+                    (dis.hasconst, code.co_consts, 'constant'),
+                    (dis.hasname, code.co_names, 'name'),
+                    (dis.haslocal, code.co_varnames, 'local'),
+                    (dis.hasfree, self.cells, 'cell')):
+                if opcode in table and not int_arg < len(names):
+                    self.fail(offset, "%s refers to %s %d of %d"
+                              % (byte_name, what, int_arg, len(names)))
+            if opcode in dis.hasfree and self.cells[int_arg] not in self.cellnames:
+                self.fail(offset, "%s refers to local %r, not a cell"
+                          % (byte_name, self.cells[int_arg]))
+            if byte_name == 'COMPARE_OP' and not int_arg < len(Frame.COMPARE_OPERATORS):
+                self.fail(offset, "unknown comparison %d" % int_arg)
+            if byte_name == 'RAISE_VARARGS' and int_arg != 1:
+                self.fail(offset, "RAISE_VARARGS %d is unsupported" % int_arg)
+        return byte_name, int_arg, next_offset
+
+    def rename(self, byte_name, int_arg, next_offset):
+        """Return the name wordcode_table() gives wordcode instruction
+        `byte_name`, and its argument: a jump's made its target, and an
+        index with flags below it shifted down. The PRECALLs and KW_NAMES
+        wordcode_table() folds away are NOPs here."""
+        opcode = dis.opmap[byte_name]
+        if byte_name in ('PRECALL', 'KW_NAMES'):
+            return 'NOP', int_arg
+        name = wordcode_name(byte_name, int_arg)
+        if opcode in dis.hasjabs:
+            int_arg = 2 * int_arg
+        elif opcode in dis.hasjrel:
+            backward = 'BACKWARD' in byte_name
+            int_arg = next_offset + 2 * (-int_arg if backward else int_arg)
+            code = self.code.co_code
+            if (byte_name == 'FOR_ITER' and int_arg < len(code)
+                and dis.opname[code[int_arg]] == 'END_FOR'):
+                int_arg += 2
+        elif byte_name in ARG_SHIFTS:
+            int_arg >>= ARG_SHIFTS[byte_name]
+        return name, int_arg
+
+    def rename_restores(self):
+        """Rename the STORE_FASTs of locals a LOAD_FAST_AND_CLEAR saves,
+        as wordcode_table() does: they may unbind them again."""
+        cleared = set(int_arg for byte_name, int_arg, _ in self.instructions.values()
+                      if byte_name == 'LOAD_FAST_AND_CLEAR')
+        for offset, (byte_name, int_arg, next_offset) in self.instructions.items():
+            if byte_name == 'STORE_FAST' and int_arg in cleared:
+                self.instructions[offset] = ('STORE_FAST_MAYBE_NULL', int_arg,
+                                             next_offset)
+
+    def target(self, offset, byte_name, int_arg, next_offset):
+        if WORDCODE:
+            target = int_arg
+        elif dis.opmap[byte_name] in dis.hasjrel:
+            target = next_offset + int_arg
+        else:
+            target = int_arg
+        if target not in self.instructions:
+            self.fail(offset, "%s jumps to %d, which is not an instruction"
+                      % (byte_name, target))
+        return target
+
+    def flow(self):
+        """Check stack depths along every path and find the LOAD_FASTs of
+        surely-assigned locals. A state is (depth, assigned locals)."""
+        code = self.code
+        nparams = (code.co_argcount + bool(code.co_flags & 0x04)
+                   + bool(code.co_flags & 0x08))
+        states = {0: (0, frozenset(code.co_varnames[:nparams]))}
+        work = [0]
+        while work:
+            offset = work.pop()
+            depth, assigned = states[offset]
+            byte_name, int_arg, next_offset = self.instructions[offset]
+            pops, pushes, jump_pushes = STACK_EFFECTS[byte_name](int_arg)
+            if depth < pops:
+                self.fail(offset, "%s needs %d stack items but has %d"
+                          % (byte_name, pops, depth))
+            after = depth - pops + max(pushes, jump_pushes or 0)
+            if code.co_stacksize < after:
+                self.fail(offset, "stack depth %d exceeds co_stacksize %d"
+                          % (after, code.co_stacksize))
+            if byte_name == 'STORE_FAST':
+                assigned = assigned | {code.co_varnames[int_arg]}
+            elif byte_name == 'LOAD_FAST_AND_CLEAR':
+                assigned = assigned - {code.co_varnames[int_arg]}
+            successors = []
+            if byte_name in JUMPS and byte_name != 'SETUP_LOOP':
+                successors.append((self.targets[offset], depth - pops + jump_pushes))
+            if byte_name not in ENDS:
+                if next_offset not in self.instructions:
+                    self.fail(offset, "control runs off the end of the code")
+                successors.append((next_offset, depth - pops + pushes))
+            for successor, successor_depth in successors:
+                if self.arrive(offset, states, successor, successor_depth, assigned):
+                    work.append(successor)
+        return set(offset for offset, (_, assigned) in states.items()
+                   if self.instructions[offset][0] == 'LOAD_FAST'
+                   and code.co_varnames[self.instructions[offset][1]] in assigned)
+
+    def arrive(self, offset, states, successor, depth, assigned):
+        "Merge a state into `successor`'s; return True if it changed."
+        if successor not in states:
+            states[successor] = depth, assigned
+            return True
+        old_depth, old_assigned = states[successor]
+        if old_depth != depth:
+            self.fail(successor, "stack depth is %d coming from offset %d "
+                      "but %d on another path" % (depth, offset, old_depth))
+        if old_assigned <= assigned:
+            return False
+        states[successor] = depth, old_assigned & assigned
+        return True
@@ -1,11 +1,41 @@
+import argparse
 import sys
 
 from .compiler import load_file
 
 
-def main():
-    sys.argv.pop(0)
-    load_file(sys.argv[0], "__main__")
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="tailbiter",
+        description="Compile a Python program with tailbiter and run it.",
+    )
+    parser.add_argument(
+        "--vm", choices=("native", "byterun"), default="native",
+        help="run the compiled code natively or in byterun.",
+    )
+    parser.add_argument(
+        "--cache-dir", default=None,
+        help="with --vm byterun, keep compiled code here between runs "
+             "(default: byterun's cache directory).",
+    )
+    parser.add_argument("prog", help="The program to run.")
+    parser.add_argument(
+        "args", nargs=argparse.REMAINDER,
+        help="Arguments to pass to the program.",
+    )
+    args = parser.parse_args(argv)
+    sys.argv = [args.prog] + args.args
+    if args.vm == "byterun":
+        from byterun import execfile, importer
+
+        cache_dir = args.cache_dir or importer.default_directory()
+        try:
+            cache = importer.CodeCache(cache_dir, "tailbiter")
+        except ValueError as e:
+            parser.error(str(e))
+        execfile.run_python_file(args.prog, sys.argv, cache=cache)
+    else:
+        load_file(args.prog, "__main__")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,39 @@
+"""Testing tools for running guest code in byterun's executors."""
+
+import textwrap, types, unittest
+
+from byterun import closures, interpreter, registers, tracejit, verifier
+
+
+def guest(source_code):
+    "Compile `source_code`, dedented, for a guest run."
+    return compile(textwrap.dedent(source_code), "<guest>", "exec")
+
+
+def install_streams(code):
+    "Run `code` and the code objects nested in it from predecoded streams."
+    stream = interpreter.predecode(code)
+    interpreter.executors[code] = lambda frame: interpreter.run_stream(frame, stream)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            install_streams(const)
+
+
+class GuestTestCase(unittest.TestCase):
+    """Runs each test with interpreter.HOT_CALLS set to `hot_calls`,
+    None keeping every call in the VM, and afterwards uninstalls what
+    the test installed and removes any executors left."""
+
+    hot_calls = interpreter.HOT_CALLS
+
+    def setUp(self):
+        self.saved_hot_calls = interpreter.HOT_CALLS
+        interpreter.HOT_CALLS = self.hot_calls
+
+    def tearDown(self):
+        interpreter.HOT_CALLS = self.saved_hot_calls
+        closures.uninstall()
+        tracejit.uninstall()
+        registers.uninstall()
+        verifier.uninstall()
+        interpreter.executors.clear()
@@ -0,0 +1,56 @@
+"""Tests for running byterun guests on an asyncio event loop."""
+
+import asyncio, unittest
+
+from byterun import aio
+from .guesttest import guest
+
+COUNTER = guest("""\
+    i = 0
+    while i < n:
+        log.append(name)
+        i = i + 1
+    """)
+
+class TestAsyncio(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_guests_interleave(self):
+        log = []
+        runs = [aio.run_async(COUNTER, {'log': log, 'name': name, 'n': 10},
+                              interval=20)
+                for name in 'ab']
+        self.loop.run_until_complete(asyncio.gather(*runs))
+        self.assertEqual(sorted(log), ['a'] * 10 + ['b'] * 10)
+        self.assertNotEqual(log, sorted(log))
+
+    def test_guest_awaits_host_coroutine(self):
+        async def fetch(x):
+            await asyncio.sleep(0)
+            return x * 2
+        f_globals = {'wait': aio.wait, 'fetch': fetch}
+        code = guest("""\
+            result = wait(fetch(21))
+            """)
+        self.loop.run_until_complete(aio.run_async(code, f_globals))
+        self.assertEqual(f_globals['result'], 42)
+
+    def test_cancel(self):
+        log = []
+        f_globals = {'log': log, 'name': 'x', 'n': float('inf')}
+        task = aio.spawn(COUNTER, f_globals, interval=10)
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        task.cancel()
+        self.assertRaises(asyncio.CancelledError,
+                          self.loop.run_until_complete, task)
+        self.assertTrue(log)
+
+    def test_errors_propagate(self):
+        self.assertRaises(ZeroDivisionError, self.loop.run_until_complete,
+                          aio.run_async(guest("1 / 0")))
@@ -0,0 +1,72 @@
+"""Tests for breakpoints in guest code."""
+
+from byterun import breakpoints, closures, interpreter
+from .guesttest import GuestTestCase, guest
+
+SOURCE = """\
+    def f(n):
+        total = 0
+        for i in range(n):
+            total = total + i
+        return total
+    r = f(5)
+    r2 = f(3)
+    """
+
+class TestBreakpoints(GuestTestCase):
+    def setUp(self):
+        GuestTestCase.setUp(self)
+        self.seen = []
+
+    def tearDown(self):
+        breakpoints.clear_all()
+        GuestTestCase.tearDown(self)
+
+    def note(self, frame, breakpoint):
+        self.seen.append((frame.f_code.co_name, frame.f_lineno,
+                          frame.f_locals.get('i')))
+
+    def test_conditions_and_counts(self):
+        code = guest(SOURCE)
+        bp = breakpoints.set_break(code, 4, self.note,
+                                   condition='i % 2 == 0', ignore=1)
+        f_globals = {}
+        interpreter.run(code, f_globals, None)
+        self.assertEqual((f_globals['r'], f_globals['r2']), (10, 3))
+        self.assertEqual(self.seen, [('f', 4, 2), ('f', 4, 4),
+                                     ('f', 4, 0), ('f', 4, 2)])
+        self.assertEqual((bp.hits, bp.ignore), (5, 0))
+
+    def test_disabled_and_temporary(self):
+        code = guest(SOURCE)
+        bp = breakpoints.set_break(code, 4, self.note)
+        bp.enabled = False
+        breakpoints.set_break(code, 7, self.note, temporary=True)
+        interpreter.run(code, {}, None)
+        self.assertEqual(self.seen, [('<module>', 7, None)])
+        self.assertEqual(bp.hits, 0)
+        self.assertNotIn(code, interpreter.executors)
+
+    def test_clearing_restores(self):
+        code = guest(SOURCE)
+        closures.install(code)
+        fast = dict(interpreter.executors)
+        bp = breakpoints.set_break(code, 2, self.note)
+        self.assertNotEqual(interpreter.executors, fast)
+        bp.clear()
+        self.assertEqual(interpreter.executors, fast)
+        interpreter.run(code, {}, None)
+        self.assertEqual(self.seen, [])
+
+    def test_no_code(self):
+        self.assertRaises(ValueError,
+                          breakpoints.set_break, guest(SOURCE), 99, self.note)
+
+    def test_broken_condition_stops(self):
+        code = guest(SOURCE)
+        bp = breakpoints.set_break(code, 4, self.note, condition='1 / (i - 1)',
+                                   ignore=10, temporary=True)
+        interpreter.run(code, {}, None)
+        self.assertEqual(self.seen, [('f', 4, 1), ('f', 4, 1)])
+        self.assertEqual((bp.hits, bp.ignore), (8, 4))
+        self.assertTrue(bp.places)
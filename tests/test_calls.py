@@ -0,0 +1,76 @@
+"""Tests for byterun's fast paths for simple calls."""
+
+from byterun import interpreter
+from byterun.interpreter import Function
+from .guesttest import GuestTestCase, guest
+
+class TestCalls(GuestTestCase):
+    hot_calls = None
+
+    def setUp(self):
+        GuestTestCase.setUp(self)
+        self.bind_arguments = Function.bind_arguments
+        self.bound = []
+        def bind_arguments(func, args, kwargs):
+            self.bound.append(func.__name__)
+            return self.bind_arguments(func, args, kwargs)
+        Function.bind_arguments = bind_arguments
+
+    def tearDown(self):
+        GuestTestCase.tearDown(self)
+        Function.bind_arguments = self.bind_arguments
+
+    def run_guest(self, source_code):
+        f_globals = {}
+        interpreter.run(guest(source_code), f_globals, None)
+        return f_globals['results']
+
+    def test_exact_arities(self):
+        results = self.run_guest("""\
+            def f0(): return 0
+            def f1(a): return a
+            def f2(a, b): return a - b
+            def f3(a, b, c): return a - b - c
+            results = [f0(), f1(1), f2(5, 2), f3(10, 2, 3),
+                       len('ab'), max(1, 2), max(1, 2, 3)]
+            """)
+        self.assertEqual(results, [0, 1, 3, 5, 2, 2, 3])
+        self.assertEqual(self.bound, [])
+
+    def test_general_calls(self):
+        results = self.run_guest("""\
+            def d(a, b=10): return a + b
+            def v(*args): return args
+            def k(a, **kw): return a, sorted(kw)
+            def f4(a, b, c, e): return a + b + c + e
+            results = [d(1), d(1, 2), d(b=3, a=1), v(1, 2), k(1, x=2),
+                       f4(1, 2, 3, 4), d(*[5])]
+            """)
+        self.assertEqual(results, [11, 3, 4, (1, 2), (1, ['x']), 10, 15])
+        self.assertEqual(self.bound, ['d', 'd', 'v', 'k', 'f4', 'd'])
+
+    def test_arity_errors(self):
+        self.assertRaises(TypeError, self.run_guest, """\
+            def f(a, b): return a
+            results = f(1)
+            """)
+        self.assertRaises(TypeError, self.run_guest, """\
+            def f(a): return a
+            results = f(1, 2)
+            """)
+
+    def test_keyword_only_parameters(self):
+        results = self.run_guest("""\
+            def f(a, *, b=2): return a, b
+            def g(a, *, b): return a, b
+            results = [f(1), f(1, b=3), g(1, b=4)]
+            """)
+        self.assertEqual(results, [(1, 2), (1, 3), (1, 4)])
+        self.assertEqual(self.bound, ['f', 'f', 'g'])
+        with self.assertRaises(TypeError) as context:
+            self.run_guest("""\
+                def g(a, *, b): return a, b
+                results = g(1)
+                """)
+        self.assertEqual(str(context.exception),
+                         "g() missing 1 required keyword-only argument: 'b'")
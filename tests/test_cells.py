@@ -0,0 +1,45 @@
+"""Tests for byterun's closure cells."""
+
+import unittest
+
+from byterun import interpreter
+from byterun.interpreter import Cell
+from .guesttest import guest
+
+class TestCells(unittest.TestCase):
+    def test_cells_are_indexed(self):
+        f_globals = {}
+        interpreter.run(guest("""\
+            def outer(a, b):
+                c = a + b
+                def inner(d):
+                    nonlocal c
+                    c = c + d
+                    return a, b, c
+                return inner
+            inner = outer(1, 2)
+            first = inner(10)
+            second = inner(100)
+            """), f_globals, None)
+        self.assertEqual(f_globals['first'], (1, 2, 13))
+        self.assertEqual(f_globals['second'], (1, 2, 113))
+        inner = f_globals['inner']
+        self.assertEqual(len(inner.__closure__), 3)
+        self.assertTrue(all(isinstance(cell, Cell) for cell in inner.__closure__))
+
+    def test_cellvars_before_freevars(self):
+        f_globals = {}
+        interpreter.run(guest("""\
+            def outer(x):
+                def middle():
+                    y = x * 2
+                    def inner():
+                        return x, y
+                    return inner()
+                return middle()
+            result = outer(5)
+            """), f_globals, None)
+        self.assertEqual(f_globals['result'], (5, 10))
+
+    def test_cells_are_slotted(self):
+        self.assertRaises(AttributeError, setattr, Cell(1), 'other', 2)
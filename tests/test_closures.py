@@ -0,0 +1,73 @@
+"""Tests for closure compilation in byterun."""
+
+import dis
+
+from byterun import closures, interpreter, tracing
+from .guesttest import GuestTestCase, guest
+
+class TestClosures(GuestTestCase):
+    def assert_same(self, source_code):
+        classic, translated = {}, {}
+        interpreter.run(guest(source_code), classic, None)
+        code = guest(source_code)
+        self.assertGreater(closures.install(code), 0)
+        interpreter.run(code, translated, None)
+        self.assertEqual(values(classic), values(translated))
+
+    def test_loops_and_branches(self):
+        self.assert_same("""\
+            total = 0
+            i = 0
+            while i < 100:
+                if i % 3 == 0:
+                    total = total + i
+                i = i + 1
+            squares = [x * x for x in range(10) if x % 2]
+            """)
+
+    def test_functions_and_closures(self):
+        self.assert_same("""\
+            def fact(n):
+                if n <= 1:
+                    return 1
+                return n * fact(n - 1)
+            def adder(k):
+                def add(x):
+                    return x + k
+                return add
+            results = [fact(6), adder(3)(4)]
+            """)
+
+    def test_errors(self):
+        code = guest("""\
+            def f():
+                return x
+            f()
+            """)
+        closures.install(code)
+        self.assertRaises(NameError, interpreter.run, code, {}, None)
+
+    def test_uninstall(self):
+        code = guest("""\
+            def f(x):
+                return x
+            """)
+        f_code = code.co_consts[0]
+        self.assertEqual(closures.install(code), 2)
+        self.assertEqual(closures.install(code), 0)
+        tracing.settrace(lambda frame, event, arg: None, code)
+        tracing.settrace(None)
+        self.assertFalse(interpreter.native_compatible(f_code))
+        closures.uninstall()
+        self.assertEqual(interpreter.executors, {})
+        self.assertTrue(interpreter.native_compatible(f_code))
+
+    def test_unknown_opcode_falls_back(self):
+        code = guest("x = 1")
+        prefix = [dis.opmap['GET_AITER']] + ([0] if interpreter.WORDCODE else [])
+        bad = code.replace(co_code=bytes(prefix) + code.co_code)
+        self.assertIsNone(closures.translate(bad))
+
+def values(namespace):
+    return dict((name, value) for name, value in namespace.items()
+                if not isinstance(value, (dict, interpreter.Function)))
@@ -0,0 +1,63 @@
+"""Tests for measuring the coverage of guest code."""
+
+import os, tempfile, unittest
+
+from byterun import interpreter
+from byterun.coverage import Collector
+from .guesttest import guest
+
+try:
+    import coverage
+except ImportError:
+    coverage = None
+
+SOURCE = """\
+    def f(n):
+        total = 0
+        i = 0
+        while i < n:
+            if i % 3 == 0:
+                total = total + i
+            else:
+                total = total - 1
+            i = i + 1
+        return total
+    def unused():
+        return 5
+    r = [f(2)]
+    for j in [1, 2]:
+        r.append(j)
+    k = 0
+    """
+
+class TestCoverage(unittest.TestCase):
+    def setUp(self):
+        self.collector = Collector()
+        f_globals = {}
+        self.collector.run(guest(SOURCE), f_globals, None)
+        self.assertEqual(f_globals['r'], [-1, 1, 2])
+
+    def test_lines(self):
+        self.assertEqual(self.collector.lines(),
+                         {'<guest>': {1, 2, 3, 4, 5, 6, 8, 9, 10, 11, 13, 14, 15, 16}})
+
+    def test_arcs(self):
+        arcs = self.collector.arcs()['<guest>']
+        for arc in [(-1, 1), (16, -1), (-1, 2), (10, -1),
+                    (4, 5), (5, 6), (5, 8), (9, 4), (4, 10),
+                    (14, 15), (15, 14), (14, 16)]:
+            self.assertIn(arc, arcs)
+        for arc in [(-11, 12), (12, -11), (6, 8)]:
+            self.assertNotIn(arc, arcs)
+
+    def test_restores_executors(self):
+        self.assertEqual(interpreter.executors, {})
+
+    @unittest.skipUnless(coverage, "needs coverage.py")
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            basename = os.path.join(directory, '.coverage')
+            self.collector.write(basename, branch=True)
+            data = coverage.CoverageData(basename=basename)
+            data.read()
+            self.assertIn((9, 4), data.arcs('<guest>'))
@@ -0,0 +1,76 @@
+"""Tests for the reusable Engine."""
+
+import builtins, unittest
+
+from byterun import engine, interpreter, metering
+from .guesttest import guest
+
+SOURCE = """\
+    def score(x):
+        total = 0
+        for i in range(x):
+            total = total + i * 2
+        return total
+    result = score(n) + len(str(n))
+    """
+
+class TestEngine(unittest.TestCase):
+    def tearDown(self):
+        self.assertEqual(interpreter.executors, {})
+
+    def test_runs_share_decoded_code(self):
+        e = engine.Engine()
+        code = guest(SOURCE)
+        for n in range(5):
+            f_globals = {'n': n}
+            e.run(code, f_globals)
+            self.assertEqual(f_globals['result'], n * (n-1) + 1)
+        self.assertEqual(e.runs, 5)
+        self.assertEqual(len(e.streams), 2)
+
+    def test_source_is_compiled_once(self):
+        e = engine.Engine()
+        e.run("result = n * 2", {'n': 3})
+        e.run("result = n * 2", {'n': 4})
+        self.assertEqual(len(e.compiled), 1)
+
+    def test_builtins_snapshot(self):
+        e = engine.Engine()
+        f_globals = {}
+        e.run("__builtins__['answer'] = 42\nx = answer", f_globals)
+        self.assertEqual(f_globals['x'], 42)
+        self.assertNotIn('answer', builtins.__dict__)
+        self.assertNotIn('answer', e.builtins)
+        f_globals = {}
+        e.run("x = 'answer' in __builtins__", f_globals)
+        self.assertFalse(f_globals['x'])
+
+    def test_budget(self):
+        e = engine.Engine(budget=50)
+        with self.assertRaises(metering.BudgetExceeded):
+            e.run(guest(SOURCE), {'n': 100})
+        e.run(guest(SOURCE), {'n': 1})
+        self.assertLess(0, e.count)
+        self.assertLessEqual(e.count, 50)
+
+    def test_budget_keeps_the_table(self):
+        loaded = []
+        def load_const(frame, const):
+            loaded.append(const)
+            frame.stack.append(const)
+        e = engine.Engine(table=dict(interpreter.HANDLERS, LOAD_CONST=load_const),
+                          budget=1000)
+        f_globals = {'n': 3}
+        e.run(guest(SOURCE), f_globals)
+        self.assertEqual(f_globals['result'], 7)
+        self.assertLess(0, len(loaded))
+
+    def test_hot_calls(self):
+        hot_calls = interpreter.HOT_CALLS
+        f_globals = {'n': 2}
+        engine.Engine(hot_calls=1).run(guest(SOURCE), f_globals)
+        self.assertTrue(f_globals['score']._native)
+        self.assertEqual(interpreter.HOT_CALLS, hot_calls)
+        f_globals = {'n': 2}
+        engine.Engine(hot_calls=None).run(guest(SOURCE), f_globals)
+        self.assertIsNone(f_globals['score']._hot_calls)
@@ -0,0 +1,102 @@
+"""Tests for byterun's pool of reusable frames."""
+
+import gc, weakref
+
+from byterun import interpreter
+from .guesttest import GuestTestCase, guest
+
+class TestFramePool(GuestTestCase):
+    hot_calls = None
+
+    def setUp(self):
+        GuestTestCase.setUp(self)
+        interpreter.clear_pool()
+
+    def tearDown(self):
+        GuestTestCase.tearDown(self)
+        interpreter.clear_pool()
+
+    def test_frames_are_reused(self):
+        f_globals = {}
+        interpreter.run(guest("""\
+            def inc(x):
+                return x + 1
+            total = 0
+            for i in range(50):
+                total = inc(total)
+            """), f_globals, None)
+        self.assertEqual(f_globals['total'], 50)
+        stats = interpreter.pool_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (49, 1))
+        self.assertEqual(stats['pooled'], 1)
+        self.assertAlmostEqual(stats['hit_rate'], 0.98)
+
+    def test_recursion(self):
+        f_globals = {}
+        interpreter.run(guest("""\
+            def fact(n):
+                return 1 if n <= 1 else n * fact(n - 1)
+            a = fact(12)
+            b = fact(12)
+            """), f_globals, None)
+        self.assertEqual((f_globals['a'], f_globals['b']), (479001600, 479001600))
+        stats = interpreter.pool_stats()
+        self.assertEqual(stats['pooled'], interpreter.MAX_POOLED)
+        # Twelve deep the first time; the second reuses MAX_POOLED.
+        self.assertEqual(stats['misses'], 12 + 12 - interpreter.MAX_POOLED)
+
+    def test_pooled_frames_let_go(self):
+        f_globals = {}
+        interpreter.run(guest("""\
+            def f(x):
+                y = [x]
+                return len(y)
+            f(1)
+            """), f_globals, None)
+        frame, = interpreter._frame_pool[f_globals['f'].__code__]
+        self.assertIsNone(frame.f_locals)
+        self.assertIsNone(frame.f_globals)
+        self.assertIsNone(frame.f_builtins)
+        self.assertEqual(frame.stack, [])
+
+    def test_many_scripts(self):
+        class Marker:
+            pass
+        markers = []
+        for i in range(interpreter.MAX_POOLED_CODES + 10):
+            marker = Marker()
+            markers.append(weakref.ref(marker))
+            f_globals = {'marker': marker}
+            interpreter.run(guest("""\
+                def f(x):
+                    return x + %d
+                result = f(1)
+                """ % i), f_globals, None)
+            self.assertEqual(f_globals['result'], i + 1)
+            del marker, f_globals
+        gc.collect()
+        self.assertEqual([ref for ref in markers if ref() is not None], [])
+        self.assertEqual(interpreter.pool_stats()['code_objects'],
+                         interpreter.MAX_POOLED_CODES)
+
+    def test_failed_frames_are_not_pooled(self):
+        code = guest("""\
+            def f(x):
+                return 1 // x
+            f(0)
+            """)
+        self.assertRaises(ZeroDivisionError, interpreter.run, code, {}, None)
+        self.assertEqual(interpreter.pool_stats()['pooled'], 0)
+
+    def test_builtins_follow_globals(self):
+        f_globals = {'__builtins__': {'len': lambda x: 'fake'}}
+        code = guest("""\
+            def f():
+                return len([])
+            result = f()
+            """)
+        interpreter.run(code, f_globals, None)
+        self.assertEqual(f_globals['result'], 'fake')
+        f_globals['__builtins__'] = {'len': len}
+        interpreter.run(code, f_globals, None)
+        self.assertEqual(f_globals['result'], 0)
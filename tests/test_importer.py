@@ -0,0 +1,92 @@
+"""Tests for guest imports that run in the VM."""
+
+import os, shutil, sys, tempfile, unittest
+
+from byterun import engine, execfile, importer, interpreter
+
+class TestImporter(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        package = os.path.join(self.dir, 'vmpkg')
+        os.mkdir(package)
+        for name, source in [
+                ('__init__.py', "from . import helpers\n"),
+                ('helpers.py', "import json\ndef triple(x):\n    return x * 3\n"
+                               "VALUE = triple(4)\n"),
+                ('__main__.py', "RAN = True\n")]:
+            with open(os.path.join(package, name), 'w') as f:
+                f.write(source)
+        sys.path.insert(0, self.dir)
+
+    def tearDown(self):
+        sys.path.remove(self.dir)
+        self.forget()
+        shutil.rmtree(self.dir)
+        self.assertEqual(interpreter.executors, {})
+
+    def forget(self):
+        for name in list(sys.modules):
+            if name.split('.')[0] == 'vmpkg':
+                del sys.modules[name]
+
+    def test_policy(self):
+        policy = importer.Importer({'vmpkg': 'vm', 'vmpkg.helpers': 'native'})
+        self.assertEqual(policy.where('vmpkg'), 'vm')
+        self.assertEqual(policy.where('vmpkg.other.deeper'), 'vm')
+        self.assertEqual(policy.where('vmpkg.helpers'), 'native')
+        self.assertEqual(policy.where('json'), 'native')
+        with self.assertRaises(ValueError):
+            importer.Importer({'vmpkg': 'elsewhere'})
+
+    def test_imports_run_in_the_vm(self):
+        e = engine.Engine(budget=10**6)
+        with importer.Importer({'vmpkg': 'vm'}, engine=e) as vm_imports:
+            f_globals = {}
+            e.run("import vmpkg.helpers\nr = vmpkg.helpers.VALUE\n", f_globals)
+        self.assertNotIn(vm_imports, sys.meta_path)
+        self.assertEqual(f_globals['r'], 12)
+        self.assertEqual(vm_imports.imported, ['vmpkg', 'vmpkg.helpers'])
+        self.assertIsInstance(sys.modules['vmpkg.helpers'].triple, interpreter.Function)
+        self.assertNotIsInstance(sys.modules['json'].dumps, interpreter.Function)
+        alone = engine.Engine(budget=10**6)
+        alone.run("r = 1\n", {})
+        self.assertLess(alone.count + 20, e.count)
+
+    def test_disk_cache(self):
+        directory = os.path.join(self.dir, 'cache')
+        first = importer.CodeCache(directory)
+        with importer.Importer({'vmpkg': 'vm'}, cache=first):
+            import vmpkg
+        self.assertEqual(first.counts, {'hits': 0, 'loads': 0, 'compiles': 2})
+        self.forget()
+        second = importer.CodeCache(directory)
+        with importer.Importer({'vmpkg': 'vm'}, cache=second):
+            import vmpkg
+        self.assertEqual(second.counts, {'hits': 0, 'loads': 2, 'compiles': 0})
+        self.assertEqual(vmpkg.helpers.VALUE, 12)
+
+    @unittest.skipUnless(interpreter.WORDCODE, "tailbiter's code runs before 3.11")
+    def test_tailbiter_needs_old_bytecode(self):
+        with self.assertRaises(ValueError) as context:
+            importer.CodeCache(compiler='tailbiter')
+        self.assertIn("before 3.11", str(context.exception))
+
+    def test_run_python_module(self):
+        execfile.run_python_module('vmpkg', ['vmpkg'])
+        with self.assertRaises(execfile.NoSource):
+            execfile.run_python_module('no_such_module_here', ['x'])
+        with self.assertRaises(execfile.NoSource):
+            execfile.run_python_module('sys', ['x'])
+
+    def test_run_python_file_cached(self):
+        script = os.path.join(self.dir, 'script.py')
+        with open(script, 'w') as f:
+            f.write("import sys\nsys.ran_script = sys.argv[1]\n")
+        directory = os.path.join(self.dir, 'cache')
+        for run, counts in [(1, {'hits': 0, 'loads': 0, 'compiles': 1}),
+                            (2, {'hits': 0, 'loads': 1, 'compiles': 0})]:
+            cache = importer.CodeCache(directory)
+            execfile.run_python_file(script, [script, str(run)], cache=cache)
+            self.assertEqual(sys.ran_script, str(run))
+            self.assertEqual(cache.counts, counts)
+        del sys.ran_script
@@ -0,0 +1,48 @@
+"""Tests for copy-on-write layered globals."""
+
+import unittest
+
+from byterun import engine, interpreter, layers
+from .guesttest import guest
+
+class TestLayers(unittest.TestCase):
+    def setUp(self):
+        self.base = {'factor': 3, 'names': ['a']}
+        exec("def helper(x):\n    return x * factor\n", self.base)
+        self.shared = layers.Shared(self.base)
+
+    def run_guest(self, source_code, f_globals):
+        interpreter.run(guest(source_code), f_globals, None)
+
+    def test_reads_fall_through_writes_stay(self):
+        f_globals = self.shared.overlay({'n': 2})
+        self.run_guest("""\
+            before = helper(n) + len('ab')
+            factor = 100
+            after = factor
+            """, f_globals)
+        self.assertEqual(f_globals['before'], 8)
+        self.assertEqual(f_globals['after'], 100)
+        self.assertEqual(self.base['factor'], 3)
+        self.assertNotIn('helper', f_globals)
+        self.assertEqual(self.shared.get(f_globals, 'factor'), 100)
+        self.assertEqual(self.shared.get(self.shared.overlay(), 'factor'), 3)
+
+    def test_base_is_read_only(self):
+        f_globals = self.shared.overlay()
+        with self.assertRaises(TypeError):
+            self.run_guest("__builtins__['factor'] = 5", f_globals)
+        self.assertEqual(self.shared.get(self.shared.overlay(), 'factor'), 3)
+
+    def test_refresh(self):
+        old = self.shared.overlay()
+        self.base['factor'] = 4
+        self.shared.refresh()
+        self.assertEqual(self.shared.get(self.shared.overlay(), 'factor'), 4)
+        self.assertEqual(self.shared.get(old, 'factor'), 3)
+
+    def test_engine_keeps_the_overlay(self):
+        f_globals = self.shared.overlay()
+        engine.Engine().run("x = helper(2)", f_globals)
+        self.assertEqual(f_globals['x'], 6)
+        self.assertEqual(interpreter.executors, {})
@@ -0,0 +1,64 @@
+"""Tests for byterun frames' line numbers."""
+
+import dis, gc, unittest, weakref
+
+from byterun import interpreter
+from byterun.interpreter import Frame, line_at
+from .guesttest import guest
+
+def guest_frames(tb):
+    "The byterun Frames a traceback passed through, outermost first."
+    frames = []
+    while tb is not None:
+        frame = tb.tb_frame.f_locals.get('self')
+        if isinstance(frame, Frame) and frame not in frames:
+            frames.append(frame)
+        tb = tb.tb_next
+    return frames
+
+class TestLineNumbers(unittest.TestCase):
+    def test_line_at(self):
+        code = guest("""\
+            x = 1
+            y = 2
+
+            z = (x +
+                 y)
+            """)
+        for offset, line in dis.findlinestarts(code):
+            if interpreter.WORDCODE and offset == 0:
+                continue        # RESUME's line; it's untraced.
+            self.assertEqual(line_at(code, offset), line)
+        self.assertEqual(line_at(code, -1), code.co_firstlineno)
+
+    def test_frame_lineno(self):
+        code = guest("""\
+            def f(x):
+                y = x + 1
+                return y // x
+            a = 1
+            b = f(a)
+            c = f(0)
+            """)
+        try:
+            interpreter.run(code, {}, None)
+        except ZeroDivisionError as e:
+            tb = e.__traceback__
+        else:
+            self.fail("no exception")
+        self.assertEqual([(frame.f_code.co_name, frame.f_lineno)
+                          for frame in guest_frames(tb)],
+                         [('<module>', 6), ('f', 3)])
+
+    def test_fresh_frame(self):
+        code = guest("\n\nx = 1\n")
+        frame = Frame(code, None, {}, {})
+        self.assertEqual(frame.f_lineno, code.co_firstlineno)
+
+    def test_tables_go_with_the_code(self):
+        code = guest("x = 1\ny = 2\n")
+        self.assertEqual(line_at(code, len(code.co_code) - 2), 2)
+        ref = weakref.ref(code)
+        del code
+        gc.collect()
+        self.assertIsNone(ref())
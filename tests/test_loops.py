@@ -0,0 +1,53 @@
+"""Tests for byterun's fused FOR_ITER loops."""
+
+import types
+
+from byterun import closures, interpreter
+from byterun.interpreter import decode, fuse
+from .guesttest import GuestTestCase, guest, install_streams
+
+SOURCE = """\
+    def f(n):
+        total = 0
+        for i in range(n):
+            total = total + i
+        for x in [1, 2, 3]:
+            total = total + x
+        for a, b in ((1, 2), (3, 4)):
+            total = total + a * b
+        for c in 'abc':
+            if c == 'b':
+                total = total + 1
+        return total, i, x, c
+    for j in range(3):
+        result = f(10)
+    last = j
+    """
+
+class TestLoops(GuestTestCase):
+    def check(self, install):
+        code = guest(SOURCE)
+        install(code)
+        f_globals = {}
+        interpreter.run(code, f_globals, None)
+        self.assertEqual(f_globals['result'], (45 + 6 + 14 + 1, 9, 3, 'c'))
+        self.assertEqual(f_globals['last'], 2)
+
+    def test_fusion(self):
+        code = guest(SOURCE)
+        function = [const for const in code.co_consts
+                    if isinstance(const, types.CodeType)][0]
+        names = [byte_name for _, byte_name, _, _ in fuse(decode(function))]
+        self.assertEqual(names.count('FOR_ITER_STORE'), 3)
+        self.assertEqual(names.count('FOR_ITER'), 1)  # Unpacks instead.
+        names = [byte_name for _, byte_name, _, _ in fuse(decode(code))]
+        self.assertEqual(names.count('FOR_ITER_STORE'), 1)
+
+    def test_classic(self):
+        self.check(lambda code: None)
+
+    def test_stream(self):
+        self.check(install_streams)
+
+    def test_closures(self):
+        self.check(closures.install)
@@ -0,0 +1,54 @@
+"""Tests for memory accounting and limits."""
+
+import tracemalloc, unittest
+
+from byterun import interpreter, memory
+from .guesttest import guest
+
+source = """\
+    def small():
+        return [1, 2, 3]
+    def big(n):
+        xs = []
+        for i in range(n):
+            xs.append(str(i) * 10)
+        return len(xs)
+    small()
+    r = big(n)
+    """
+
+class TestMemory(unittest.TestCase):
+    def tearDown(self):
+        self.assertEqual(interpreter.executors, {})
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_peaks(self):
+        tracker = memory.Tracker()
+        f_globals = {'n': 20000}
+        tracker.run(guest(source), f_globals, None)
+        self.assertEqual(f_globals['r'], 20000)
+        peaks = dict((code.co_name, peak) for code, peak in tracker.peaks.items())
+        self.assertLess(20000 * 50, peaks['big'])
+        self.assertLess(peaks['small'], 20000)
+        self.assertLessEqual(peaks['big'], peaks['<module>'])
+        self.assertLessEqual(peaks['<module>'], tracker.peak)
+
+    def test_limit(self):
+        with self.assertRaises(memory.MemoryExceeded) as context:
+            memory.run(guest(source), {'n': 20000}, None, limit=200000)
+        e = context.exception
+        self.assertLess(200000, e.used)
+        self.assertEqual([name for _, name, _ in e.guest_stack], ['<module>', 'big'])
+
+    def test_within_limit(self):
+        peak = memory.run(guest(source), {'n': 10}, None, limit=10**6)
+        self.assertLess(0, peak)
+
+    def test_functions_from_outside(self):
+        f_globals = {'n': 20000}
+        interpreter.run(guest(source.replace('r = big(n)', '')), f_globals, None)
+        self.assertTrue(f_globals['big'].promote())
+        with self.assertRaises(memory.MemoryExceeded) as context:
+            memory.run(guest("r = big(n)"), f_globals, None, limit=200000)
+        self.assertEqual([name for _, name, _ in context.exception.guest_stack],
+                         ['<module>', 'big'])
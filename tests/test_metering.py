@@ -0,0 +1,81 @@
+"""Tests for instruction budgets and metering."""
+
+import unittest
+
+from byterun import interpreter, metering
+from .guesttest import guest
+
+class TestMetering(unittest.TestCase):
+    def tearDown(self):
+        self.assertEqual(interpreter.executors, {})
+
+    def test_deterministic_count(self):
+        code = guest("""\
+            def f(n):
+                total = 0
+                for i in range(n):
+                    total = total + i
+                return total
+            r = f(10)
+            """)
+        f_globals = {}
+        count = metering.run(code, f_globals, None)
+        self.assertEqual(f_globals['r'], 45)
+        self.assertEqual(metering.run(code, {}, None), count)
+        longer = metering.run(guest("""\
+            def f(n):
+                total = 0
+                for i in range(n):
+                    total = total + i
+                return total
+            r = f(20)
+            """), {}, None)
+        self.assertLess(count, longer)
+
+    def test_loop_budget(self):
+        code = guest("""\
+            def spin():
+                while True:
+                    pass
+            x = 1
+            spin()
+            """)
+        with self.assertRaises(metering.BudgetExceeded) as context:
+            metering.run(code, {}, None, budget=1000)
+        e = context.exception
+        self.assertLess(1000, e.count)
+        self.assertEqual([name for _, name, _ in e.guest_stack], ['<module>', 'spin'])
+        self.assertEqual(e.guest_stack[0], ('<guest>', '<module>', 5))
+
+    def test_recursion_budget(self):
+        code = guest("""\
+            def down(n):
+                return down(n + 1)
+            down(0)
+            """)
+        with self.assertRaises(metering.BudgetExceeded) as context:
+            metering.run(code, {}, None, budget=300)
+        self.assertLess(10, len(context.exception.guest_stack))
+
+    def test_within_budget(self):
+        meter = metering.Meter(budget=10**6)
+        meter.run(guest("x = 1"), {}, None)
+        self.assertEqual(meter.frames, [])
+        self.assertLess(0, meter.count)
+
+    def test_functions_from_outside(self):
+        f_globals = {}
+        interpreter.run(guest("""\
+            def spin():
+                while True:
+                    pass
+            def double(x):
+                return x * 2
+            """), f_globals, None)
+        self.assertTrue(f_globals['double'].promote())
+        with self.assertRaises(metering.BudgetExceeded) as context:
+            metering.run(guest("spin()"), f_globals, None, budget=1000)
+        self.assertEqual([name for _, name, _ in context.exception.guest_stack],
+                         ['<module>', 'spin'])
+        self.assertLess(metering.run(guest("double(1)"), {'double': abs}, None),
+                        metering.run(guest("double(1)"), f_globals, None))
@@ -0,0 +1,72 @@
+"""Tests for promoting hot byterun Functions to native functions."""
+
+import dis, gc, types, weakref
+
+from byterun import interpreter
+from byterun.interpreter import Function, run
+from .guesttest import GuestTestCase, guest
+
+SOURCE = """\
+    def inc(x):
+        return x + 1
+    total = 0
+    for i in range(n):
+        total = inc(total)
+    """
+
+class TestMixedMode(GuestTestCase):
+    hot_calls = 10
+
+    def test_hot_function_goes_native(self):
+        f_globals = {'n': 25}
+        run(guest(SOURCE), f_globals, None)
+        inc = f_globals['inc']
+        self.assertEqual(f_globals['total'], 25)
+        self.assertIsInstance(inc._native, types.FunctionType)
+        self.assertEqual(inc._calls, 10)
+        self.assertIs(inc._native.__globals__, f_globals)
+
+    def test_cold_function_stays_interpreted(self):
+        f_globals = {'n': 5}
+        run(guest(SOURCE), f_globals, None)
+        self.assertIsNone(f_globals['inc']._native)
+
+    def test_pinned_function_stays_interpreted(self):
+        f_globals = {'n': 1}
+        run(guest(SOURCE), f_globals, None)
+        inc = f_globals['inc']
+        interpreter.pin_interpreted(inc)
+        for i in range(20):
+            inc(i)
+        self.assertIs(inc._native, False)
+
+    def test_closures_stay_interpreted(self):
+        f_globals = {}
+        run(guest("""\
+            def adder(k):
+                def add(x):
+                    return x + k
+                return add
+            add = adder(3)
+            results = [add(i) for i in range(20)]
+            """), f_globals, None)
+        self.assertEqual(f_globals['results'][-1], 22)
+        self.assertIs(f_globals['add']._native, False)
+
+    def test_incompatible_code_stays_interpreted(self):
+        # Wordcode has no unassigned opcodes dis won't name; jump off the end.
+        junk = (bytes([dis.opmap['JUMP_FORWARD'], 0xff]) if interpreter.WORDCODE
+                else b'\xff\xff\xff')
+        code = guest("x = 1").replace(co_code=junk)
+        self.assertFalse(interpreter.native_compatible(code))
+        func = Function('f', code, {}, [], None)
+        self.assertIs(func.promote(), False)
+
+    def test_compatibility_is_forgotten_with_the_code(self):
+        code = compile("x = 1", "<guest>", "exec")
+        self.assertTrue(interpreter.native_compatible(code))
+        self.assertIn(code, interpreter._native_compatible)
+        ref = weakref.ref(code)
+        del code
+        gc.collect()
+        self.assertIsNone(ref())
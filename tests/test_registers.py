@@ -0,0 +1,75 @@
+"""Tests for the register-based executor in byterun."""
+
+import dis
+
+from byterun import interpreter, registers
+from .guesttest import GuestTestCase, guest
+
+SOURCE = """\
+    def f(n):
+        total = 0
+        i = 0
+        while i < n:
+            if i % 3 == 0:
+                total = total + i
+            else:
+                total = total - 1
+            i = i + 1
+        return total
+    def adder(k):
+        def add(x):
+            return x + k
+        return add
+    class Thing(object):
+        def __init__(self, x):
+            self.x = x
+    a, b = 1, 2
+    results = [f(100), adder(3)(4), Thing(5).x, [x * x for x in range(5)], a, b]
+    """
+
+class TestRegisters(GuestTestCase):
+    def test_same_results(self):
+        stack, regs = {}, {}
+        interpreter.run(guest(SOURCE), stack, None)
+        code = guest(SOURCE)
+        self.assertGreater(registers.install(code), 1)
+        interpreter.run(code, regs, None)
+        self.assertEqual(stack['results'], regs['results'])
+
+    def test_locals_need_no_moves(self):
+        code = guest("""\
+            def f(n):
+                i = 0
+                while i < n:
+                    i = i + 1
+                return i
+            """).co_consts[0]
+        rcode = registers.translate(code)
+        names = [name for name, _, _, _ in rcode.instructions]
+        # Wordcode repeats the loop's test at its end.
+        self.assertEqual(names.count('binary'), 3 if interpreter.WORDCODE else 2)
+        self.assertLessEqual(names.count('move'), 1)
+
+    def test_unbound_local(self):
+        code = guest("""\
+            def f():
+                y = x
+                x = 1
+            f()
+            """)
+        registers.install(code)
+        self.assertRaises(UnboundLocalError, interpreter.run, code, {}, None)
+
+    def test_untranslatable_code_stays_on_the_stack(self):
+        code = guest("x = 1")
+        prefix = [dis.opmap['GET_AITER']] + ([0] if interpreter.WORDCODE else [])
+        bad = code.replace(co_code=bytes(prefix) + code.co_code)
+        self.assertRaises(registers.Untranslatable, registers.translate, bad)
+        self.assertEqual(registers.install(bad), 0)
+
+    def test_uninstall(self):
+        code = guest(SOURCE)
+        self.assertLess(1, registers.install(code))
+        self.assertEqual(registers.install(code), 0)
+        registers.uninstall()
+        self.assertEqual(interpreter.executors, {})
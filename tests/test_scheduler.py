@@ -0,0 +1,82 @@
+"""Tests for the cooperative scheduler in byterun."""
+
+import unittest
+
+from byterun import scheduler
+from .guesttest import guest
+
+COUNTER = guest("""\
+    i = 0
+    while i < n:
+        log.append(name)
+        i = i + 1
+    """)
+
+class TestScheduler(unittest.TestCase):
+    def spawn(self, sched, log, name, n, **kwargs):
+        f_globals = {'log': log, 'name': name, 'n': n}
+        return sched.spawn(COUNTER, f_globals, name=name, **kwargs)
+
+    def test_round_robin_interleaves(self):
+        log = []
+        sched = scheduler.Scheduler(quantum=20)
+        a = self.spawn(sched, log, 'a', 10)
+        b = self.spawn(sched, log, 'b', 10)
+        sched.run()
+        self.assertEqual(sorted(log), ['a'] * 10 + ['b'] * 10)
+        self.assertNotEqual(log, sorted(log))
+        self.assertEqual((a.state, b.state), ('done', 'done'))
+        self.assertGreater(a.stats()['slices'], 1)
+        self.assertEqual(a.instructions, b.instructions)
+
+    def test_priority(self):
+        log = []
+        sched = scheduler.Scheduler(quantum=20, policy='priority')
+        self.spawn(sched, log, 'low', 5, priority=1)
+        self.spawn(sched, log, 'high', 5, priority=0)
+        sched.run()
+        self.assertEqual(log, ['high'] * 5 + ['low'] * 5)
+
+    def test_cancel(self):
+        log = []
+        sched = scheduler.Scheduler(quantum=20)
+        forever = self.spawn(sched, log, 'forever', float('inf'))
+        other = self.spawn(sched, log, 'other', 3)
+        while not other.finished:
+            sched.step()
+        self.assertTrue(forever.cancel())
+        sched.run()
+        self.assertEqual(forever.state, 'cancelled')
+        self.assertRaises(scheduler.Cancelled, forever.result)
+        self.assertEqual(other.result(), None)
+
+    def test_failure_stays_in_task(self):
+        sched = scheduler.Scheduler()
+        task = sched.spawn(guest("1 / 0"))
+        sched.run()
+        self.assertEqual(task.state, 'failed')
+        self.assertRaises(ZeroDivisionError, task.result)
+
+    def test_sleep_lets_others_run(self):
+        log = []
+        sched = scheduler.Scheduler()
+        code = guest("""\
+            log.append('before')
+            sleep(0.01)
+            log.append('after')
+            """)
+        sched.spawn(code, {'log': log, 'sleep': scheduler.sleep})
+        self.spawn(sched, log, 'other', 2)
+        sched.run()
+        self.assertEqual(log, ['before', 'other', 'other', 'after'])
+
+    def test_guest_function_calls_yield(self):
+        sched = scheduler.Scheduler(quantum=1)
+        task = sched.spawn(guest("""\
+            def f(x):
+                return x + 1
+            result = f(f(1))
+            """))
+        sched.run()
+        self.assertEqual(task.frame.f_globals['result'], 3)
+        self.assertGreater(task.slices, 2)
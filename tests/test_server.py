@@ -0,0 +1,84 @@
+"""Tests for the pre-forking server."""
+
+import gc, os, shutil, signal, tempfile, time, unittest
+
+from byterun import server
+
+@unittest.skipUnless(hasattr(os, 'fork'), "needs os.fork()")
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.rules = os.path.join(self.dir, 'rules.py')
+        with open(self.rules, 'w') as f:
+            f.write("def double(x):\n    return x * 2\nresult = double(n), pid()\n")
+        self.address = os.path.join(self.dir, 'socket')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_jobs(self):
+        s = server.Server(self.address, [self.rules], workers=2)
+        self.assertEqual(list(s.codes), ['rules'])
+        self.assertTrue(s.engine.streams)
+        pids = set()
+        with s:
+            for n in range(4):
+                with server.Client(self.address) as client:
+                    doubled, pid = client.run('rules', {'n': n, 'pid': os.getpid})
+                    self.assertEqual(doubled, 2 * n)
+                    pids.add(pid)
+                    self.assertEqual(client.run('result = n + 1', {'n': n}), n + 1)
+                    with self.assertRaises(server.JobError):
+                        client.run('result = 1/0')
+            if hasattr(gc, 'get_freeze_count'):
+                self.assertEqual(gc.get_freeze_count(), 0)
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(s.pids, [])
+
+    def test_authkey(self):
+        with self.assertRaises(ValueError):
+            server.Server(('127.0.0.1', 0))
+        with server.Server(self.address, [self.rules], workers=1,
+                           authkey=b'secret'):
+            with server.Client(self.address, authkey=b'secret') as client:
+                self.assertEqual(client.run('result = n * 3', {'n': 2}), 6)
+
+    def test_exit(self):
+        with server.Server(self.address, workers=1):
+            with server.Client(self.address) as client:
+                with self.assertRaises(server.JobError) as context:
+                    client.run('exit(3)')
+                self.assertIn('SystemExit', str(context.exception))
+                self.assertEqual(client.run('result = 2'), 2)
+
+    def test_client_goes_away(self):
+        with server.Server(self.address, workers=1) as s:
+            client = server.Client(self.address)
+            client.connection.send(('total = 0\nfor i in range(20000):\n'
+                                    '    total = total + i\nresult = total', {}))
+            client.close()
+            with server.Client(self.address) as client:
+                self.assertEqual(client.run('result = 2'), 2)
+            self.assertEqual(s.respawn(), 0)
+
+    def test_respawn(self):
+        with server.Server(self.address, workers=2) as s:
+            killed = s.pids[0]
+            os.kill(killed, signal.SIGKILL)
+            for _ in range(100):
+                if s.respawn():
+                    break
+                time.sleep(0.01)
+            self.assertEqual(len(s.pids), 2)
+            self.assertNotIn(killed, s.pids)
+            with server.Client(self.address) as client:
+                self.assertEqual(client.run('result = 2'), 2)
+
+    def test_sources_are_bounded(self):
+        s = server.Server(self.address)
+        for n in range(server.MAX_SOURCES + 10):
+            self.assertEqual(s.run('result = %d' % n, {}), ('ok', n))
+        self.assertEqual(s.run('result = 0', {}), ('ok', 0))
+        self.assertEqual(len(s.sources), server.MAX_SOURCES)
+        self.assertEqual(len(s.engine.compiled), server.MAX_SOURCES)
+        self.assertEqual(len(s.engine.streams), server.MAX_SOURCES)
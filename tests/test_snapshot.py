@@ -0,0 +1,70 @@
+"""Tests for snapshots of a warmed Engine."""
+
+import marshal, os, shutil, tempfile, unittest
+
+from byterun import engine, interpreter, snapshot
+from .guesttest import guest
+
+SOURCE = """\
+    TABLE = {}
+    for i in range(10):
+        TABLE[i] = i * i
+    def lookup(x):
+        return TABLE[x]
+    scratch = [1, 2]
+    __snapshot__ = ['TABLE']
+    """
+
+def layout(e, code):
+    "`e`'s stream for `code`, with handlers given by byte name."
+    names = dict((handler, byte_name) for byte_name, handler in e.table.items())
+    return [entry and (names[entry[0]],) + entry[1:] for entry in e.streams[code]]
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'engine.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        self.assertEqual(interpreter.executors, {})
+
+    def warmed(self):
+        e = engine.Engine()
+        code = guest(SOURCE)
+        f_globals = {}
+        e.run(code, f_globals)
+        e.warm("result = lookup(3)")
+        return e, code, f_globals
+
+    def test_round_trip(self):
+        e, original_code, f_globals = self.warmed()
+        snapshot.save(self.filename, e, {'tables': (original_code, f_globals)})
+        restored = engine.Engine()
+        modules = snapshot.load(self.filename, restored)
+        code, f_globals = modules['tables']
+        self.assertEqual(sorted(f_globals), ['TABLE', 'lookup'])
+        self.assertEqual(set(restored.compiled), set(e.compiled))
+        originals = snapshot.walk([original_code])
+        for original, copy in zip(originals, snapshot.walk([code])):
+            self.assertEqual(layout(restored, copy), layout(e, original))
+        restored.run("result = lookup(3)", f_globals)
+        self.assertEqual(f_globals['result'], 9)
+        self.assertEqual(len(restored.streams), len(e.streams))
+
+    def test_mismatched_tables(self):
+        e, code, f_globals = self.warmed()
+        snapshot.save(self.filename, e, {'tables': (code, f_globals)})
+        with open(self.filename, 'rb') as f:
+            parts = list(marshal.loads(f.read()))
+        parts[4] = parts[4][:-1]
+        with open(self.filename, 'wb') as f:
+            f.write(marshal.dumps(tuple(parts)))
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.load(self.filename, engine.Engine())
+
+    def test_not_a_snapshot(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'nonsense')
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.load(self.filename, engine.Engine())
@@ -0,0 +1,84 @@
+"""Tests for the tracing JIT in byterun."""
+
+import io
+
+from byterun import interpreter, tracejit
+from .guesttest import GuestTestCase, guest
+
+SOURCE = """\
+    def f(n):
+        total = 0
+        i = 0
+        while i < n:
+            if i % 3 == 0:
+                total = total + i
+            else:
+                total = total - 1
+            i = i + 1
+        return total
+    def g(xs):
+        out = []
+        for x in xs:
+            out.append(x * 2)
+        return out
+    def nested():
+        t = 0
+        for a in range(20):
+            for b in range(20):
+                t = t + a * b
+        return t
+    results = [f(200), sum(g(range(100))), nested()]
+    """
+
+class TestTraceJit(GuestTestCase):
+    def setUp(self):
+        GuestTestCase.setUp(self)
+        self.hot_loop = tracejit.HOT_LOOP
+        tracejit.HOT_LOOP = 5
+
+    def tearDown(self):
+        tracejit.HOT_LOOP = self.hot_loop
+        GuestTestCase.tearDown(self)
+        tracejit.jitted.clear()
+
+    def test_same_results(self):
+        classic, jitted = {}, {}
+        interpreter.run(guest(SOURCE), classic, None)
+        tracejit.run(guest(SOURCE), jitted, None)
+        self.assertEqual(classic['results'], jitted['results'])
+
+    def test_traces_and_blacklist(self):
+        tracejit.run(guest(SOURCE), {}, None)
+        jits = dict((jit.code.co_name, jit) for jit in tracejit.jitted.values())
+        self.assertEqual(len(jits['f'].traces), 1)
+        trace = list(jits['f'].traces.values())[0]
+        self.assertGreater(trace.iterations, 100)
+        self.assertEqual(list(jits['nested'].blacklist.values()),
+                         ['contains an inner loop'])
+        out = io.StringIO()
+        tracejit.dump(out)
+        self.assertIn('def trace(frame, f_locals, stack):', out.getvalue())
+        self.assertIn('blacklisted', out.getvalue())
+
+    def test_guard_exit_restores_state(self):
+        f_globals = {}
+        tracejit.run(guest("""\
+            def early(n):
+                i = 0
+                while i < n:
+                    if i == 70:
+                        return i
+                    i = i + 1
+            result = early(1000)
+            """), f_globals, None)
+        self.assertEqual(f_globals['result'], 70)
+
+    def test_uninstall(self):
+        code = guest(SOURCE)
+        self.assertLess(1, tracejit.install(code))
+        self.assertEqual(tracejit.install(code), 0)
+        tracejit.uninstall()
+        self.assertEqual(interpreter.executors, {})
+        f_globals = {}
+        interpreter.run(code, f_globals, None)
+        self.assertEqual(tracejit.jitted[code].counts, {})
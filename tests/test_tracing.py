@@ -0,0 +1,90 @@
+"""Tests for sys.settrace-style tracing of guest code."""
+
+from byterun import closures, interpreter, tracing
+from .guesttest import GuestTestCase, guest
+
+SOURCE = """\
+    def f(n):
+        total = 0
+        i = 0
+        while i < n:
+            total = total + i
+            i = i + 1
+        return total
+    def g(x):
+        return 1 // x
+    r = f(2)
+    r = g(r)
+    """
+
+class TestTracing(GuestTestCase):
+    def setUp(self):
+        GuestTestCase.setUp(self)
+        self.events = []
+
+    def tearDown(self):
+        tracing.settrace(None)
+        GuestTestCase.tearDown(self)
+
+    def tracer(self, frame, event, arg):
+        self.events.append((frame.f_code.co_name, event, frame.f_lineno,
+                            arg[0] if event == 'exception' else arg))
+        return self.tracer
+
+    def test_events(self):
+        f_globals = {}
+        tracing.run(guest(SOURCE), f_globals, None, self.tracer)
+        self.assertEqual(f_globals['r'], 1)
+        f_events = [(event, line, arg) for name, event, line, arg in self.events
+                    if name == 'f']
+        self.assertEqual(f_events, [
+            ('call', 1, None),
+            ('line', 2, None), ('line', 3, None),
+            ('line', 4, None), ('line', 5, None), ('line', 6, None),
+            ('line', 4, None), ('line', 5, None), ('line', 6, None),
+            ('line', 4, None), ('line', 7, None),
+            ('return', 7, 1),
+        ])
+        self.assertEqual(self.events[-1], ('<module>', 'return', 11, None))
+
+    def test_exception(self):
+        code = guest(SOURCE.replace("f(2)", "f(0)"))
+        self.assertRaises(ZeroDivisionError,
+                          tracing.run, code, {}, None, self.tracer)
+        self.assertEqual(self.events[-4:], [
+            ('g', 'exception', 9, ZeroDivisionError),
+            ('g', 'return', 9, None),
+            ('<module>', 'exception', 11, ZeroDivisionError),
+            ('<module>', 'return', 11, None),
+        ])
+
+    def test_call_filter(self):
+        def tracer(frame, event, arg):
+            self.events.append((frame.f_code.co_name, event))
+            if frame.f_code.co_name == 'g':
+                return lambda frame, event, arg: self.events.append(event)
+        tracing.run(guest(SOURCE), {}, None, tracer)
+        self.assertEqual(self.events, [('<module>', 'call'), ('f', 'call'),
+                                       ('g', 'call'), 'line', 'return'])
+
+    def test_raising_tracer_stops_tracing(self):
+        def tracer(frame, event, arg):
+            if event == 'line':
+                raise KeyError(frame.f_lineno)
+            return tracer
+        tracing.settrace(tracer, guest(SOURCE))
+        self.assertRaises(KeyError, interpreter.run, guest(SOURCE), {}, None)
+        self.assertIsNone(tracing.gettrace())
+        self.assertEqual(interpreter.executors, {})
+
+    def test_uninstall_restores(self):
+        code = guest(SOURCE)
+        closures.install(code)
+        fast = dict(interpreter.executors)
+        tracing.settrace(self.tracer, code)
+        self.assertNotEqual(interpreter.executors, fast)
+        tracing.settrace(None)
+        self.assertEqual(interpreter.executors, fast)
+        f_globals = {}
+        interpreter.run(code, f_globals, None)
+        self.assertEqual((f_globals['r'], self.events), (1, []))
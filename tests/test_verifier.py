@@ -0,0 +1,113 @@
+"""Tests for the byterun bytecode verifier."""
+
+import dis
+
+from byterun import interpreter, verifier
+from .guesttest import GuestTestCase, guest
+
+def instruction(byte_name, arg=None):
+    "Encode one instruction, as wordcode or in 3.4's format."
+    opcode = dis.opmap[byte_name]
+    if interpreter.WORDCODE:
+        return bytes([opcode, arg or 0])
+    return bytes([opcode] if arg is None else [opcode, arg, 0])
+
+class TestVerifier(GuestTestCase):
+    def assert_rejected(self, code, message):
+        with self.assertRaises(verifier.VerifyError) as context:
+            verifier.verify(code)
+        self.assertIn(message, str(context.exception))
+
+    def test_good_code_runs(self):
+        f_globals = {}
+        code = guest("""\
+            def f(n):
+                total = 0
+                for i in range(n):
+                    if i % 2 == 0:
+                        total = total + i
+                return total
+            result = f(10)
+            """)
+        self.assertEqual(verifier.install(code), 2)
+        interpreter.run(code, f_globals, None)
+        self.assertEqual(f_globals['result'], 20)
+        verifier.uninstall()
+        self.assertEqual(interpreter.executors, {})
+
+    def test_bound_loads(self):
+        code = guest("""\
+            def f(flag):
+                if flag:
+                    y = 1
+                x = 2
+                return flag, x, y
+            """).co_consts[0]
+        v = verifier.verify(code)[0]
+        loads = dict((arguments[0], offset)
+                     for offset, byte_name, arguments, _ in interpreter.decode(code)
+                     if byte_name == 'LOAD_FAST')
+        self.assertIn(loads['flag'], v.bound_loads)
+        self.assertIn(loads['x'], v.bound_loads)
+        self.assertNotIn(loads['y'], v.bound_loads)
+
+    def test_unbound_local_still_raises(self):
+        code = guest("""\
+            def f():
+                return y
+                y = 1
+            f()
+            """)
+        verifier.install(code)
+        self.assertRaises(UnboundLocalError, interpreter.run, code, {}, None)
+
+    def test_bad_constant_index(self):
+        code = guest("x = 1")
+        bad = code.replace(co_code=instruction('LOAD_CONST', 9) + code.co_code)
+        self.assert_rejected(bad, "LOAD_CONST refers to constant 9 of")
+
+    def test_stack_underflow(self):
+        code = guest("x = 1")
+        bad = code.replace(co_code=instruction('POP_TOP') + code.co_code)
+        self.assert_rejected(bad, "offset 0: POP_TOP needs 1 stack items but has 0")
+
+    def test_bad_jump(self):
+        code = guest("x = 1")
+        if interpreter.WORDCODE:    # Wordcode jumps can't land mid-instruction.
+            jump, target = instruction('JUMP_FORWARD', 200), 402
+        else:
+            jump, target = instruction('JUMP_ABSOLUTE', 1), 1
+        bad = code.replace(co_code=jump + code.co_code)
+        self.assert_rejected(bad, "jumps to %d, which is not an instruction" % target)
+
+    def test_runs_off_the_end(self):
+        code = guest("x = 1")
+        end = -2 if interpreter.WORDCODE else -1
+        self.assert_rejected(code.replace(co_code=code.co_code[:end]),
+                             "control runs off the end")
+
+    def test_stacksize(self):
+        code = guest("x = (a, b, c)")
+        self.assert_rejected(code.replace(co_stacksize=1),
+                             "exceeds co_stacksize 1")
+
+    def test_bad_cell_index(self):
+        code = guest("""\
+            def f(x):
+                def g():
+                    return x
+                return g
+            """).co_consts[0]
+        offset = [offset for offset, byte_name, _, _ in interpreter.decode(code)
+                  if byte_name == 'LOAD_CLOSURE'][0]
+        def with_index(index):
+            co_code = bytearray(code.co_code)
+            co_code[offset + 1] = index
+            return code.replace(co_code=bytes(co_code))
+        # On wordcode, x is a local and a cell in the same slot.
+        ncells = len(code.co_varnames) if interpreter.WORDCODE else 1
+        self.assert_rejected(with_index(ncells), "LOAD_CLOSURE refers to cell %d of %d"
+                             % (ncells, ncells))
+        if interpreter.WORDCODE:
+            self.assert_rejected(with_index(1),
+                                 "LOAD_CLOSURE refers to local 'g', not a cell")
@@ -0,0 +1,113 @@
+"""Tests for running the host's own wordcode in byterun."""
+
+import gc, unittest
+
+from byterun import closures, interpreter, registers, tracejit, verifier
+from .guesttest import GuestTestCase, guest
+
+SOURCE = """\
+    def adder(a, *rest):
+        def add(b):
+            return a + b
+        return add
+    def keywords(a, b=2, **kw):
+        return a, b, sorted(kw)
+    def options(a, *args, b=2, c, **kw):
+        return a, args, b, c, sorted(kw)
+    class Point(object):
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+        def norm(self):
+            return abs(self.x) + abs(self.y)
+    x = adder(1)(2)
+    mapping = {'a': x, 'b': 2}
+    computed = {x: 1, 'k': x * 2}
+    text = f"{x!r:>4}|{x}"
+    squares = [i * i for i in range(5)]
+    found = 1 if x is not None and x in squares else 2
+    total = 0
+    for i in range(10):
+        total += i
+    while total > 3:
+        total = total - 7
+    a, b = 1, 2
+    a, b = b, a
+    flag = 0 < a < 3
+    results = [x, mapping, computed, text, squares, found, total, (a, b),
+               flag, Point(3, -4).norm(), keywords(1, c=3),
+               keywords(1, b=(5 if found else 6)), max(*squares),
+               sorted([3, 1, 2], reverse=True), {1, 2}, squares[1:3],
+               (0, *squares), {**mapping, 'c': 3}, 7 // 2, 2 ** 10,
+               options(1, c=3, d=4), options(1, 2, b=4, c=5)]
+    """
+
+def native_results(source_code):
+    f_globals = {}
+    exec(guest(source_code), f_globals)
+    return f_globals['results']
+
+@unittest.skipUnless(interpreter.WORDCODE, "needs a wordcode host")
+class TestWordcode(GuestTestCase):
+    hot_calls = None
+
+    def tearDown(self):
+        GuestTestCase.tearDown(self)
+        tracejit.jitted.clear()
+
+    def run_guest(self, run, source_code=SOURCE):
+        f_globals = {}
+        run(guest(source_code), f_globals, None)
+        return f_globals['results']
+
+    def test_same_results_as_the_host(self):
+        self.assertEqual(self.run_guest(interpreter.run), native_results(SOURCE))
+
+    def test_executors(self):
+        expected = native_results(SOURCE)
+        for module in (closures, registers, tracejit, verifier):
+            self.assertEqual(self.run_guest(module.run), expected)
+            interpreter.executors.clear()
+
+    def test_exception_handlers_are_refused(self):
+        source_code = """\
+            def f(x):
+                try:
+                    return 1 / x
+                except ZeroDivisionError:
+                    return 'caught'
+            results = f(0)
+            """
+        with self.assertRaises(interpreter.VirtualMachineError) as context:
+            self.run_guest(interpreter.run, source_code)
+        self.assertIn("exception handlers are not supported",
+                      str(context.exception))
+
+    def test_tables_go_with_their_code(self):
+        interpreter.clear_pool()
+        gc.collect()
+        before = len(interpreter._wordcode_tables)
+        for n in range(100):
+            code = guest("def f(x):\n    return x + %d\nresults = f(1)\n" % n)
+            f_globals = {}
+            interpreter.run(code, f_globals, None)
+            self.assertEqual(f_globals['results'], n + 1)
+            del code, f_globals
+        interpreter.clear_pool()   # Which keeps some code objects.
+        gc.collect()
+        self.assertEqual(len(interpreter._wordcode_tables), before)
+
+    def test_decoding(self):
+        names = [byte_name for _, byte_name, _, _
+                 in interpreter.decode(guest("f(1, k=2)"))]
+        self.assertNotIn('PRECALL', names)
+        self.assertNotIn('KW_NAMES', names)
+        self.assertNotIn('CACHE', names)
+        call = [arguments for _, byte_name, arguments, _
+                in interpreter.decode(guest("f(1, k=2)")) if byte_name == 'CALL']
+        self.assertEqual(call, [(2, ('k',))])
+
+    def test_extended_arg(self):
+        source_code = ("results = [%s]\n"
+                       % ', '.join("'c%d'" % i for i in range(300)))
+        self.assertEqual(self.run_guest(interpreter.run, source_code),
+                         native_results(source_code))